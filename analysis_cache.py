@@ -0,0 +1,166 @@
+import os
+import gzip
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+class AnalysisCache():
+    """
+    La clase AnalysisCache implementa una caché persistente en disco para los resultados de Azure Form Recognizer.
+    Cada entrada se direcciona por contenido: la llave es un hash SHA-256 de los bytes del documento junto con el id del
+    modelo y la versión del API, de modo que volver a analizar el mismo PDF (en otra ejecución o desde otro método)
+    no genera una nueva llamada al servicio.
+
+    get:
+        Retorna el AnalyzeResult serializado (diccionario) asociado a una llave, o None si no existe.
+
+    set:
+        Guarda un AnalyzeResult serializado y aplica la política de desalojo LRU cuando se supera el tamaño máximo.
+
+    stats:
+        Retorna las estadísticas de aciertos, fallos y desalojos de la caché.
+    """
+    def __init__(self, cache_dir=".analysis_cache", max_size_bytes=1024 ** 3):
+        """
+        :param cache_dir: Directorio donde se guardan las entradas de la caché.
+        :param max_size_bytes: Tamaño máximo en bytes de la caché; None desactiva el límite.
+        """
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # llave -> tamaño en bytes, ordenado del menos al más recientemente usado
+        self._size_bytes = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def make_key(document, model_id, api_version):
+        """
+        Construye la llave de la caché a partir del contenido del documento, el modelo y la versión del API.
+
+        :param document: Bytes del documento.
+        :param model_id: Id del modelo de Form Recognizer (por ejemplo 'prebuilt-layout').
+        :param api_version: Versión del API del servicio.
+        :return: Llave hexadecimal de la entrada.
+        """
+        digest = hashlib.sha256()
+        digest.update(f"{model_id}|{api_version}|".encode("utf-8"))
+        digest.update(document)
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json.gz")
+
+    def _load_index(self):
+        """ Reconstruye el índice LRU a partir de los archivos existentes, usando la fecha de modificación como último acceso. """
+        found = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json.gz"):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    found.append((stat.st_mtime, name[:-len(".json.gz")], stat.st_size))
+
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._size_bytes += size
+
+    def get(self, key):
+        """
+        Busca un resultado en la caché.
+
+        :param key: Llave generada con make_key.
+        :return: AnalyzeResult serializado como diccionario, o None si no está en la caché.
+        """
+        path = self._path(key)
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            try:
+                with gzip.open(path, "rt", encoding="utf-8") as f:
+                    content = json.load(f)
+                os.utime(path)
+            except (OSError, ValueError):
+                # La entrada fue borrada o quedó corrupta (por ejemplo, otro proceso la desalojó)
+                self._forget(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return content
+
+    def set(self, key, content):
+        """
+        Guarda un resultado en la caché.
+
+        :param key: Llave generada con make_key.
+        :param content: AnalyzeResult serializado como diccionario (AnalyzeResult.to_dict()).
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Se escribe a un archivo temporal y luego se reemplaza para que las lecturas concurrentes nunca vean archivos a medias
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as f:
+            f.write(json.dumps(content, ensure_ascii=False).encode("utf-8"))
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._forget(key)
+            self._entries[key] = size
+            self._size_bytes += size
+            self._evict()
+
+    def _forget(self, key):
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._size_bytes -= size
+
+    def _evict(self):
+        """ Elimina las entradas menos recientemente usadas hasta respetar el tamaño máximo. """
+        if self.max_size_bytes is None:
+            return
+        while self._size_bytes > self.max_size_bytes and len(self._entries) > 1:
+            key, _ = next(iter(self._entries.items()))
+            self._forget(key)
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            self.evictions += 1
+
+    def clear(self):
+        """ Elimina todas las entradas de la caché. """
+        with self._lock:
+            for key in list(self._entries):
+                self._forget(key)
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+
+    def stats(self):
+        """
+        Retorna las estadísticas de uso de la caché.
+
+        :return: Diccionario con aciertos, fallos, tasa de aciertos, desalojos, número de entradas y tamaño en bytes.
+        """
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'size_bytes': self._size_bytes,
+        }
@@ -0,0 +1,248 @@
+"""
+Benchmark sin conexión de las etapas de post-procesamiento de DocumentIntelligence, sobre un cliente falso que reproduce
+resultados sintéticos (de 1 a 1000 páginas, tablas de hasta 10k celdas) o grabados (por ejemplo, un directorio de AnalysisCache).
+
+Por cada escenario y etapa se reporta el mejor tiempo, el rendimiento (páginas, celdas o documentos por segundo) y el pico
+de memoria medido con tracemalloc en una ejecución aparte. Las etapas de estructuración se miden sobre el resultado ya
+analizado, que es lo que hacen los métodos públicos después de llamar al servicio.
+
+Al comparar con una línea base grabada en otra máquina, los tiempos se escalan por el de una etapa de referencia de Python
+puro medida en la misma ejecución, y se ignoran las etapas de menos de --min-seconds y los aumentos de memoria menores que
+--min-memory, que son ruido de medición.
+
+Uso:
+    python benchmarks/bench_postprocessing.py                         # todos los escenarios sintéticos
+    python benchmarks/bench_postprocessing.py --scenarios chico mediano --latency 0.05
+    python benchmarks/bench_postprocessing.py --replay .analysis_cache
+    python benchmarks/bench_postprocessing.py --save-baseline benchmarks/baseline.json
+    python benchmarks/bench_postprocessing.py --baseline benchmarks/baseline.json   # código de salida 1 si hay regresiones
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fake_client import (FakeDocumentAnalysisClient, AsyncFakeDocumentAnalysisClient, synthetic_result,
+                         load_recorded)
+
+# El cliente real no se usa, pero su constructor exige un endpoint y una clave
+os.environ.setdefault('AZURE_FORM_RECOGNIZER_ENDPOINT', 'https://benchmark.invalid/')
+os.environ.setdefault('AZURE_FORM_RECOGNIZER_API_KEY', 'benchmark')
+
+from document_intelligence_functions import DocumentIntelligence
+from request_scheduler import RequestScheduler
+import orc
+
+SCENARIOS = {
+    'chico': dict(pages=1, tables=1, rows=6, cols=4),
+    'mediano': dict(pages=10, tables=10, rows=20, cols=6),
+    'grande': dict(pages=100, tables=50, rows=50, cols=8),
+    'tabla_10k': dict(pages=5, tables=1, rows=1000, cols=10),
+    'doc_1000p': dict(pages=1000, tables=200, rows=10, cols=5),
+}
+
+LIST_STRING_IN_COLUMNS = ['pozo', 'campo']
+LIST_FIELD_NAMES = ['Pozo', 'Campo', 'Contrato', 'Profundidad', 'Fecha']
+
+# Escenario y etapa de la referencia con que se normalizan los tiempos entre máquinas
+REFERENCE = ('referencia', 'python')
+REFERENCE_ITEMS = 20000
+
+
+def best_time(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_memory(function):
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def reference_workload():
+    """ Trabajo fijo de Python puro (formateo de textos, diccionarios y ordenamiento) que refleja la velocidad de la máquina. """
+    rows = [f"pozo-{i % 977}-{i}" for i in range(REFERENCE_ITEMS)]
+    index = {}
+    for row in rows:
+        index.setdefault(row.split('-')[1], []).append(row)
+    return sorted(rows, key=len)
+
+
+def run_reference(repeat):
+    """
+    Mide la etapa de referencia.
+
+    :return: Diccionario {etapa: medición}, con el mismo formato que run_scenario.
+    """
+    seconds = best_time(reference_workload, repeat)
+    return {REFERENCE[1]: {'seconds': seconds, 'throughput': REFERENCE_ITEMS / seconds, 'unit': 'filas/s',
+                           'peak_bytes': peak_memory(reference_workload)}}
+
+
+def run_scenario(payload, latency, repeat, batch_size, max_concurrency):
+    """
+    Mide todas las etapas sobre un resultado.
+
+    :return: Diccionario {etapa: {'seconds', 'throughput', 'unit', 'peak_bytes'}}.
+    """
+    # Sin cuota: el benchmark mide el post-procesamiento, no la espera del planificador frente al cliente falso
+    scheduler = RequestScheduler(rate=1e6, burst=10**6, min_poll_interval=0)
+    document_intelligence = DocumentIntelligence(dotenv_path=os.devnull, scheduler=scheduler)
+    document_intelligence.document_analysis_client = FakeDocumentAnalysisClient([payload], latency=latency)
+
+    result = document_intelligence._analyze_document(b'%PDF-benchmark')
+    tables = document_intelligence._extract_tables(result) if result.tables else []
+    pages = len(result.pages)
+    cells = sum(len(table.cells) for table in result.tables)
+
+    def analyze_many():
+        files = [{'file_name': f"doc-{i}.pdf", 'file': b'%PDF-benchmark'} for i in range(batch_size)]
+        client = AsyncFakeDocumentAnalysisClient([payload], latency=latency)
+        for _ in document_intelligence.analyze_many(files, max_concurrency=max_concurrency, async_client=client):
+            pass
+
+    stages = [
+        ('analyze', lambda: document_intelligence._analyze_document(b'%PDF-benchmark'), pages, 'páginas/s'),
+        ('analyze_many', analyze_many, batch_size, 'docs/s'),
+        ('page_texts', lambda: document_intelligence._page_texts(result), pages, 'páginas/s'),
+    ]
+    if result.tables:
+        stages += [
+            ('_extract_tables', lambda: document_intelligence._extract_tables(result), cells, 'celdas/s'),
+            ('table_to_dataframe', lambda: [document_intelligence.table_to_dataframe(t) for t in result.tables],
+             cells, 'celdas/s'),
+            ('identify_and_structure_tables', lambda: document_intelligence._structure_matched_tables(
+                result, LIST_STRING_IN_COLUMNS, LIST_FIELD_NAMES), cells, 'celdas/s'),
+            ('auto_identify_and_structure_tables', lambda: document_intelligence._auto_structure_tables(
+                result, LIST_STRING_IN_COLUMNS), cells, 'celdas/s'),
+            ('orc.process_table', lambda: [orc.process_table(table) for table in tables], cells, 'celdas/s'),
+        ]
+
+    measurements = {}
+    for name, function, items, unit in stages:
+        try:
+            seconds = best_time(function, repeat)
+            peak = peak_memory(function)
+        except Exception as e:
+            measurements[name] = {'error': f"{type(e).__name__}: {e}"}
+            continue
+        measurements[name] = {'seconds': seconds, 'throughput': items / seconds if seconds else float('inf'),
+                              'unit': unit, 'peak_bytes': peak}
+    return measurements
+
+
+def reference_scale(results, baseline):
+    """
+    :return: Cociente entre el tiempo de la referencia en esta ejecución y en la línea base, o 1.0 si alguna no la tiene.
+    """
+    scenario, stage = REFERENCE
+    current = results.get(scenario, {}).get(stage, {}).get('seconds')
+    previous = baseline.get(scenario, {}).get(stage, {}).get('seconds')
+    return current / previous if current and previous else 1.0
+
+
+def compare(results, baseline, time_tolerance, memory_tolerance, min_seconds=0.001, min_memory=256 * 1024):
+    """
+    Compara los resultados con una línea base. Los tiempos de la línea base se escalan por reference_scale para comparar
+    entre máquinas distintas.
+
+    :param min_seconds: Las etapas que duran menos que esto, tanto en la línea base como ahora, no se comparan en tiempo.
+    :param min_memory: Aumentos de memoria menores que esta cantidad de bytes no se consideran regresiones.
+    :return: Lista de textos describiendo las regresiones encontradas.
+    """
+    scale = reference_scale(results, baseline)
+    regressions = []
+    for scenario, stages in results.items():
+        if scenario == REFERENCE[0]:
+            continue
+        for stage, current in stages.items():
+            previous = baseline.get(scenario, {}).get(stage)
+            if not previous or 'seconds' not in previous or 'seconds' not in current:
+                continue
+            expected = previous['seconds'] * scale
+            if max(expected, current['seconds']) >= min_seconds and current['seconds'] > expected * (1 + time_tolerance):
+                regressions.append(f"{scenario}/{stage}: tiempo {expected * 1000:.1f}ms (línea base escalada) -> "
+                                   f"{current['seconds'] * 1000:.1f}ms")
+            if (current['peak_bytes'] > previous['peak_bytes'] * (1 + memory_tolerance)
+                    and current['peak_bytes'] - previous['peak_bytes'] >= min_memory):
+                regressions.append(f"{scenario}/{stage}: memoria {previous['peak_bytes'] / 2**20:.1f}MiB -> "
+                                   f"{current['peak_bytes'] / 2**20:.1f}MiB")
+    return regressions
+
+
+def print_results(results, baseline):
+    print(f"{'escenario':<12}{'etapa':<37}{'tiempo':>11}{'rendimiento':>22}{'memoria':>11}{'vs base':>9}")
+    for scenario, stages in results.items():
+        for stage, m in stages.items():
+            if 'error' in m:
+                print(f"{scenario:<12}{stage:<37}  error: {m['error']}")
+                continue
+            previous = (baseline or {}).get(scenario, {}).get(stage, {})
+            ratio = f"{m['seconds'] / previous['seconds']:>8.2f}x" if previous.get('seconds') else f"{'-':>9}"
+            print(f"{scenario:<12}{stage:<37}{m['seconds'] * 1000:>9.1f}ms{m['throughput']:>12.1f} {m['unit']:<9}"
+                  f"{m['peak_bytes'] / 2**20:>8.1f}MiB{ratio}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark sin conexión del post-procesamiento de DocumentIntelligence.")
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--replay', default=None, help="Archivo o directorio con resultados grabados (.json/.json.gz).")
+    parser.add_argument('--latency', type=float, default=0.0, help="Latencia simulada del servicio por documento, en segundos.")
+    parser.add_argument('--repeat', type=int, default=7, help="Repeticiones por etapa; se reporta el mejor tiempo.")
+    parser.add_argument('--batch-size', type=int, default=4, help="Documentos del lote de analyze_many.")
+    parser.add_argument('--max-concurrency', type=int, default=8, help="Documentos en vuelo en analyze_many.")
+    parser.add_argument('--baseline', default=None, help="Línea base JSON contra la cual detectar regresiones.")
+    parser.add_argument('--save-baseline', default=None, help="Guarda los resultados como nueva línea base.")
+    parser.add_argument('--time-tolerance', type=float, default=0.25, help="Aumento relativo de tiempo tolerado.")
+    parser.add_argument('--memory-tolerance', type=float, default=0.10, help="Aumento relativo de memoria tolerado.")
+    parser.add_argument('--min-seconds', type=float, default=0.001,
+                        help="Duración mínima para comparar el tiempo de una etapa; por debajo domina el ruido.")
+    parser.add_argument('--min-memory', type=int, default=256 * 1024, help="Aumento mínimo de memoria, en bytes, para reportarlo.")
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        payloads = {f"grabado_{i}": payload for i, payload in enumerate(load_recorded(args.replay))}
+    else:
+        payloads = {name: synthetic_result(**SCENARIOS[name]) for name in args.scenarios}
+
+    results = {REFERENCE[0]: run_reference(args.repeat)}
+    for name, payload in payloads.items():
+        results[name] = run_scenario(payload, args.latency, args.repeat, args.batch_size, args.max_concurrency)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"Línea base guardada en {args.save_baseline}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance, args.min_seconds, args.min_memory)
+        if regressions:
+            print("Regresiones:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("Sin regresiones respecto a la línea base.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""
+Ejercita RequestScheduler contra un cliente falso que imita la cuota de Form Recognizer (429 con Retry-After al superar
+los envíos por segundo y errores 503 aleatorios). Compara el envío sin control (muchos hilos, sin límite de tasa) con el
+planificador ajustado a la cuota, reportando la tasa de envíos aceptados, los 429 recibidos y los documentos fallidos.
+
+Uso: python benchmarks/bench_scheduler.py [--documents 90] [--quota 15] [--threads 32] [--error-rate 0.02]
+"""
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fake_client import ThrottlingFakeDocumentAnalysisClient, synthetic_result
+
+os.environ.setdefault('AZURE_FORM_RECOGNIZER_ENDPOINT', 'https://benchmark.invalid/')
+os.environ.setdefault('AZURE_FORM_RECOGNIZER_API_KEY', 'benchmark')
+
+from document_intelligence_functions import DocumentIntelligence
+from request_scheduler import RequestScheduler
+
+
+def run(scheduler, args):
+    document_intelligence = DocumentIntelligence(dotenv_path=os.devnull, scheduler=scheduler)
+    client = ThrottlingFakeDocumentAnalysisClient([synthetic_result(pages=2, tables=1)], quota=args.quota,
+                                                  error_rate=args.error_rate, latency=args.latency, seed=0)
+    document_intelligence.document_analysis_client = client
+
+    def analyze(i):
+        try:
+            document_intelligence._analyze_document(f"documento {i}".encode())
+            return True
+        except Exception:
+            return False
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        ok = sum(executor.map(analyze, range(args.documents)))
+    elapsed = time.perf_counter() - start
+
+    accepted = client.accepted
+    span = accepted[-1] - accepted[0] if len(accepted) > 1 else 0.0
+    rate = (len(accepted) - 1) / span if span else float('nan')
+    return {'ok': ok, 'elapsed': elapsed, 'rate': rate, 'throttled': client.throttled, 'failed_503': client.failed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Planificador de solicitudes contra un servicio falso con cuota.")
+    parser.add_argument('--documents', type=int, default=90)
+    parser.add_argument('--quota', type=float, default=15, help="Envíos por segundo aceptados por el servicio falso.")
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--error-rate', type=float, default=0.02, help="Probabilidad de 503 por envío.")
+    parser.add_argument('--latency', type=float, default=0.2, help="Latencia simulada del análisis, en segundos.")
+    args = parser.parse_args(argv)
+
+    modes = [
+        ('sin control', RequestScheduler(rate=1e6, max_retries=0, min_poll_interval=0, failure_threshold=10**9)),
+        ('planificador', RequestScheduler(rate=args.quota, max_retries=8, backoff_base=0.2, min_poll_interval=0)),
+    ]
+    print(f"{'modo':<14}{'correctos':>10}{'tiempo (s)':>12}{'envíos/s':>10}{'429':>6}{'503':>6}")
+    for name, scheduler in modes:
+        r = run(scheduler, args)
+        print(f"{name:<14}{r['ok']:>10}{r['elapsed']:>12.2f}{r['rate']:>10.2f}{r['throttled']:>6}{r['failed_503']:>6}")
+
+
+if __name__ == '__main__':
+    main()
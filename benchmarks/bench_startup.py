@@ -0,0 +1,86 @@
+"""
+Mide el arranque en frío, como en una Azure Function: cada medición se hace en un proceso nuevo y reporta el tiempo de
+importar los módulos del proyecto, crear DocumentIntelligence y BlobFunctions, y atender la primera solicitud
+(análisis con un cliente falso, texto por página y estructuración de tablas), además del total desde el inicio.
+El modo 'eager' importa de antemano pandas, numpy, pyarrow, pypdf y los SDK de Azure, como antes de las importaciones
+diferidas; el modo 'warm_up' llama a clients.warm_up() al importar, como al cargar el módulo de la función.
+
+Uso: python benchmarks/bench_startup.py [--runs 5]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(BENCHMARKS_DIR, '..')
+
+EAGER_IMPORTS = ['numpy', 'pandas', 'pyarrow', 'pyarrow.parquet', 'pyarrow.dataset', 'pypdf', 'azure.ai.formrecognizer',
+                 'azure.ai.formrecognizer.aio', 'azure.storage.blob', 'azure.core.pipeline.transport', 'requests', 'dotenv']
+
+CHILD = r'''
+import os, sys, time, json, importlib
+start = time.perf_counter()
+mode = sys.argv[1]
+sys.path[:0] = [sys.argv[2], sys.argv[3]]
+if mode == 'eager':
+    for name in json.loads(sys.argv[4]):
+        importlib.import_module(name)
+import pipeline
+from document_intelligence_functions import DocumentIntelligence
+from blob_functions import BlobFunctions
+import clients
+if mode == 'warm_up':
+    warm_up = clients.warm_up(dotenv_path=os.devnull)
+imported = time.perf_counter()
+
+document_intelligence = DocumentIntelligence(dotenv_path=os.devnull)
+blob_functions = BlobFunctions()
+constructed = time.perf_counter()
+
+from fake_client import synthetic_result, FakeDocumentAnalysisClient
+payload = synthetic_result(pages=2, tables=2, rows=12, cols=4)
+fake = time.perf_counter()
+if mode == 'warm_up':
+    warm_up.join()
+document_intelligence.document_analysis_client = FakeDocumentAnalysisClient([payload])
+session = document_intelligence.open_session(file_obj=b'%PDF-startup')
+session.page_texts
+session.structured_records(['pozo'])
+first_request = time.perf_counter()
+
+print(json.dumps({'import': imported - start, 'clients': constructed - imported,
+                  'first_request': first_request - fake, 'total': first_request - start - (fake - constructed)}))
+'''
+
+ENVIRONMENT = {
+    'AZURE_FORM_RECOGNIZER_ENDPOINT': 'https://startup.invalid/',
+    'AZURE_FORM_RECOGNIZER_API_KEY': 'startup',
+    'AZURE_BLOB_STORAGE_CONTAINER_NAME': 'startup',
+    'AZURE_BLOB_STORAGE_CONNECTION_STRING': 'DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;'
+                                            'AccountKey=a2V5;BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;',
+}
+
+
+def measure(mode):
+    output = subprocess.run([sys.executable, '-c', CHILD, mode, ROOT_DIR, BENCHMARKS_DIR, json.dumps(EAGER_IMPORTS)],
+                            env={**os.environ, **ENVIRONMENT}, cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tiempo de arranque en frío hasta la primera solicitud.")
+    parser.add_argument('--runs', type=int, default=5, help="Procesos nuevos por modo; se reporta la mediana.")
+    args = parser.parse_args(argv)
+
+    phases = ['import', 'clients', 'first_request', 'total']
+    print(f"{'modo':<10}" + ''.join(f"{phase + ' (ms)':>20}" for phase in phases))
+    for mode in ('eager', 'lazy', 'warm_up'):
+        runs = [measure(mode) for _ in range(args.runs)]
+        print(f"{mode:<10}" + ''.join(f"{statistics.median(run[phase] for run in runs) * 1000:>20.0f}" for phase in phases))
+
+
+if __name__ == '__main__':
+    main()
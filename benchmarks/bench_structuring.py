@@ -0,0 +1,72 @@
+"""
+Compara el rendimiento de la estructuración de tablas (auto_identify_and_structure_tables y la extracción clave-valor
+del pipeline) ejecutada en hilos, donde el GIL la serializa, con la ejecutada en un StructuringPool de procesos.
+
+Uso: python benchmarks/bench_structuring.py [--documents 64] [--tables 8] [--rows 60] [--threads 8] [--processes N]
+"""
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fake_client import synthetic_result
+from azure.ai.formrecognizer import AnalyzeResult
+
+os.environ.setdefault('AZURE_FORM_RECOGNIZER_ENDPOINT', 'https://benchmark.invalid/')
+os.environ.setdefault('AZURE_FORM_RECOGNIZER_API_KEY', 'benchmark')
+
+from document_intelligence_functions import DocumentIntelligence
+from key_value_extraction import KeyValueExtractor
+from structuring_pool import StructuringPool
+
+
+def run(document_intelligence, results, threads, structure):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        outputs = list(executor.map(lambda result: structure(document_intelligence, result), results))
+    return time.perf_counter() - start, outputs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estructuración de tablas en hilos frente a un grupo de procesos.")
+    parser.add_argument('--documents', type=int, default=64)
+    parser.add_argument('--tables', type=int, default=8)
+    parser.add_argument('--rows', type=int, default=60)
+    parser.add_argument('--cols', type=int, default=8)
+    parser.add_argument('--threads', type=int, default=8, help="Hilos que solicitan la estructuración (como el pipeline).")
+    parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count())
+    args = parser.parse_args(argv)
+
+    results = [AnalyzeResult.from_dict(synthetic_result(pages=2, tables=args.tables, rows=args.rows, cols=args.cols))
+               for _ in range(args.documents)]
+    extractor = KeyValueExtractor()
+    workloads = [
+        ('auto_structure', lambda di, result: di._run_structuring('_auto_structure_tables', result, ['pozo'])),
+        ('key_values', lambda di, result: di.structuring_pool.key_values(result, extractor) if di.structuring_pool
+            else extractor.extract(di._extract_tables(result))),
+    ]
+
+    print(f"núcleos: {multiprocessing.cpu_count()}  documentos: {args.documents}  tablas por documento: {args.tables}")
+    print(f"{'carga':<16}{'modo':<22}{'tiempo (s)':>12}{'docs/s':>10}")
+    with StructuringPool(args.processes) as pool:
+        # Primera tarea para que los procesos terminen de iniciar antes de medir
+        pool.run('_extract_tables', results[0])
+        for name, structure in workloads:
+            baseline = None
+            for mode, structuring_pool in (('hilos', None), (f'procesos ({args.processes})', pool)):
+                document_intelligence = DocumentIntelligence(dotenv_path=os.devnull, structuring_pool=structuring_pool)
+                elapsed, outputs = run(document_intelligence, results, args.threads, structure)
+                if baseline is None:
+                    baseline = outputs
+                elif outputs != baseline:
+                    raise AssertionError(f"{name}: los resultados en procesos difieren de los de los hilos")
+                print(f"{name:<16}{mode:<22}{elapsed:>12.2f}{args.documents / elapsed:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Mide cómo escala el reparto de una carpeta entre varios nodos con BlobWorkQueue. Cada nodo se simula con un hilo que
+reclama documentos y los procesa en un grupo de hilos; el procesamiento es una espera fija, como el tiempo de análisis
+en el servicio. Verifica que cada documento se procese exactamente una vez y que todos queden con su marcador.
+Con --crash, un nodo adicional reclama documentos y se cae sin liberarlos; los demás deben reclamarlos cuando sus leases
+expiran.
+
+Por defecto usa un Blob Storage falso en memoria (fake_storage.py) con una latencia por operación; con --connection-string
+usa una cuenta real o el emulador Azurite, por ejemplo:
+    DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;
+En ese caso los leases duran al menos 15 s.
+
+Uso: python benchmarks/bench_work_queue.py [--documents 500] [--nodes 1,2,4,8] [--work 0.1] [--crash]
+"""
+import os
+import sys
+import time
+import uuid
+import argparse
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+os.environ.setdefault('AZURE_BLOB_STORAGE_CONTAINER_NAME', 'benchmark')
+
+from fake_storage import FakeBlobServiceClient
+# Con un cliente real lo importa BlobFunctions; se importa aquí para no medirlo dentro del primer escenario
+import azure.storage.blob  # noqa: F401
+from blob_functions import BlobFunctions
+from work_queue import BlobWorkQueue
+from metrics import metrics
+
+
+def blob_functions(args):
+    if not args.connection_string:
+        return BlobFunctions(blob_service_client=FakeBlobServiceClient(latency=args.latency))
+    os.environ['AZURE_BLOB_STORAGE_CONNECTION_STRING'] = args.connection_string
+    functions = BlobFunctions()
+    if not functions.container_client.exists():
+        functions.container_client.create_container()
+    return functions
+
+
+def run_node(functions, folder, queue_prefix, worker_id, args, processed, lock):
+    with BlobWorkQueue(functions, queue_prefix, worker_id=worker_id, lease_duration=args.lease_duration,
+                       max_claims=args.concurrency + args.prefetch, poll_interval=args.poll_interval) as work_queue:
+
+        def process(blob_name):
+            time.sleep(args.work)
+            with lock:
+                processed[blob_name] += 1
+            work_queue.complete(blob_name)
+
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            for blob in work_queue.claims(folder, '.pdf'):
+                executor.submit(process, blob.name)
+
+
+def crash_node(functions, folder, queue_prefix, args):
+    """ Reclama tantos documentos como su límite y se cae sin liberarlos ni renovarlos. """
+    work_queue = BlobWorkQueue(functions, queue_prefix, worker_id='caido', lease_duration=args.lease_duration,
+                               max_claims=args.concurrency)
+    claims = work_queue.claims(folder, '.pdf', wait=False)
+    taken = [next(claims) for _ in range(args.concurrency)]
+    work_queue._stop.set()
+    return len(taken)
+
+
+def scenario(functions, nodes, args, crash=False):
+    run_id = uuid.uuid4().hex[:8]
+    folder, queue_prefix = f'bench/{run_id}/docs', f'bench/{run_id}/queue'
+    functions.upload_many(({'file_name': f'doc_{i:05d}.pdf', 'content': b'%PDF-bench'} for i in range(args.documents)),
+                          folder, max_workers=16)
+    metrics.reset()
+    abandoned = crash_node(functions, folder, queue_prefix, args) if crash else 0
+
+    processed = Counter()
+    lock = threading.Lock()
+    start = time.perf_counter()
+    threads = [threading.Thread(target=run_node, args=(functions, folder, queue_prefix, f'nodo-{i}', args, processed, lock))
+               for i in range(nodes)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    progress = BlobWorkQueue(functions, queue_prefix).progress(folder, '.pdf')
+    duplicates = sum(count - 1 for count in processed.values())
+    if progress['done'] != args.documents or len(processed) != args.documents:
+        raise AssertionError(f"Documentos sin terminar: {progress}")
+    counters = metrics.to_dict()['counters']
+    return {'elapsed': elapsed, 'duplicates': duplicates, 'abandoned': abandoned,
+            'conflicts': counters.get('work_queue_conflicts', {}).get('', 0),
+            'reclaimed': counters.get('work_queue_reclaimed', {}).get('', 0)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Escalamiento del reparto de documentos entre nodos con leases de Blob Storage.")
+    parser.add_argument('--documents', type=int, default=500)
+    parser.add_argument('--nodes', default='1,2,4,8', help="Números de nodos a medir, separados por coma.")
+    parser.add_argument('--concurrency', type=int, default=4, help="Documentos en proceso a la vez por nodo.")
+    parser.add_argument('--prefetch', type=int, default=2, help="Documentos reclamados por adelantado por nodo.")
+    parser.add_argument('--work', type=float, default=0.1, help="Segundos de procesamiento simulado por documento.")
+    parser.add_argument('--latency', type=float, default=0.002, help="Latencia simulada por operación del almacenamiento falso.")
+    parser.add_argument('--lease-duration', type=int, default=None, help="Duración de los leases (por defecto 3 s en memoria, 15 s real).")
+    parser.add_argument('--poll-interval', type=float, default=None,
+                        help="Segundos entre pasadas (por defecto 0.25 en memoria, 2 real).")
+    parser.add_argument('--crash', action='store_true', help="Agrega un nodo que se cae con documentos reclamados.")
+    parser.add_argument('--connection-string', default=None, help="Cadena de conexión de una cuenta real o de Azurite.")
+    args = parser.parse_args(argv)
+    if args.lease_duration is None:
+        args.lease_duration = 15 if args.connection_string else 3
+    if args.poll_interval is None:
+        args.poll_interval = 2.0 if args.connection_string else 0.25
+
+    functions = blob_functions(args)
+    print(f"documentos: {args.documents}  concurrencia por nodo: {args.concurrency}  trabajo por documento: {args.work} s")
+    print(f"{'nodos':>6}{'tiempo (s)':>12}{'docs/s':>10}{'aceleración':>13}{'eficiencia':>12}{'conflictos':>12}{'duplicados':>12}")
+    baseline = None
+    for nodes in [int(n) for n in args.nodes.split(',')]:
+        result = scenario(functions, nodes, args)
+        throughput = args.documents / result['elapsed']
+        baseline = baseline or throughput / nodes
+        print(f"{nodes:>6}{result['elapsed']:>12.2f}{throughput:>10.1f}{throughput / baseline:>13.2f}"
+              f"{throughput / baseline / nodes:>12.0%}{result['conflicts']:>12}{result['duplicates']:>12}")
+
+    if args.crash:
+        nodes = max(int(n) for n in args.nodes.split(','))
+        result = scenario(functions, nodes, args, crash=True)
+        print(f"Caída de un nodo con {result['abandoned']} documentos reclamados: {nodes} nodos terminaron en "
+              f"{result['elapsed']:.2f} s, {result['reclaimed']} reclamados tras expirar, {result['duplicates']} duplicados")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+"""
+Clientes falsos de Form Recognizer que reproducen resultados grabados o sintéticos, sin llamar al servicio.
+
+FakeDocumentAnalysisClient y AsyncFakeDocumentAnalysisClient imitan begin_analyze_document de los clientes
+síncrono y asíncrono: entregan los resultados en orden circular, después de una latencia simulada configurable.
+Los resultados grabados pueden cargarse desde archivos .json o .json.gz con la forma de AnalyzeResult.to_dict(),
+por ejemplo los de un directorio de AnalysisCache.
+
+ThrottlingFakeDocumentAnalysisClient y AsyncThrottlingFakeDocumentAnalysisClient además imitan la cuota del servicio:
+responden 429 con Retry-After cuando se supera el número de envíos por segundo y, opcionalmente, errores 503 aleatorios.
+"""
+import os
+import gzip
+import json
+import time
+import asyncio
+import random
+import itertools
+import threading
+from collections import deque
+
+from azure.ai.formrecognizer import AnalyzeResult
+from azure.core.exceptions import HttpResponseError
+
+API_VERSION = '2023-07-31'
+
+# Palabras usadas en los encabezados y en las celdas clave-valor de las tablas sintéticas
+HEADER_WORDS = ['Pozo', 'Campo', 'Contrato', 'Compañia', 'Profundidad', 'Fecha', 'Formación', 'Intervalo', 'Estado', 'Observaciones']
+FORM_KEYS = ['Compañia', 'Contrato', 'Campo', 'Pozo', 'Clasificación', 'Estructura', 'Torre', 'Estado final']
+
+
+def _polygon(x, y, width, height):
+    return [{'x': x, 'y': y}, {'x': x + width, 'y': y}, {'x': x + width, 'y': y + height}, {'x': x, 'y': y + height}]
+
+
+def synthetic_table(rows, cols, page_number=1, offset=0):
+    """
+    Construye una tabla sintética con la forma de DocumentTable.to_dict(): una fila de encabezados, celdas clave-valor
+    en la primera columna y algunas celdas combinadas y vacías.
+
+    :param rows: Número de filas.
+    :param cols: Número de columnas.
+    :param page_number: Página de la tabla.
+    :param offset: Desplazamiento del contenido, para variar los valores entre tablas.
+    :return: Diccionario de la tabla.
+    """
+    cells = []
+    for r in range(rows):
+        c = 0
+        while c < cols:
+            if r == 0:
+                content, kind = HEADER_WORDS[c % len(HEADER_WORDS)] + ('' if c < len(HEADER_WORDS) else f' {c}'), 'columnHeader'
+            elif c == 0:
+                key = FORM_KEYS[(r + offset) % len(FORM_KEYS)]
+                content, kind = f"{key}: VALOR-{r + offset}", 'content'
+            elif (r + c + offset) % 17 == 0:
+                content, kind = '', 'content'
+            else:
+                content, kind = f"{r + offset}.{c}", 'content'
+            # Cada 23 filas la segunda celda ocupa dos columnas
+            span = 2 if r > 0 and c == 1 and cols > 2 and r % 23 == 0 else 1
+            cells.append({'kind': kind, 'row_index': r, 'column_index': c, 'row_span': 1, 'column_span': span,
+                          'content': content,
+                          'bounding_regions': [{'page_number': page_number, 'polygon': _polygon(c, r * 0.2, 1, 0.2)}],
+                          'spans': [{'offset': 0, 'length': len(content)}]})
+            c += span
+    return {'row_count': rows, 'column_count': cols, 'cells': cells,
+            'bounding_regions': [{'page_number': page_number, 'polygon': _polygon(0, 0, cols, rows * 0.2)}],
+            'spans': []}
+
+
+def synthetic_result(pages=1, tables=1, rows=10, cols=5, lines_per_page=40):
+    """
+    Construye un resultado sintético con la forma de AnalyzeResult.to_dict().
+
+    :param pages: Número de páginas.
+    :param tables: Número de tablas, repartidas entre las páginas.
+    :param rows: Filas de cada tabla.
+    :param cols: Columnas de cada tabla.
+    :param lines_per_page: Líneas de texto por página.
+    :return: Diccionario del resultado.
+    """
+    page_list = []
+    for p in range(1, pages + 1):
+        lines = [{'content': f"Línea {i} de la página {p}: Pozo HAMACA-{p} Campo HAMACA",
+                  'polygon': _polygon(0.5, 0.5 + i * 0.25, 7.5, 0.2), 'spans': []}
+                 for i in range(lines_per_page)]
+        page_list.append({'page_number': p, 'angle': 0, 'width': 8.5, 'height': 11, 'unit': 'inch',
+                          'lines': lines, 'words': [], 'selection_marks': [], 'spans': [], 'barcodes': [], 'formulas': []})
+
+    table_list = [synthetic_table(rows, cols, page_number=1 + (t * pages) // max(tables, 1), offset=t)
+                  for t in range(tables)]
+    return {'api_version': API_VERSION, 'model_id': 'prebuilt-layout', 'content': '',
+            'pages': page_list, 'tables': table_list, 'paragraphs': [], 'key_value_pairs': [],
+            'styles': [], 'languages': [], 'documents': []}
+
+
+def load_recorded(path):
+    """
+    Carga resultados grabados desde un archivo o un directorio (recursivo) de archivos .json o .json.gz.
+
+    :param path: Ruta del archivo o directorio.
+    :return: Lista de diccionarios con la forma de AnalyzeResult.to_dict().
+    """
+    if os.path.isdir(path):
+        files = sorted(os.path.join(root, name) for root, _, names in os.walk(path)
+                       for name in names if name.endswith(('.json', '.json.gz')))
+    else:
+        files = [path]
+
+    payloads = []
+    for file in files:
+        opener = gzip.open if file.endswith('.gz') else open
+        with opener(file, 'rt', encoding='utf-8') as f:
+            payloads.append(json.load(f))
+    return payloads
+
+
+class FakePoller():
+    """ Imita LROPoller: result() espera la latencia simulada y reconstruye el AnalyzeResult. """
+    def __init__(self, payload, latency):
+        self._payload = payload
+        self._latency = latency
+        self._done = False
+
+    def result(self, timeout=None):
+        if self._latency:
+            time.sleep(self._latency if timeout is None else min(self._latency, timeout))
+            if timeout is not None and timeout < self._latency:
+                return None
+        self._done = True
+        return AnalyzeResult.from_dict(self._payload)
+
+    def done(self):
+        return self._done
+
+
+class AsyncFakePoller(FakePoller):
+    """ Imita AsyncLROPoller. """
+    async def result(self):
+        if self._latency:
+            await asyncio.sleep(self._latency)
+        self._done = True
+        return AnalyzeResult.from_dict(self._payload)
+
+
+class FakeDocumentAnalysisClient():
+    """
+    Cliente síncrono falso: begin_analyze_document entrega los resultados en orden circular.
+    La latencia simulada es latency + latency_per_page * páginas del resultado.
+    """
+    _poller_class = FakePoller
+
+    def __init__(self, payloads, latency=0.0, latency_per_page=0.0):
+        """
+        :param payloads: Lista de diccionarios con la forma de AnalyzeResult.to_dict().
+        :param latency: Latencia fija simulada por documento, en segundos.
+        :param latency_per_page: Latencia adicional simulada por página, en segundos.
+        """
+        if not payloads:
+            raise ValueError("Se requiere al menos un resultado para reproducir.")
+        self.payloads = list(payloads)
+        self.latency = latency
+        self.latency_per_page = latency_per_page
+        self.calls = 0
+        self._api_version = API_VERSION
+        self._cycle = itertools.cycle(self.payloads)
+        self._lock = threading.Lock()
+
+    def _next(self):
+        with self._lock:
+            self.calls += 1
+            payload = next(self._cycle)
+        latency = self.latency + self.latency_per_page * len(payload.get('pages') or [])
+        return self._poller_class(payload, latency)
+
+    def begin_analyze_document(self, model_id, document=None, **kwargs):
+        return self._next()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncFakeDocumentAnalysisClient(FakeDocumentAnalysisClient):
+    """ Cliente asíncrono falso, con la interfaz de azure.ai.formrecognizer.aio.DocumentAnalysisClient. """
+    _poller_class = AsyncFakePoller
+
+    async def begin_analyze_document(self, model_id, document=None, **kwargs):
+        return self._next()
+
+    async def close(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class FakeResponse():
+    """ Respuesta HTTP mínima para construir un HttpResponseError. """
+    def __init__(self, status_code, reason, headers=None):
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers or {}
+
+    def text(self, encoding=None):
+        return ''
+
+
+class ThrottlingFakeDocumentAnalysisClient(FakeDocumentAnalysisClient):
+    """
+    Cliente síncrono falso que imita la cuota del servicio: acepta como máximo quota envíos en cualquier ventana de un
+    segundo y responde 429 con Retry-After al resto; con error_rate > 0 también responde 503 de forma aleatoria.
+    """
+    def __init__(self, payloads, quota=15, error_rate=0.0, latency=0.0, latency_per_page=0.0, seed=None):
+        """
+        :param payloads: Lista de diccionarios con la forma de AnalyzeResult.to_dict().
+        :param quota: Envíos aceptados por segundo.
+        :param error_rate: Probabilidad de responder 503 a un envío aceptado por la cuota.
+        :param latency: Latencia fija simulada por documento, en segundos.
+        :param latency_per_page: Latencia adicional simulada por página, en segundos.
+        :param seed: Semilla de los errores aleatorios.
+        """
+        super().__init__(payloads, latency, latency_per_page)
+        self.quota = quota
+        self.error_rate = error_rate
+        self.accepted = []
+        self.throttled = 0
+        self.failed = 0
+        self._window = deque()
+        self._random = random.Random(seed)
+
+    def _admit(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._window and now - self._window[0] >= 1.0:
+                self._window.popleft()
+            if len(self._window) >= self.quota:
+                self.throttled += 1
+                retry_after = max(0.0, 1.0 - (now - self._window[0]))
+                raise HttpResponseError(message="Rate limit is exceeded.", response=FakeResponse(
+                    429, 'Too Many Requests', {'Retry-After': f"{retry_after:.3f}"}))
+            self._window.append(now)
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.failed += 1
+                raise HttpResponseError(message="Service unavailable.", response=FakeResponse(503, 'Service Unavailable'))
+            self.accepted.append(now)
+
+    def begin_analyze_document(self, model_id, document=None, **kwargs):
+        self._admit()
+        return self._next()
+
+
+class AsyncThrottlingFakeDocumentAnalysisClient(ThrottlingFakeDocumentAnalysisClient):
+    """ Versión asíncrona de ThrottlingFakeDocumentAnalysisClient. """
+    _poller_class = AsyncFakePoller
+
+    async def begin_analyze_document(self, model_id, document=None, **kwargs):
+        self._admit()
+        return self._next()
+
+    async def close(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
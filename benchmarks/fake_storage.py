@@ -0,0 +1,219 @@
+"""
+Cliente falso de Blob Storage en memoria, con leases que expiran, para probar BlobFunctions y BlobWorkQueue sin una
+cuenta de Azure ni el emulador Azurite.
+
+FakeBlobServiceClient imita get_container_client y get_blob_client; los contenedores guardan los blobs en un diccionario,
+aceptan subidas por bloques con stage_block y commit_block_list, y responden como el servicio a los conflictos: 409 al adquirir el lease de un blob con un lease activo, 412 al escribir
+un blob con lease sin indicarlo, ResourceExistsError al subir sin sobrescribir y ResourceNotFoundError si el blob no existe.
+Con latency > 0 cada operación espera esa latencia, como una llamada de red.
+"""
+import time
+import uuid
+import bisect
+import threading
+import itertools
+from types import SimpleNamespace
+from datetime import datetime, timezone
+
+from azure.core.exceptions import HttpResponseError, ResourceExistsError, ResourceNotFoundError
+
+from fake_client import FakeResponse
+
+
+def _error(error_class, status_code, reason, error_code):
+    error = error_class(message=reason, response=FakeResponse(status_code, reason))
+    error.error_code = error_code
+    return error
+
+
+class FakeLease():
+    """ Lease de un blob falso, con renew y release como BlobLeaseClient. """
+    def __init__(self, container, name, duration):
+        self.container = container
+        self.name = name
+        self.duration = duration
+        self.id = str(uuid.uuid4())
+
+    def renew(self):
+        self.container._renew(self.name, self.id, self.duration)
+
+    def release(self):
+        self.container._release(self.name, self.id)
+
+
+class FakeDownload():
+    def __init__(self, data):
+        self.data = data
+
+    def readall(self):
+        return self.data
+
+    def readinto(self, stream):
+        stream.write(self.data)
+        return len(self.data)
+
+
+class FakeBlobClient():
+    """ Cliente de un blob del contenedor falso. """
+    def __init__(self, container, name):
+        self.container = container
+        self.name = name
+
+    def upload_blob(self, data, overwrite=False, metadata=None, lease=None, **kwargs):
+        self.container._upload(self.name, data, overwrite, metadata, lease)
+
+    def stage_block(self, block_id, data, **kwargs):
+        self.container._stage(self.name, block_id, data)
+
+    def commit_block_list(self, block_list, content_settings=None, metadata=None, **kwargs):
+        self.container._commit(self.name, [block.id for block in block_list], content_settings, metadata)
+
+    def download_blob(self, **kwargs):
+        return FakeDownload(self.container._get(self.name)['data'])
+
+    def get_blob_properties(self, **kwargs):
+        return self.container._properties(self.name, self.container._get(self.name), include_metadata=True)
+
+    def acquire_lease(self, lease_duration=-1, lease_id=None, **kwargs):
+        return self.container._acquire(self.name, lease_duration)
+
+
+class FakeContainerClient():
+    """ Contenedor falso de Blob Storage en memoria. """
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.blobs = {}
+        self.names = []
+        self.staged = {}
+        self.requests = 0
+        self._versions = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _call(self):
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    @staticmethod
+    def _lease_state(blob, now):
+        if blob['lease_id'] is None:
+            return 'available'
+        return 'leased' if blob['lease_expires'] > now else 'expired'
+
+    def _properties(self, name, blob, include_metadata):
+        return SimpleNamespace(
+            name=name, etag=blob['etag'], size=len(blob['data']), last_modified=blob['last_modified'],
+            content_settings=blob.get('content_settings'),
+            metadata=dict(blob['metadata']) if include_metadata else None,
+            lease=SimpleNamespace(state=self._lease_state(blob, time.monotonic())))
+
+    def _get(self, name):
+        self._call()
+        with self._lock:
+            blob = self.blobs.get(name)
+            if blob is None:
+                raise _error(ResourceNotFoundError, 404, 'The specified blob does not exist.', 'BlobNotFound')
+            return blob
+
+    @staticmethod
+    def _bytes(data):
+        if isinstance(data, str):
+            return data.encode('utf-8')
+        if not isinstance(data, (bytes, bytearray)):
+            return data.read()
+        return data
+
+    def _upload(self, name, data, overwrite, metadata, lease, content_settings=None):
+        self._call()
+        data = self._bytes(data)
+        with self._lock:
+            blob = self.blobs.get(name)
+            if blob is not None:
+                if not overwrite:
+                    raise _error(ResourceExistsError, 409, 'The specified blob already exists.', 'BlobAlreadyExists')
+                if self._lease_state(blob, time.monotonic()) == 'leased' and getattr(lease, 'id', lease) != blob['lease_id']:
+                    raise _error(HttpResponseError, 412, 'There is currently a lease on the blob.', 'LeaseIdMissing')
+            if blob is None:
+                bisect.insort(self.names, name)
+            previous = blob or {'lease_id': None, 'lease_expires': 0.0}
+            self.blobs[name] = {'data': bytes(data), 'etag': f'"0x{next(self._versions):016X}"', 'metadata': dict(metadata or {}),
+                                'last_modified': datetime.now(timezone.utc), 'content_settings': content_settings,
+                                'lease_id': previous['lease_id'], 'lease_expires': previous['lease_expires']}
+
+    def _stage(self, name, block_id, data):
+        self._call()
+        data = bytes(self._bytes(data))
+        with self._lock:
+            self.staged.setdefault(name, {})[block_id] = data
+
+    def _commit(self, name, block_ids, content_settings, metadata):
+        """ Como en el servicio, el blob queda con los bloques de la lista en ese orden y se descartan los demás preparados. """
+        with self._lock:
+            staged = self.staged.pop(name, {})
+        missing = [block_id for block_id in block_ids if block_id not in staged]
+        if missing:
+            self._call()
+            raise _error(HttpResponseError, 400, 'The specified block list is invalid.', 'InvalidBlockList')
+        self._upload(name, b''.join(staged[block_id] for block_id in block_ids), True, metadata, None, content_settings)
+
+    def _acquire(self, name, duration):
+        self._call()
+        with self._lock:
+            blob = self.blobs.get(name)
+            if blob is None:
+                raise _error(ResourceNotFoundError, 404, 'The specified blob does not exist.', 'BlobNotFound')
+            if self._lease_state(blob, time.monotonic()) == 'leased':
+                raise _error(ResourceExistsError, 409, 'There is already a lease present.', 'LeaseAlreadyPresent')
+            lease = FakeLease(self, name, duration)
+            blob['lease_id'] = lease.id
+            blob['lease_expires'] = time.monotonic() + duration if duration > 0 else float('inf')
+            return lease
+
+    def _renew(self, name, lease_id, duration):
+        self._call()
+        with self._lock:
+            blob = self.blobs.get(name)
+            # Como en el servicio, un lease expirado se puede renovar mientras nadie más lo haya adquirido
+            if blob is None or blob['lease_id'] != lease_id:
+                raise _error(HttpResponseError, 409, 'The lease ID specified did not match.', 'LeaseIdMismatchWithLeaseOperation')
+            blob['lease_expires'] = time.monotonic() + duration if duration > 0 else float('inf')
+
+    def _release(self, name, lease_id):
+        self._call()
+        with self._lock:
+            blob = self.blobs.get(name)
+            if blob is None or blob['lease_id'] != lease_id:
+                raise _error(HttpResponseError, 409, 'The lease ID specified did not match.', 'LeaseIdMismatchWithLeaseOperation')
+            blob['lease_id'] = None
+            blob['lease_expires'] = 0.0
+
+    def list_blobs(self, name_starts_with='', include=None, **kwargs):
+        self._call()
+        include_metadata = include is not None and 'metadata' in include
+        prefix = name_starts_with or ''
+        with self._lock:
+            names = self.names[bisect.bisect_left(self.names, prefix):]
+            return [self._properties(name, self.blobs[name], include_metadata)
+                    for name in itertools.takewhile(lambda name: name.startswith(prefix), names)]
+
+    def get_blob_client(self, blob):
+        return FakeBlobClient(self, blob)
+
+    def upload_blob(self, name, data, overwrite=False, **kwargs):
+        self.get_blob_client(name).upload_blob(data, overwrite=overwrite, **kwargs)
+
+
+class FakeBlobServiceClient():
+    """ Servicio falso de Blob Storage: un FakeContainerClient por nombre de contenedor. """
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.containers = {}
+
+    def get_container_client(self, container):
+        if container not in self.containers:
+            self.containers[container] = FakeContainerClient(self.latency)
+        return self.containers[container]
+
+    def get_blob_client(self, container, blob):
+        return self.get_container_client(container).get_blob_client(blob)
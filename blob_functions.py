@@ -1,7 +1,21 @@
 import os
-from dotenv import load_dotenv
-from azure.storage.blob import BlobServiceClient
 import json
+import zlib
+import logging
+import base64
+import tempfile
+from collections import deque
+
+from change_index import ChangeIndex
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from metrics import metrics
+from lazy_imports import lazy_import
+import clients
+
+storage_blob = lazy_import('azure.storage.blob')
+zstandard = lazy_import('zstandard')
+
+logger = logging.getLogger(__name__)
 
 class BlobFunctions():
     """
@@ -15,6 +29,10 @@ class BlobFunctions():
         Los archivos a descargar se filtran por su ubicación dentro de una carpeta del contenedor y por su extensión o un sufijo en su nombre. 
         Este método devuelve una lista de diccionarios, cada uno con el nombre y el contenido en bytes del archivo descargado.
 
+    iter_files_from_blob:
+        Variante en streaming de extract_file_from_blob. Entrega los archivos a medida que se descargan, adelantando en paralelo
+        la descarga de los siguientes dentro de un presupuesto de memoria, y guarda los archivos grandes en archivos temporales.
+
     save_json_to_blob: 
         Guarda un objeto de datos (usualmente un diccionario) en un archivo JSON dentro de un contenedor específico.
         Este método es útil para almacenar resultados de procesamiento, configuraciones u otro tipo de estructuras de datos JSON en Blob Storage.
@@ -23,48 +41,218 @@ class BlobFunctions():
         Ofrece flexibilidad para subir archivos a Blob Storage, permitiendo tanto la carga de archivos desde una ruta local como la subida directa
         de objetos de archivo en memoria. Esto es especialmente útil para aplicaciones que necesitan cargar archivos recibidos desde una interfaz web 
         o de otras fuentes no basadas en el sistema de archivos local.
-    """
-    def __init__(self):
 
+    save_jsonl_to_blob:
+        Guarda registros como JSON Lines comprimido (gzip o zstd) en streaming, subiendo el contenido por bloques.
+
+    upload_many:
+        Sube muchos archivos de forma concurrente sobre un pool de conexiones compartido.
+
+    list_changed_blobs / handle_deleted_blobs:
+        En modo incremental, listan los blobs nuevos o modificados según un ChangeIndex y marcan o eliminan del índice los
+        blobs que desaparecieron del origen.
+    """
+    def __init__(self, blob_service_client=None, connection_pool_size=32):
+        """
+        :param blob_service_client: Cliente de servicio opcional (por ejemplo, apuntando a un emulador local de Blob Storage);
+                                    si no se proporciona, se construye a partir de las variables de entorno.
+        :param connection_pool_size: Número máximo de conexiones HTTP reutilizables compartidas por las subidas y descargas concurrentes.
+        """
         current_dir = os.path.dirname(os.path.abspath(__file__))
         dotenv_path = os.path.join(current_dir, '..', '.env')  # Sube un nivel en la estructura de directorios
-        load_dotenv(dotenv_path, override=True)
+        clients.load_environment(dotenv_path)
 
         self.account_name = os.environ.get('AZURE_BLOB_STORAGE_BLOB_NAME')
         self.account_key = os.environ.get('AZURE_BLOB_STORAGE_KEY')
         self.container_name = os.environ.get('AZURE_BLOB_STORAGE_CONTAINER_NAME')
 
-        connection_string = f"DefaultEndpointsProtocol=https;AccountName={self.account_name};AccountKey={self.account_key};EndpointSuffix=core.windows.net"
-        self.blob_service_client = BlobServiceClient.from_connection_string(connection_string)
+        if blob_service_client is None:
+            # Una cadena de conexión explícita permite usar un emulador local (Azurite) en lugar de la cuenta de Azure
+            connection_string = os.environ.get('AZURE_BLOB_STORAGE_CONNECTION_STRING') or \
+                f"DefaultEndpointsProtocol=https;AccountName={self.account_name};AccountKey={self.account_key};EndpointSuffix=core.windows.net"
+
+            # Un solo cliente por proceso, sobre la sesión HTTP compartida con el cliente de Form Recognizer
+            blob_service_client = clients.blob_service_client(connection_string, connection_pool_size)
+
+        self.blob_service_client = blob_service_client
         self.container_client = self.blob_service_client.get_container_client(self.container_name)
 
-    def extract_file_from_blob(self, blob_folder_path, end):
+    def extract_file_from_blob(self, blob_folder_path, end, change_index=None, on_deleted='flag'):
         """
         Descarga archivos desde una carpeta específica en Azure Blob Storage.
 
         :param blob_folder_path: Ruta de la carpeta dentro del contenedor desde donde descargar los archivos.
         :param end: Extensión de archivo o cadena final para filtrar los archivos a descargar.
+        :param change_index: ChangeIndex opcional; si se proporciona, solo se descargan los blobs nuevos o modificados.
+        :param on_deleted: Con change_index, qué hacer con los blobs eliminados del origen (ver handle_deleted_blobs).
         :return: Lista de diccionarios con los nombres de archivos y su contenido en bytes.
         """
-        print(f"Iniciando carga de archivos desde {blob_folder_path}")
+        logger.info("Iniciando carga de archivos desde %s", blob_folder_path)
 
-        blob_list = [blob.name for blob in self.container_client.list_blobs(name_starts_with=f'{blob_folder_path}/')]
+        if change_index is not None:
+            blob_list, deleted = self.list_changed_blobs(blob_folder_path, end, change_index)
+            if deleted:
+                self.handle_deleted_blobs(deleted, change_index, on_deleted)
+                change_index.save()
+        else:
+            with metrics.timer('blob_list'):
+                blob_list = [blob for blob in self.container_client.list_blobs(name_starts_with=f'{blob_folder_path}/')]
         files_list = []
 
-        for blob_name in blob_list:
+        for blob in blob_list:
+            blob_name = blob.name
             if blob_name.lower().endswith(end):
-                print(f"Loading {blob_name}")
-                blob_client = self.blob_service_client.get_blob_client(container=self.container_name, blob=blob_name)
-                download_stream = blob_client.download_blob()
-                pdf_bytes = download_stream.readall()
+                logger.debug("Loading %s", blob_name)
+                with metrics.timer('blob_download'):
+                    blob_client = self.blob_service_client.get_blob_client(container=self.container_name, blob=blob_name)
+                    download_stream = blob_client.download_blob()
+                    pdf_bytes = download_stream.readall()
+                metrics.increment('blob_downloaded_bytes', len(pdf_bytes))
+                metrics.increment('blob_downloaded_files')
 
                 files_list.append({
                     'file_name': blob_name.split('/')[-1],  # Asume que el nombre del archivo está después del último '/'
-                    'file': pdf_bytes
+                    'file': pdf_bytes,
+                    'blob_name': blob_name,
+                    'signature': ChangeIndex.blob_signature(blob),
                 })
 
         return files_list
 
+    def list_changed_blobs(self, blob_folder_path, end, change_index):
+        """
+        Lista los blobs nuevos o modificados de una carpeta usando los metadatos de list_blobs (ETag, fecha de modificación, MD5),
+        sin descargar nada, y detecta los blobs registrados en el índice que ya no existen en el origen.
+
+        :param blob_folder_path: Ruta de la carpeta dentro del contenedor.
+        :param end: Extensión de archivo o cadena final para filtrar los archivos.
+        :param change_index: Instancia de ChangeIndex.
+        :return: Tupla (lista de propiedades de los blobs a procesar, lista de nombres eliminados del origen).
+        """
+        prefix = f'{blob_folder_path}/'
+        changed = []
+        present = set()
+        with metrics.timer('blob_list'):
+            for blob in self.container_client.list_blobs(name_starts_with=prefix):
+                if not blob.name.lower().endswith(end):
+                    continue
+                present.add(blob.name)
+                if change_index.is_changed(blob):
+                    changed.append(blob)
+
+        deleted = change_index.deleted(present, prefix)
+        metrics.increment('blob_changed', len(changed))
+        metrics.increment('blob_deleted', len(deleted))
+        logger.info("Blobs en %s: %d, modificados: %d, eliminados: %d", blob_folder_path, len(present), len(changed), len(deleted))
+        return changed, deleted
+
+    def handle_deleted_blobs(self, deleted, change_index, on_deleted='flag'):
+        """
+        Actualiza el índice de cambios con los blobs que ya no existen en el origen. No guarda el índice.
+
+        :param deleted: Nombres de los blobs eliminados, como los retorna list_changed_blobs.
+        :param change_index: Instancia de ChangeIndex.
+        :param on_deleted: 'flag' los marca como eliminados en el índice; 'remove' los elimina de él.
+        :return: Lista de entradas afectadas, con la ubicación de su salida para marcarla o borrarla.
+        """
+        if on_deleted == 'remove':
+            entries = change_index.remove(deleted)
+        elif on_deleted == 'flag':
+            entries = change_index.flag_deleted(deleted)
+        else:
+            raise ValueError(f"Acción no soportada para blobs eliminados: {on_deleted}")
+        for entry in entries:
+            logger.info("Blob eliminado del origen (%s): %s, salida: %s", on_deleted, entry['blob_name'], entry.get('output'))
+        return entries
+
+    def iter_files_from_blob(self, blob_folder_path, end, prefetch=4, max_concurrency=4,
+                             spool_threshold=8 * 1024 * 1024, memory_budget=256 * 1024 * 1024, change_index=None,
+                             on_deleted='flag'):
+        """
+        Versión en streaming de extract_file_from_blob: entrega los archivos uno a uno, en el orden del listado, mientras
+        descarga en paralelo los siguientes. Los archivos se filtran durante el listado, antes de descargar nada.
+
+        :param blob_folder_path: Ruta de la carpeta dentro del contenedor desde donde descargar los archivos.
+        :param end: Extensión de archivo o cadena final para filtrar los archivos a descargar.
+        :param prefetch: Número de archivos que se descargan por adelantado en paralelo.
+        :param max_concurrency: Conexiones paralelas que usa el SDK para descargar por bloques cada archivo.
+        :param spool_threshold: Tamaño en bytes a partir del cual el archivo se guarda en un SpooledTemporaryFile en vez de bytes.
+        :param memory_budget: Máximo de bytes en memoria reservados por las descargas adelantadas.
+        :param change_index: ChangeIndex opcional; si se proporciona, solo se descargan los blobs nuevos o modificados.
+        :param on_deleted: Con change_index, qué hacer con los blobs eliminados del origen (ver handle_deleted_blobs).
+        :return: Generador de diccionarios con el nombre del archivo, su contenido (bytes u objeto de archivo) y su tamaño.
+        """
+        logger.info("Iniciando carga en streaming de archivos desde %s", blob_folder_path)
+
+        if change_index is not None:
+            changed, deleted = self.list_changed_blobs(blob_folder_path, end, change_index)
+            if deleted:
+                self.handle_deleted_blobs(deleted, change_index, on_deleted)
+                change_index.save()
+            listing = iter(changed)
+        else:
+            listing = (blob for blob in self.container_client.list_blobs(name_starts_with=f'{blob_folder_path}/')
+                       if blob.name.lower().endswith(end))
+
+        pending = deque()
+        reserved = 0
+        next_blob = next(listing, None)
+
+        with ThreadPoolExecutor(max_workers=prefetch) as executor:
+            try:
+                while True:
+                    while next_blob is not None and len(pending) < prefetch:
+                        # Un archivo grande solo ocupa en memoria hasta spool_threshold; el resto va a disco
+                        cost = min(next_blob.size or 0, spool_threshold)
+                        if pending and reserved + cost > memory_budget:
+                            break
+                        future = executor.submit(self._download_blob, next_blob, max_concurrency, spool_threshold)
+                        pending.append((future, cost))
+                        reserved += cost
+                        next_blob = next(listing, None)
+
+                    if not pending:
+                        break
+
+                    future, cost = pending.popleft()
+                    yield future.result()
+                    reserved -= cost
+            finally:
+                for future, _ in pending:
+                    future.cancel()
+
+    def _download_blob(self, blob, max_concurrency, spool_threshold):
+        """
+        Descarga un blob, como bytes si es pequeño o en un SpooledTemporaryFile si supera spool_threshold.
+
+        :param blob: Propiedades del blob retornadas por list_blobs.
+        :param max_concurrency: Conexiones paralelas para la descarga por bloques.
+        :param spool_threshold: Tamaño en bytes a partir del cual se usa un archivo temporal.
+        :return: Diccionario con el nombre del archivo, su contenido y su tamaño.
+        """
+        logger.debug("Loading %s", blob.name)
+        with metrics.timer('blob_download'):
+            blob_client = self.blob_service_client.get_blob_client(container=self.container_name, blob=blob.name)
+            download_stream = blob_client.download_blob(max_concurrency=max_concurrency)
+
+            if blob.size is not None and blob.size > spool_threshold:
+                file = tempfile.SpooledTemporaryFile(max_size=spool_threshold)
+                n_bytes = download_stream.readinto(file)
+                file.seek(0)
+            else:
+                file = download_stream.readall()
+                n_bytes = len(file)
+        metrics.increment('blob_downloaded_bytes', n_bytes or 0)
+        metrics.increment('blob_downloaded_files')
+
+        return {
+            'file_name': blob.name.split('/')[-1],
+            'file': file,
+            'size': blob.size,
+            'blob_name': blob.name,
+            'signature': ChangeIndex.blob_signature(blob),
+        }
+
     def save_json_to_blob(self, blob_folder_path, file_name, content, file_name_json_out='texts_clausulados.json'):
 
         """
@@ -75,7 +263,7 @@ class BlobFunctions():
         :param content: Contenido del archivo a guardar.
         :param file_name_json_out: Nombre opcional del archivo de salida, por defecto 'texts_clausulados.json'.
         """
-        print(f"Iniciando guardado de archivo en {blob_folder_path}/{file_name}")
+        logger.info("Iniciando guardado de archivo en %s/%s", blob_folder_path, file_name)
 
         blob_client = self.blob_service_client.get_blob_client(container=self.container_name, blob=f"{blob_folder_path}/{file_name}")
 
@@ -83,8 +271,147 @@ class BlobFunctions():
         content_as_string = json.dumps(content, ensure_ascii=False, indent=4)
 
         # Subir el contenido al Blob Storage como una cadena
-        blob_client.upload_blob(content_as_string, overwrite=True)
-        print(f"Archivo {file_name} guardado en {blob_folder_path}/")
+        with metrics.timer('blob_upload'):
+            blob_client.upload_blob(content_as_string, overwrite=True)
+        metrics.increment('blob_uploaded_bytes', len(content_as_string.encode('utf-8')))
+        logger.info("Archivo %s guardado en %s/", file_name, blob_folder_path)
+
+    @staticmethod
+    def _compressor(compression):
+        """
+        Crea un compresor incremental con métodos compress y flush.
+
+        :param compression: 'gzip', 'zstd' o None.
+        :return: Tupla (compresor, content_encoding, extensión).
+        """
+        if compression == 'gzip':
+            return zlib.compressobj(6, zlib.DEFLATED, 31), 'gzip', '.gz'
+        elif compression == 'zstd':
+            return zstandard.ZstdCompressor().compressobj(), 'zstd', '.zst'
+        elif compression is None:
+            class Identity():
+                def compress(self, data):
+                    return data
+
+                def flush(self):
+                    return b''
+            return Identity(), None, ''
+        else:
+            raise ValueError(f"Compresión no soportada: {compression}")
+
+    def save_jsonl_to_blob(self, blob_folder_path, file_name, records, compression='gzip',
+                           block_size=4 * 1024 * 1024, max_concurrency=4):
+        """
+        Guarda una secuencia de registros como JSON Lines comprimido, en streaming y por bloques, sin construir
+        el contenido completo en memoria. Cada bloque se sube con stage_block a medida que se llena y al final
+        se confirma la lista de bloques.
+
+        :param blob_folder_path: Ruta de la carpeta dentro del contenedor donde se guardará el archivo.
+        :param file_name: Nombre del archivo a guardar; se le agrega la extensión de la compresión si no la tiene.
+        :param records: Iterable de objetos serializables a JSON; cada uno se escribe en una línea.
+        :param compression: 'gzip', 'zstd' o None.
+        :param block_size: Tamaño en bytes (comprimidos) de cada bloque subido.
+        :param max_concurrency: Número de bloques subidos en paralelo.
+        :return: Diccionario con la ruta del blob, el número de registros y los bytes subidos.
+        """
+        compressor, content_encoding, extension = self._compressor(compression)
+        if not file_name.endswith(extension):
+            file_name = f"{file_name}{extension}"
+        blob_path = f"{blob_folder_path}/{file_name}"
+        logger.info("Iniciando guardado en streaming de %s", blob_path)
+
+        blob_client = self.blob_service_client.get_blob_client(container=self.container_name, blob=blob_path)
+
+        block_ids = []
+        pending = deque()
+        buffer = bytearray()
+        n_records = 0
+        n_bytes = 0
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+
+            def put(block_id, data):
+                with metrics.timer('blob_stage_block'):
+                    blob_client.stage_block(block_id, data)
+
+            def stage(data):
+                block_id = base64.b64encode(f"{len(block_ids):08d}".encode()).decode()
+                block_ids.append(block_id)
+                pending.append(executor.submit(put, block_id, data))
+                # Se limita el número de bloques en vuelo para acotar la memoria
+                while len(pending) > max_concurrency:
+                    pending.popleft().result()
+
+            for record in records:
+                buffer += compressor.compress((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
+                n_records += 1
+                if len(buffer) >= block_size:
+                    n_bytes += len(buffer)
+                    stage(bytes(buffer))
+                    buffer = bytearray()
+
+            buffer += compressor.flush()
+            if buffer or not block_ids:
+                n_bytes += len(buffer)
+                stage(bytes(buffer))
+
+            while pending:
+                pending.popleft().result()
+
+        blob_client.commit_block_list([storage_blob.BlobBlock(block_id=block_id) for block_id in block_ids],
+                                      content_settings=storage_blob.ContentSettings(content_type='application/x-ndjson',
+                                                                       content_encoding=content_encoding))
+        metrics.increment('blob_uploaded_bytes', n_bytes)
+        logger.info("Archivo %s guardado en %s/ (%d registros, %d bytes)", file_name, blob_folder_path, n_records, n_bytes)
+        return {'blob': blob_path, 'records': n_records, 'bytes': n_bytes}
+
+    def upload_many(self, items, dir_destiny, max_workers=16, overwrite=True):
+        """
+        Sube muchos archivos de forma concurrente reutilizando el pool de conexiones del cliente. Los elementos se leen
+        a medida que hay lugar: como máximo 2 * max_workers contenidos quedan en memoria a la espera de subirse.
+
+        :param items: Iterable de diccionarios {'file_name', 'content'}; content puede ser bytes, str u objeto serializable a JSON.
+        :param dir_destiny: Directorio de destino dentro del contenedor.
+        :param max_workers: Número de subidas simultáneas.
+        :param overwrite: Si es True, sobrescribe los blobs existentes.
+        :return: Lista de diccionarios {'file_name', 'blob', 'error'} en orden de finalización.
+        """
+        def upload(item):
+            blob_path = f"{dir_destiny}/{item['file_name']}"
+            content = item['content']
+            if not isinstance(content, (bytes, bytearray, str)):
+                content = json.dumps(content, ensure_ascii=False)
+            if isinstance(content, str):
+                content = content.encode('utf-8')
+            with metrics.timer('blob_upload'):
+                self.container_client.upload_blob(name=blob_path, data=content, overwrite=overwrite)
+            metrics.increment('blob_uploaded_bytes', len(content))
+            return blob_path
+
+        results = []
+
+        def collect(future, file_name):
+            try:
+                results.append({'file_name': file_name, 'blob': future.result(), 'error': None})
+            except Exception as e:
+                metrics.increment('blob_upload_errors')
+                logger.warning("Error al subir %s: %s", file_name, e)
+                results.append({'file_name': file_name, 'blob': None, 'error': e})
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {}
+            for item in items:
+                # Se limita el número de subidas en vuelo para no retener todo el lote en memoria
+                if len(pending) >= 2 * max_workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        collect(future, pending.pop(future))
+                pending[executor.submit(upload, item)] = item['file_name']
+            for future in as_completed(pending):
+                collect(future, pending[future])
+
+        logger.info("Subidos %d de %d archivos a %s/", sum(r['error'] is None for r in results), len(results), dir_destiny)
+        return results
 
     def upload_blob(self, file_name, dir_destiny, file_path=None, file_obj=None):
         """
@@ -99,14 +426,16 @@ class BlobFunctions():
 
         if file_obj is not None:
             # Subir desde un objeto de archivo en memoria
-            print(f"Subiendo archivo desde el objeto en memoria a {blob_full_path}")
-            blob_client = self.container_client.upload_blob(name=blob_full_path, data=file_obj, overwrite=True)
+            logger.info("Subiendo archivo desde el objeto en memoria a %s", blob_full_path)
+            with metrics.timer('blob_upload'):
+                blob_client = self.container_client.upload_blob(name=blob_full_path, data=file_obj, overwrite=True)
         elif file_path is not None:
             # Subir desde una ruta local
-            print(f"Subiendo archivo desde la ruta local {file_path} a {blob_full_path}")
-            with open(file_path, "rb") as data:
+            logger.info("Subiendo archivo desde la ruta local %s a %s", file_path, blob_full_path)
+            metrics.increment('blob_uploaded_bytes', os.path.getsize(file_path))
+            with open(file_path, "rb") as data, metrics.timer('blob_upload'):
                 blob_client = self.container_client.upload_blob(name=blob_full_path, data=data, overwrite=True)
         else:
             raise ValueError("Debe proporcionarse file_path o file_obj.")
 
-        print(f"Archivo subido con éxito como {blob_full_path} al contenedor {self.container_name}.")
\ No newline at end of file
+        logger.info("Archivo subido con éxito como %s al contenedor %s.", blob_full_path, self.container_name)
\ No newline at end of file
@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import tempfile
+import threading
+
+
+class ChangeIndex():
+    """
+    La clase ChangeIndex mantiene un índice de los blobs ya procesados (nombre, ETag, fecha de modificación, tamaño,
+    hash del contenido y ubicación de la salida) para procesar de forma incremental solo los archivos nuevos o modificados.
+    Con los metadatos que ya entrega list_blobs se decide, antes de descargar, qué blobs cambiaron; los blobs que
+    desaparecen del origen se detectan para marcar o eliminar sus salidas.
+    """
+    def __init__(self, path):
+        """
+        :param path: Ruta del archivo JSON donde se guarda el índice.
+        """
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    @staticmethod
+    def blob_signature(blob):
+        """
+        Extrae de las propiedades de list_blobs los datos que identifican una versión del blob.
+
+        :param blob: Propiedades del blob retornadas por list_blobs.
+        :return: Diccionario con etag, last_modified, size y content_md5.
+        """
+        last_modified = getattr(blob, 'last_modified', None)
+        content_settings = getattr(blob, 'content_settings', None)
+        content_md5 = getattr(content_settings, 'content_md5', None) if content_settings is not None else None
+        return {
+            'etag': getattr(blob, 'etag', None),
+            'last_modified': last_modified.isoformat() if hasattr(last_modified, 'isoformat') else last_modified,
+            'size': getattr(blob, 'size', None),
+            'content_md5': bytes(content_md5).hex() if content_md5 else None,
+        }
+
+    def is_changed(self, blob):
+        """
+        Indica si un blob es nuevo o cambió desde la última vez que se procesó.
+
+        :param blob: Propiedades del blob retornadas por list_blobs.
+        :return: True si el blob debe procesarse.
+        """
+        entry = self.entries.get(blob.name)
+        if entry is None or entry.get('deleted'):
+            return True
+        signature = self.blob_signature(blob)
+        if signature['etag'] and signature['etag'] == entry.get('etag'):
+            return False
+        # Con un ETag distinto, un MD5 igual indica que solo cambiaron los metadatos
+        if signature['content_md5'] and signature['content_md5'] == entry.get('content_md5'):
+            return False
+        if signature['etag']:
+            return True
+        return (signature['last_modified'], signature['size']) != (entry.get('last_modified'), entry.get('size'))
+
+    def is_same_content(self, blob_name, content_hash):
+        """
+        Indica si el contenido descargado es idéntico al ya procesado (por ejemplo, un archivo vuelto a subir sin cambios).
+
+        :param blob_name: Nombre completo del blob.
+        :param content_hash: Hash del contenido descargado.
+        :return: True si el hash coincide con el registrado.
+        """
+        entry = self.entries.get(blob_name)
+        return entry is not None and not entry.get('deleted') and entry.get('content_hash') == content_hash
+
+    def record(self, blob_name, signature, content_hash=None, output=None):
+        """
+        Registra un blob como procesado.
+
+        :param blob_name: Nombre completo del blob.
+        :param signature: Diccionario retornado por blob_signature.
+        :param content_hash: Hash del contenido procesado (opcional).
+        :param output: Ubicación de la salida generada (opcional).
+        """
+        with self._lock:
+            self.entries[blob_name] = {**signature, 'content_hash': content_hash, 'output': output,
+                                       'processed_at': time.time(), 'deleted': False}
+
+    def deleted(self, present_names, prefix=''):
+        """
+        Retorna los blobs registrados bajo un prefijo que ya no existen en el origen.
+
+        :param present_names: Conjunto de nombres presentes en el listado actual.
+        :param prefix: Prefijo (carpeta) del listado.
+        :return: Lista de nombres eliminados del origen.
+        """
+        with self._lock:
+            return [name for name, entry in self.entries.items()
+                    if name.startswith(prefix) and name not in present_names and not entry.get('deleted')]
+
+    def flag_deleted(self, names):
+        """
+        Marca como eliminados los blobs indicados, conservando la ubicación de su salida.
+
+        :param names: Nombres de los blobs eliminados.
+        :return: Lista de entradas marcadas.
+        """
+        flagged = []
+        with self._lock:
+            for name in names:
+                entry = self.entries.get(name)
+                if entry is not None:
+                    entry['deleted'] = True
+                    entry['deleted_at'] = time.time()
+                    flagged.append({'blob_name': name, **entry})
+        return flagged
+
+    def remove(self, names):
+        """
+        Elimina del índice los blobs indicados.
+
+        :param names: Nombres de los blobs eliminados.
+        :return: Lista de entradas eliminadas (con su ubicación de salida, para borrarla si se desea).
+        """
+        removed = []
+        with self._lock:
+            for name in names:
+                entry = self.entries.pop(name, None)
+                if entry is not None:
+                    removed.append({'blob_name': name, **entry})
+        return removed
+
+    def save(self):
+        """ Guarda el índice de forma atómica. """
+        with self._lock:
+            content = json.dumps(self.entries, ensure_ascii=False)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, self.path)
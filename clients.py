@@ -0,0 +1,123 @@
+import os
+import logging
+import threading
+
+from lazy_imports import lazy_import, load
+
+dotenv = lazy_import('dotenv')
+requests = lazy_import('requests')
+transport = lazy_import('azure.core.pipeline.transport')
+credentials = lazy_import('azure.core.credentials')
+formrecognizer = lazy_import('azure.ai.formrecognizer')
+storage_blob = lazy_import('azure.storage.blob')
+
+logger = logging.getLogger(__name__)
+
+# Conexiones HTTP reutilizables por host en la sesión compartida
+DEFAULT_POOL_SIZE = 32
+
+_lock = threading.RLock()
+_loaded_env_files = set()
+_session = None
+_pool_size = 0
+_clients = {}
+
+
+def load_environment(dotenv_path):
+    """
+    Carga un archivo de variables de entorno una sola vez por proceso.
+
+    :param dotenv_path: Ruta del archivo .env.
+    """
+    path = os.path.abspath(dotenv_path)
+    with _lock:
+        if path in _loaded_env_files:
+            return
+        dotenv.load_dotenv(path, override=True)
+        _loaded_env_files.add(path)
+
+
+def shared_session(pool_size=DEFAULT_POOL_SIZE):
+    """
+    :param pool_size: Conexiones reutilizables por host. Si es mayor que el pool actual de la sesión, se monta un adaptador
+                      con el tamaño pedido; el anterior deja de recibir solicitudes y sus conexiones terminan las que tenga
+                      en curso.
+    :return: Sesión de requests del proceso, con un pool de conexiones compartido por todos los clientes.
+    """
+    global _session, _pool_size
+    with _lock:
+        if _session is None:
+            _session = requests.Session()
+        if pool_size > _pool_size:
+            adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+            _pool_size = pool_size
+        return _session
+
+
+def shared_transport(pool_size=DEFAULT_POOL_SIZE):
+    """
+    :return: RequestsTransport sobre la sesión compartida; cerrar un cliente no cierra la sesión.
+    """
+    return transport.RequestsTransport(session=shared_session(pool_size), session_owner=False)
+
+
+def _cached(key, build):
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = build()
+        return client
+
+
+def document_analysis_client(endpoint, key):
+    """
+    :param endpoint: Endpoint de Form Recognizer.
+    :param key: Llave de acceso.
+    :return: DocumentAnalysisClient del proceso para esas credenciales, creado una sola vez.
+    """
+    return _cached(('document_analysis', endpoint, key), lambda: formrecognizer.DocumentAnalysisClient(
+        endpoint=endpoint, credential=credentials.AzureKeyCredential(key=key), transport=shared_transport()))
+
+
+def blob_service_client(connection_string, pool_size=DEFAULT_POOL_SIZE):
+    """
+    :param connection_string: Cadena de conexión de la cuenta de almacenamiento (o del emulador Azurite).
+    :param pool_size: Conexiones reutilizables por host de la sesión compartida.
+    :return: BlobServiceClient del proceso para esa cadena de conexión, creado una sola vez.
+    """
+    return _cached(('blob_service', connection_string), lambda: storage_blob.BlobServiceClient.from_connection_string(
+        connection_string, transport=shared_transport(pool_size)))
+
+
+def warm_up(document_intelligence=True, blob_storage=True, background=True, dotenv_path="../.env"):
+    """
+    Importa las dependencias pesadas y crea los clientes antes de la primera solicitud, por ejemplo al cargar el módulo de
+    una Azure Function. En segundo plano, el arranque no espera y la primera solicitud encuentra todo listo o a medio camino.
+
+    :param document_intelligence: Si es True, se prepara el cliente de Form Recognizer y las librerías de procesamiento.
+    :param blob_storage: Si es True, se prepara el cliente de Blob Storage.
+    :param background: Si es True, la preparación se hace en un hilo demonio.
+    :param dotenv_path: Ruta del archivo de variables de entorno de DocumentIntelligence.
+    :return: El hilo de la preparación, o None si se hizo en el hilo actual.
+    """
+    def run():
+        try:
+            if document_intelligence:
+                from document_intelligence_functions import DocumentIntelligence
+                import pandas  # noqa: F401
+                DocumentIntelligence(dotenv_path=dotenv_path)
+                load(formrecognizer)
+            if blob_storage:
+                from blob_functions import BlobFunctions
+                BlobFunctions()
+        except Exception as e:
+            logger.warning("No fue posible preparar los clientes: %s", e)
+
+    if not background:
+        run()
+        return None
+    thread = threading.Thread(target=run, name='warm-up', daemon=True)
+    thread.start()
+    return thread
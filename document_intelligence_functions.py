@@ -1,12 +1,29 @@
 import os
-import pdb
-import dotenv
-import numpy as np
-import pandas as pd
-from azure.ai.formrecognizer import DocumentAnalysisClient
-from azure.core.credentials import AzureKeyCredential
-from difflib import get_close_matches
-import pdb
+import queue
+import logging
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from lazy_imports import lazy_import
+import clients
+from document_session import DocumentSession
+from document_sharding import count_pages, shard_ranges, split_pdf, select_pages, merge_results
+from text_layer import inspect_pages
+from page_dedup import page_fingerprints, split_by_page, assemble_pages
+from document_model import CompactDocument
+from layout_templates import SpatialIndex, LayoutTemplate
+from table_engine import table_to_frame
+from header_matching import get_header_matcher
+from metrics import metrics, COUNT_BUCKETS
+from request_scheduler import RequestScheduler
+
+pd = lazy_import('pandas')
+formrecognizer = lazy_import('azure.ai.formrecognizer')
+formrecognizer_aio = lazy_import('azure.ai.formrecognizer.aio')
+credentials = lazy_import('azure.core.credentials')
+
+logger = logging.getLogger(__name__)
 
 class DocumentIntelligence():
     """La clase DocumentIntelligence está diseñada para aprovechar las capacidades avanzadas del servicio Azure Form Recognizer,
@@ -23,15 +40,387 @@ class DocumentIntelligence():
         _extract_tables:
             Un método auxiliar dedicado a la extracción y transformación de tablas detectadas en los documentos analizados.
               Convierte las tablas identificadas por Azure Form Recognizer en DataFrames de Pandas, facilitando su manipulación y análisis posterior
-                en aplicaciones de análisis de datos y machine learning."""
+                en aplicaciones de análisis de datos y machine learning.
+
+        open_session:
+            Crea una DocumentSession que analiza el documento una única vez y deriva de ese resultado, bajo demanda,
+              el texto por página, las tablas crudas y las tablas estructuradas.
+
+        analyze_many / analyze_many_async:
+            Analizan un lote de documentos de forma concurrente sobre el cliente asíncrono de Form Recognizer, con un límite
+              de documentos en vuelo, entregando los resultados en orden de finalización y aislando los errores por documento.
+
+        analyze_sharded:
+            Divide un PDF extenso en fragmentos de páginas, los analiza en paralelo y une el resultado con las páginas corregidas.
+
+        learn_template / extract_with_template:
+            Registran la disposición de un formulario conocido a partir de un documento anotado y extraen sus campos en los
+              documentos del mismo tipo consultando un índice espacial, sin comparar encabezados ni dividir textos."""
     
-    def __init__(self, dotenv_path="../.env"):
-        dotenv.load_dotenv(dotenv_path, override=True)
+    def __init__(self, dotenv_path="../.env", cache=None, scheduler=None, local_text_layer=False, page_cache=None,
+                 compact=False, structuring_pool=None):
+        """
+        :param dotenv_path: Ruta del archivo de variables de entorno con las credenciales.
+        :param cache: Instancia opcional de AnalysisCache para reutilizar resultados de análisis previos.
+        :param scheduler: RequestScheduler que controla la cuota, los reintentos y las consultas; por defecto uno con
+                          la cuota del nivel S0 (15 solicitudes por segundo).
+        :param local_text_layer: Si es True, analyze_read extrae localmente el texto de las páginas con capa de texto y sin
+                                 tablas, y solo envía a Form Recognizer las páginas escaneadas o con tablas.
+        :param page_cache: Instancia opcional de AnalysisCache para reutilizar el resultado de páginas idénticas (portadas,
+                           textos legales, formularios estándar) entre documentos; solo se envían las páginas nuevas.
+        :param compact: Si es True, los resultados se entregan como document_model.CompactDocument, que conserva solo
+                        el texto de las líneas y las tablas en arreglos compactos en vez de los objetos del SDK.
+        :param structuring_pool: StructuringPool opcional; si se proporciona, la estructuración de tablas se ejecuta en sus
+                                 procesos y no en el hilo que la solicita.
+        """
+        # El archivo .env se lee una vez por proceso y el cliente, con su pool de conexiones, se comparte entre instancias
+        clients.load_environment(dotenv_path)
         self.endpoint = os.environ.get('AZURE_FORM_RECOGNIZER_ENDPOINT')
         self.key = os.environ.get('AZURE_FORM_RECOGNIZER_API_KEY')
-        self.document_analysis_client = DocumentAnalysisClient(
-            endpoint=self.endpoint, credential=AzureKeyCredential(key=self.key)
-        )
+        self.document_analysis_client = clients.document_analysis_client(self.endpoint, self.key)
+        self.cache = cache
+        self.scheduler = scheduler if scheduler is not None else RequestScheduler()
+        self.local_text_layer = local_text_layer
+        self.page_cache = page_cache
+        self.compact = compact
+        self.structuring_pool = structuring_pool
+
+    @staticmethod
+    def _read_document(file_obj=None, file_path=None):
+        """
+        Obtiene los bytes del documento a partir de un objeto en memoria o de una ruta de archivo.
+
+        :param file_obj: Bytes u objeto de archivo en memoria (BytesIO, por ejemplo).
+        :param file_path: Ruta del archivo PDF.
+        :return: Bytes del documento.
+        """
+        if file_obj is not None:
+            if hasattr(file_obj, 'read'):
+                return file_obj.read()
+            return file_obj
+        elif file_path is not None:
+            with open(file_path, "rb") as f:
+                return f.read()
+        else:
+            raise ValueError("Debe proporcionarse 'file_obj' o 'file_path'.")
+
+    @staticmethod
+    def _page_count(document):
+        """
+        :param document: Bytes del documento.
+        :return: Número de páginas si el documento es un PDF legible, o None.
+        """
+        if not document[:1024].lstrip().startswith(b'%PDF'):
+            return None
+        try:
+            return count_pages(document)
+        except Exception:
+            return None
+
+    def _api_version(self):
+        api_version = getattr(self.document_analysis_client, '_api_version', '')
+        return getattr(api_version, 'value', api_version)
+
+    @staticmethod
+    def _observe_result(result):
+        """
+        Registra en las métricas el número de páginas y tablas de un documento analizado.
+
+        :param result: Resultado del análisis del documento.
+        """
+        metrics.increment('documents_analyzed')
+        metrics.observe('document_pages', len(result.pages or []), buckets=COUNT_BUCKETS)
+        metrics.observe('document_tables', len(result.tables or []), buckets=COUNT_BUCKETS)
+
+    def _from_dict(self, serialized, compact=None):
+        """
+        :param serialized: AnalyzeResult serializado.
+        :param compact: Si es True se construye un CompactDocument; por defecto según self.compact.
+        :return: AnalyzeResult o CompactDocument.
+        """
+        if self.compact if compact is None else compact:
+            return CompactDocument.from_dict(serialized)
+        return formrecognizer.AnalyzeResult.from_dict(serialized)
+
+    def _analyze_document(self, document, model_id="prebuilt-layout", observe=True, compact=None):
+        """
+        Envía el documento a Form Recognizer a través del planificador de solicitudes, consultando primero la caché si está configurada.
+
+        :param document: Bytes del documento.
+        :param model_id: Id del modelo de análisis.
+        :param observe: Si es True, se registran las páginas y tablas del documento en las métricas.
+        :param compact: Si es True el resultado se entrega como CompactDocument; por defecto según self.compact.
+        :return: AnalyzeResult (o CompactDocument) del documento.
+        """
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(document, model_id, self._api_version())
+            cached = self.cache.get(key)
+            if cached is not None:
+                metrics.increment('analysis_cache_hits')
+                with metrics.timer('result_parsing'):
+                    result = self._from_dict(cached, compact)
+                if observe:
+                    self._observe_result(result)
+                return result
+            metrics.increment('analysis_cache_misses')
+
+        metrics.increment('analyze_bytes', len(document))
+        result = self.scheduler.run(
+            lambda interval: self.document_analysis_client.begin_analyze_document(
+                model_id, document=document, polling_interval=interval),
+            page_count=self._page_count(document))
+
+        if key is not None:
+            self.cache.set(key, result.to_dict())
+        if self.compact if compact is None else compact:
+            result = CompactDocument.from_result(result)
+        if observe:
+            self._observe_result(result)
+        return result
+
+    def _analyze_document_pages(self, document, model_id="prebuilt-layout"):
+        """
+        Analiza un documento reutilizando, página por página, los resultados guardados en page_cache. Cada página se identifica
+        por la huella de su contenido; solo las páginas nunca vistas (una vez cada una, aunque se repitan en el documento) se
+        envían al servicio, reunidas en un PDF, y el resultado se une con las páginas recuperadas de la caché corrigiendo
+        los números de página. Sin page_cache, o si el documento no es un PDF, equivale a _analyze_document.
+
+        :param document: Bytes del documento.
+        :param model_id: Id del modelo de análisis.
+        :return: AnalyzeResult del documento completo.
+        """
+        if self.page_cache is None or not self._page_count(document):
+            return self._analyze_document(document, model_id=model_id)
+
+        api_version = self._api_version()
+        keys = [self.page_cache.make_key(f"page:{fingerprint}".encode(), model_id, api_version)
+                for fingerprint in page_fingerprints(document)]
+
+        fragments = []
+        novel = {}  # llave -> páginas del documento con esa huella
+        for page_number, key in enumerate(keys, start=1):
+            cached = self.page_cache.get(key) if key not in novel else None
+            if cached is not None:
+                fragments.append(([page_number], cached))
+            else:
+                novel.setdefault(key, []).append(page_number)
+        metrics.increment('page_cache_hits', len(fragments))
+        metrics.increment('page_cache_misses', len(keys) - len(fragments))
+
+        if novel:
+            sent = [page_numbers[0] for page_numbers in novel.values()]
+            sub_document = document if len(sent) == len(keys) else select_pages(document, sent)
+            result = self._analyze_document(sub_document, model_id=model_id, observe=False, compact=False).to_dict()
+            for local_numbers, fragment in split_by_page(result):
+                original = [sent[number - 1] for number in local_numbers]
+                if len(original) == 1:
+                    key = keys[original[0] - 1]
+                    self.page_cache.set(key, fragment)
+                    fragments.extend(([page_number], fragment) for page_number in novel[key])
+                else:
+                    # Páginas unidas por una tabla que continúa: se usan, pero no se guardan por página
+                    fragments.append((original, fragment))
+
+        if sorted(number for page_numbers, _ in fragments for number in page_numbers) != list(range(1, len(keys) + 1)):
+            # Una página repetida quedó dentro de un grupo de varias páginas; se analiza el documento completo
+            return self._analyze_document(document, model_id=model_id)
+
+        result = self._from_dict(assemble_pages(fragments))
+        self._observe_result(result)
+        return result
+
+    def analyze_sharded(self, file_obj=None, file_path=None, pages_per_shard=10, max_workers=4,
+                        max_retries=2, merge_boundary_tables=True, model_id="prebuilt-layout"):
+        """
+        Analiza un PDF extenso dividiéndolo localmente en fragmentos de páginas consecutivas que se envían en paralelo.
+        Los resultados se unen en un único AnalyzeResult con los números de página corregidos, de modo que el tiempo total
+        es el del fragmento más lento. Solo se reintentan los fragmentos que fallan.
+
+        :param file_obj: Objeto de archivo en memoria para analizar (opcional).
+        :param file_path: Ruta del archivo PDF a analizar (opcional).
+        :param pages_per_shard: Número máximo de páginas por fragmento.
+        :param max_workers: Número de fragmentos analizados al mismo tiempo.
+        :param max_retries: Número de reintentos para los fragmentos que fallan.
+        :param merge_boundary_tables: Si es True, se unen las tablas que continúan de un fragmento al siguiente.
+        :param model_id: Id del modelo de análisis.
+        :return: AnalyzeResult del documento completo.
+        """
+        document = self._read_document(file_obj, file_path)
+        page_ranges = shard_ranges(count_pages(document), pages_per_shard)
+        if len(page_ranges) <= 1:
+            return self._analyze_document(document, model_id=model_id)
+
+        shards = split_pdf(document, page_ranges)
+        logger.info("Documento dividido en %d fragmentos de hasta %d páginas", len(shards), pages_per_shard)
+
+        shard_results = [None] * len(shards)
+        pending = list(range(len(shards)))
+        errors = {}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for attempt in range(max_retries + 1):
+                futures = {i: executor.submit(self._analyze_document, shards[i], model_id, False, False) for i in pending}
+                pending = []
+                for i, future in futures.items():
+                    try:
+                        shard_results[i] = future.result().to_dict()
+                    except Exception as e:
+                        errors[i] = e
+                        pending.append(i)
+                if not pending:
+                    break
+                metrics.increment('shard_retries', len(pending))
+                logger.warning("Fragmentos con error en el intento %d: %s", attempt + 1, [page_ranges[i] for i in pending])
+
+        if pending:
+            failed = ', '.join(f"{page_ranges[i]}: {errors[i]}" for i in pending)
+            raise RuntimeError(f"No fue posible analizar los fragmentos {failed}")
+
+        with metrics.timer('shard_merge'):
+            result = self._from_dict(merge_results(shard_results, page_ranges, merge_boundary_tables))
+        self._observe_result(result)
+        return result
+
+    async def _analyze_document_async(self, client, document, model_id="prebuilt-layout"):
+        """
+        Versión asíncrona de _analyze_document sobre un cliente de azure.ai.formrecognizer.aio.
+
+        :param client: Cliente asíncrono de Form Recognizer.
+        :param document: Bytes del documento.
+        :param model_id: Id del modelo de análisis.
+        :return: AnalyzeResult del documento.
+        """
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(document, model_id, self._api_version())
+            cached = self.cache.get(key)
+            if cached is not None:
+                metrics.increment('analysis_cache_hits')
+                with metrics.timer('result_parsing'):
+                    result = self._from_dict(cached)
+                self._observe_result(result)
+                return result
+            metrics.increment('analysis_cache_misses')
+
+        metrics.increment('analyze_bytes', len(document))
+        result = await self.scheduler.run_async(
+            lambda interval: client.begin_analyze_document(model_id, document=document, polling_interval=interval),
+            page_count=self._page_count(document))
+
+        if key is not None:
+            self.cache.set(key, result.to_dict())
+        if self.compact:
+            result = CompactDocument.from_result(result)
+        self._observe_result(result)
+        return result
+
+    async def analyze_many_async(self, files, max_concurrency=8, model_id="prebuilt-layout", async_client=None):
+        """
+        Analiza varios documentos de forma concurrente y entrega cada resultado apenas termina (orden de finalización).
+        Los errores se aíslan por documento: un fallo no interrumpe el análisis de los demás.
+
+        :param files: Iterable de diccionarios {'file_name', 'file'}, como los retornados por BlobFunctions.extract_file_from_blob.
+        :param max_concurrency: Número máximo de documentos en análisis al mismo tiempo.
+        :param model_id: Id del modelo de análisis.
+        :param async_client: Cliente asíncrono opcional (por ejemplo, un cliente falso para pruebas locales).
+        :return: Generador asíncrono de diccionarios {'file_name', 'session', 'error'}; 'session' es una DocumentSession
+                 con el resultado ya cargado, o None si el documento falló.
+        """
+        if async_client is not None:
+            async for item in self._analyze_many_with_client(async_client, files, max_concurrency, model_id):
+                yield item
+            return
+
+        async with formrecognizer_aio.DocumentAnalysisClient(
+                endpoint=self.endpoint, credential=credentials.AzureKeyCredential(key=self.key)) as client:
+            async for item in self._analyze_many_with_client(client, files, max_concurrency, model_id):
+                yield item
+
+    async def _analyze_many_with_client(self, client, files, max_concurrency, model_id):
+
+        async def analyze_one(item):
+            file_name = item.get('file_name')
+            try:
+                document = self._read_document(file_obj=item['file'])
+                result = await self._analyze_document_async(client, document, model_id)
+                return {'file_name': file_name,
+                        'session': DocumentSession(self, None, model_id=model_id, result=result),
+                        'error': None}
+            except Exception as e:
+                metrics.increment('analyze_errors')
+                logger.warning("Error al analizar %s: %s", file_name, e)
+                return {'file_name': file_name, 'session': None, 'error': e}
+
+        # Solo se toman del iterable tantos archivos como documentos en vuelo, para no cargar toda la carpeta en memoria
+        files_iter = iter(files)
+        pending = set()
+        try:
+            while True:
+                while len(pending) < max_concurrency:
+                    item = next(files_iter, None)
+                    if item is None:
+                        break
+                    pending.add(asyncio.ensure_future(analyze_one(item)))
+                if not pending:
+                    break
+
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def analyze_many(self, files, max_concurrency=8, model_id="prebuilt-layout", async_client=None):
+        """
+        Versión síncrona de analyze_many_async: ejecuta el bucle de eventos en un hilo auxiliar y entrega
+        los resultados en orden de finalización a medida que llegan.
+
+        :param files: Iterable de diccionarios {'file_name', 'file'}, como los retornados por BlobFunctions.extract_file_from_blob.
+        :param max_concurrency: Número máximo de documentos en análisis al mismo tiempo.
+        :param model_id: Id del modelo de análisis.
+        :param async_client: Cliente asíncrono opcional (por ejemplo, un cliente falso para pruebas locales).
+        :return: Generador de diccionarios {'file_name', 'session', 'error'}.
+        """
+        results = queue.Queue(maxsize=max_concurrency)
+        stop = threading.Event()
+        end = object()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        async def produce():
+            async for item in self.analyze_many_async(files, max_concurrency, model_id, async_client):
+                if not put(item):
+                    break
+
+        def run():
+            try:
+                asyncio.run(produce())
+                put(end)
+            except BaseException as e:
+                put(e)
+
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+        try:
+            while True:
+                item = results.get()
+                if item is end:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            worker.join()
 
     def analyze_read(self, file_obj=None, file_path=None, return_tables=False):
         """
@@ -42,22 +431,13 @@ class DocumentIntelligence():
         :param file_path: Ruta del archivo PDF a analizar.
         :return: Texto del documento y las tablas encontradas.
         """
-        if file_obj is not None:
-            pdf_bytes = file_obj
-        elif file_path is not None:
-            with open(file_path, "rb") as f:
-                pdf_bytes = f.read()
-        else:
-            raise ValueError("Debe proporcionarse 'file_obj' o 'file_path'.")
+        pdf_bytes = self._read_document(file_obj, file_path)
 
-        full_content_list = []
-        poller = self.document_analysis_client.begin_analyze_document("prebuilt-layout", document=pdf_bytes)
-        result = poller.result()
+        if self.local_text_layer and self._page_count(pdf_bytes):
+            return self._analyze_read_local_first(pdf_bytes)
 
-        for page in result.pages:
-            page_text_lines = [line.content for line in page.lines]
-            page_text = ' '.join(page_text_lines)
-            full_content_list.append(page_text)
+        result = self._analyze_document_pages(pdf_bytes)
+        full_content_list = self._page_texts(result)
 
         if result.tables:
             tables = self._extract_tables(result)
@@ -65,6 +445,50 @@ class DocumentIntelligence():
         else:
             return full_content_list, None
 
+    def _analyze_read_local_first(self, pdf_bytes):
+        """
+        Variante de analyze_read que inspecciona cada página localmente: el texto de las páginas con capa de texto y sin
+        tablas se extrae con pypdf, y solo las páginas escaneadas o con tablas se envían a Form Recognizer, reunidas en
+        un PDF con esas páginas. Los textos se combinan en el orden original de las páginas.
+
+        :param pdf_bytes: Bytes del documento PDF.
+        :return: Texto de cada página y las tablas encontradas en las páginas enviadas (o None).
+        """
+        with metrics.timer('text_layer_inspection'):
+            pages = inspect_pages(pdf_bytes)
+        remote = [page['page_number'] for page in pages if not page['local']]
+        metrics.increment('pages_local', len(pages) - len(remote))
+        metrics.increment('pages_remote', len(remote))
+        logger.debug("Páginas extraídas localmente: %d, enviadas al servicio: %d", len(pages) - len(remote), len(remote))
+
+        full_content_list = [page['text'] for page in pages]
+        if not remote:
+            return full_content_list, None
+
+        document = pdf_bytes if len(remote) == len(pages) else select_pages(pdf_bytes, remote)
+        result = self._analyze_document_pages(document)
+        for page_number, page_text in zip(remote, self._page_texts(result)):
+            full_content_list[page_number - 1] = page_text
+
+        if result.tables:
+            return full_content_list, self._extract_tables(result)
+        return full_content_list, None
+
+    @staticmethod
+    def _page_texts(result):
+        """
+        Construye el texto de cada página uniendo el contenido de sus líneas.
+
+        :param result: Resultado del análisis del documento.
+        :return: Lista con el texto de cada página.
+        """
+        full_content_list = []
+        for page in result.pages:
+            page_text_lines = [line.content for line in page.lines]
+            page_text = ' '.join(page_text_lines)
+            full_content_list.append(page_text)
+        return full_content_list
+
     def _extract_tables(self, result):
         """
         Extrae tablas del resultado del análisis del documento.
@@ -73,18 +497,12 @@ class DocumentIntelligence():
         :return: Lista de DataFrames de pandas que representan las tablas encontradas.
         """
         tables = []
-        for table in result.tables:
-            max_idx = np.max([cell.row_index for cell in table.cells])
-            max_jdx = np.max([cell.column_index for cell in table.cells])
-
-            tb = pd.DataFrame(np.zeros((max_idx + 1, max_jdx + 1)), dtype=str)
-            for cell in table.cells:
-                tb.iloc[cell.row_index, cell.column_index] = str(cell.content)
-            tb.columns = tb.iloc[0, :]
-            tb.set_index(tb.iloc[0, 0])
-            tb = tb.iloc[1:, :]
-
-            tables.append(tb)
+        with metrics.timer('table_build'):
+            for table in result.tables:
+                # El encabezado se detecta con detect_header_row: la última fila marcada como 'columnHeader' o, sin marcas,
+                # la primera fila si todas sus celdas son textos; las posiciones sin celda quedan como cadena vacía
+                tb = table_to_frame(table, header='auto')
+                tables.append(tb)
 
         return tables
     
@@ -103,18 +521,35 @@ class DocumentIntelligence():
 
         :return: DataFrame de pandas con los datos consolidados de todas las tablas de interés procesadas.
         """
-        if file_obj:
-            document = file_obj
-        elif file_path:
-            with open(file_path, "rb") as f:
-                document = f.read()
-        else:
-            raise ValueError("Debe proporcionarse 'file_obj' o 'file_path'.")
+        document = self._read_document(file_obj, file_path)
+        result = self._analyze_document(document)
+
+        with metrics.timer('table_structuring'):
+            return self._run_structuring('_structure_matched_tables', result, list_string_in_columns, list_field_names,
+                                         umbral, drop_rows, min_len_df, set_names_columns)
+
+    def _run_structuring(self, method, result, *args):
+        """
+        Ejecuta un método de estructuración de tablas en el grupo de procesos, si está configurado, o en el hilo actual.
+
+        :param method: Nombre del método (_auto_structure_tables, _structure_matched_tables, _extract_tables).
+        :param result: Resultado del análisis del documento.
+        :param args: Argumentos adicionales del método.
+        :return: Valor retornado por el método.
+        """
+        if self.structuring_pool is None:
+            return getattr(self, method)(result, *args)
+        return self.structuring_pool.run(method, result, *args)
 
-        poller = self.document_analysis_client.begin_analyze_document("prebuilt-layout", document=document)
-        result = poller.result()
+    def _structure_matched_tables(self, result, list_string_in_columns=[], list_field_names=[],
+                                  umbral=0.6, drop_rows=[0,1], min_len_df=4, set_names_columns=True):
+        """
+        Procesa las tablas de un resultado de análisis ya obtenido, según los criterios de identify_and_structure_tables.
 
-        print(f"Tablas encontradas: {len(result.tables)}")
+        :param result: Resultado del análisis del documento.
+        :return: DataFrame concatenado y lista de DataFrames procesados.
+        """
+        logger.debug("Tablas encontradas: %d", len(result.tables))
 
 
         ind_tables_obj = []
@@ -149,48 +584,27 @@ class DocumentIntelligence():
                     ind_tables_obj.append(i)
                     list_df_obj.append(df_)
                     # print(df_)
-                    print(f"Tabla de interés identificada: {i}")
+                    logger.debug("Tabla de interés identificada: %d", i)
                     # pdb.set_trace()
         list_df_processed = []
+        matcher = get_header_matcher(tuple(list_field_names), umbral)
         for df_i in list_df_obj:
             df_ = df_i.copy()
             columns_row_0 = df_.iloc[0,:].to_list()
-            columns_row_0 = [v for v in columns_row_0 if v is not None]
+            # Las posiciones vacías se conservan para que el índice encontrado corresponda a la columna real
+            columns_row_0 = [v if v is not None else '' for v in columns_row_0]
 
             columns_row_1 = df_.iloc[1,:].to_list()
-            columns_row_1 = [v for v in columns_row_1 if v is not None]
+            # Las posiciones vacías se conservan para que el índice encontrado corresponda a la columna real
+            columns_row_1 = [v if v is not None else '' for v in columns_row_1]
 
             # print(columns_row_0)
             # rn.shuffle(columns_row_1)
 
-            similar_field_row_0 = {}
-            similar_field_row_1 = {}
-
-            for i in range(len(list_field_names)):
-
-                # Para cada elemento de la lista, buscamos la mejor coincidencia
-                # La función get_close_matches retorna una lista de las mejores similar_field_row_x "cercanas"
-                # Aquí tomamos solo la mejor coincidencia si existe alguna, de lo contrario None
-                match_row_0 = get_close_matches(list_field_names[i],columns_row_0 , n=1, cutoff=umbral)
-                match_row_1 = get_close_matches(list_field_names[i],columns_row_1 , n=1, cutoff=umbral)
-
-                if match_row_0:
-                    similar_field_row_0[list_field_names[i]] = {'similar':match_row_0[0],
-                                                                'ind_col': columns_row_0.index(match_row_0[0])
-                                                                }
-                else:
-                    similar_field_row_0[list_field_names[i]] = None
-
-                if match_row_1:
-                    similar_field_row_1[list_field_names[i]] = {'similar':match_row_1[0],
-                                                                'ind_col': columns_row_1.index(match_row_1[0])
-                                                                }
-                else:
-                    similar_field_row_1[list_field_names[i]] = None
-
-            # Filtramos los elementos que no tienen None como valor
-            items_filtered_row_0 = {clave: valor for clave, valor in similar_field_row_0.items() if valor is not None}
-            items_filtered_row_1 = {clave: valor for clave, valor in similar_field_row_1.items() if valor is not None}
+            # Para cada campo buscamos el encabezado más parecido con la misma semántica de get_close_matches;
+            # el índice de campos se construye una sola vez y las disposiciones de encabezados repetidas se memorizan
+            items_filtered_row_0 = matcher.match(columns_row_0)
+            items_filtered_row_1 = matcher.match(columns_row_1)
 
             # print(items_filtered_row_0)
             # print(items_filtered_row_1)
@@ -205,13 +619,13 @@ class DocumentIntelligence():
                     df_.rename({column_in:key},axis=1,inplace=True)
                     
                 list_df_processed.append(df_)
-                print(f"Dataframes procesados: {len(list_df_processed)}")
+                logger.debug("Dataframes procesados: %d", len(list_df_processed))
             # print(df_)
             
             if drop_rows:
                 df_.drop(drop_rows,axis=0,inplace=True)
             else:
-                print("No se elimino ninguna fila")
+                logger.debug("No se elimino ninguna fila")
             # pdb.set_trace()
             
 
@@ -221,7 +635,7 @@ class DocumentIntelligence():
 
         # Concatenar los DataFrames en la lista
         df_concatenado = pd.concat(list_df_processed, ignore_index=True)
-        print(f"Tamaño completo del df concatenado: {df_concatenado.shape}")
+        logger.info("Tamaño completo del df concatenado: %s", df_concatenado.shape)
 
         return df_concatenado,list_df_processed
 
@@ -264,18 +678,20 @@ class DocumentIntelligence():
         :param umbral: Umbral para la coincidencia de cadenas en la identificación de nombres de columnas.
         :return: DataFrame de pandas con los datos consolidados de todas las tablas de interés procesadas.
         """
-        if file_obj:
-            document = file_obj
-        elif file_path:
-            with open(file_path, "rb") as f:
-                document = f.read()
-        else:
-            raise ValueError("Debe proporcionarse 'file_obj' o 'file_path'.")
+        document = self._read_document(file_obj, file_path)
+        result = self._analyze_document(document)
+
+        with metrics.timer('table_structuring'):
+            return self._run_structuring('_auto_structure_tables', result, list_string_in_columns)
 
-        poller = self.document_analysis_client.begin_analyze_document("prebuilt-layout", document=document)
-        result = poller.result()
+    def _auto_structure_tables(self, result, list_string_in_columns=[]):
+        """
+        Procesa las tablas de un resultado de análisis ya obtenido, según los criterios de auto_identify_and_structure_tables.
 
-        print(f"Tablas encontradas: {len(result.tables)}")
+        :param result: Resultado del análisis del documento.
+        :return: Lista con las tablas de interés convertidas a diccionarios.
+        """
+        logger.debug("Tablas encontradas: %d", len(result.tables))
 
         ind_tables_obj = []
         list_df_obj = []
@@ -306,43 +722,97 @@ class DocumentIntelligence():
                     ind_tables_obj.append(i)
                     
                     if df_.isna().sum().sum()>2:
-                        print("Tabla con campos vacios *")
-                        print(df_)
+                        logger.debug("Tabla con campos vacios *\n%s", df_)
                         # print(df_)
                         try:
-                            print("replacing...")
+                            logger.debug("replacing...")
                             for col_ in df_.columns:
                                 value_default = df_[col_].dropna().loc[df_[col_] != ""].iloc[1]
                                 if value_default:
                                     
                                     df_[col_] = df_[col_].replace("",value_default)
                                     df_[col_] = df_[col_].fillna(value_default)
-                            print("Tabla completada *")
+                            logger.debug("Tabla completada *")
                             # print(df_)
                         except Exception as e:
-                            print(f"No fué posible completar la tabla. Error: {e}")
+                            logger.warning("No fué posible completar la tabla. Error: %s", e)
                         
                     list_df_obj.append(df_)
                     
-                    print(f"Tabla de interés identificada: {i}")
+                    logger.debug("Tabla de interés identificada: %d", i)
                     
                     df_result_json=self._identify_dataframe_structure(df_ )
-                    print(f"Tamaño del JsonL: {len(df_result_json)}")
+                    logger.debug("Tamaño del JsonL: %d", len(df_result_json))
                     list_df_processed.append(df_result_json)
         
         return list_df_processed
 
+    def learn_template(self, name, annotations, file_obj=None, file_path=None, registry=None):
+        """
+        Aprende la plantilla de un formulario a partir de un documento anotado.
+
+        :param name: Nombre de la plantilla (por ejemplo 'F6CR').
+        :param annotations: Diccionario campo -> valor tal como aparece en el documento, o campo -> (página, región normalizada).
+        :param file_obj: Objeto de archivo en memoria del documento anotado (opcional).
+        :param file_path: Ruta del documento anotado (opcional).
+        :param registry: TemplateRegistry opcional donde registrar la plantilla.
+        :return: LayoutTemplate.
+        """
+        document = self._read_document(file_obj, file_path)
+        template = LayoutTemplate.learn(name, self._analyze_document(document), annotations)
+        if registry is not None:
+            registry.register(template)
+        logger.info("Plantilla '%s' aprendida con %d campos y %d anclas", name, len(template.fields), len(template.anchors))
+        return template
+
+    def extract_with_template(self, templates, file_obj=None, file_path=None):
+        """
+        Extrae los campos de un formulario conocido consultando el índice espacial de sus líneas en las regiones de la plantilla.
+
+        :param templates: LayoutTemplate, o TemplateRegistry para elegir la plantilla que corresponde al documento.
+        :param file_obj: Objeto de archivo en memoria para analizar (opcional).
+        :param file_path: Ruta del archivo PDF a analizar (opcional).
+        :return: Tupla (nombre de la plantilla, diccionario campo -> valor), o None si ninguna plantilla corresponde.
+        """
+        document = self._read_document(file_obj, file_path)
+        return self._extract_template_fields(SpatialIndex(self._analyze_document(document)), templates)
+
+    @staticmethod
+    def _extract_template_fields(index, templates):
+        """
+        :param index: SpatialIndex del documento.
+        :param templates: LayoutTemplate o TemplateRegistry.
+        :return: Tupla (nombre de la plantilla, diccionario campo -> valor), o None.
+        """
+        with metrics.timer('template_extraction'):
+            if isinstance(templates, LayoutTemplate):
+                return templates.name, templates.extract(index)
+            return templates.extract(index)
+
+    def open_session(self, file_obj=None, file_path=None, model_id="prebuilt-layout", pages_per_shard=None):
+        """
+        Crea una sesión que analiza el documento una sola vez y deriva de forma perezosa sus textos y tablas.
+
+        :param file_obj: Objeto de archivo en memoria para analizar (opcional).
+        :param file_path: Ruta del archivo PDF a analizar (opcional).
+        :param model_id: Id del modelo de análisis.
+        :param pages_per_shard: Si se indica, el documento se analiza por fragmentos de páginas con analyze_sharded.
+        :return: Instancia de DocumentSession.
+        """
+        return DocumentSession(self, self._read_document(file_obj, file_path), model_id=model_id,
+                               pages_per_shard=pages_per_shard)
+
     @staticmethod
-    def table_to_dataframe(table):
+    def table_to_dataframe(table, fill_merged=False, header=None):
         """
         Convierte una tabla extraída de un documento analizado en un DataFrame de pandas.
+        Cada celda se ubica en su column_index; las posiciones sin celda (por ejemplo, las cubiertas por una celda combinada) quedan en None.
 
         :param table: Objeto de tabla del resultado del análisis de documentos.
+        :param fill_merged: Si es True, el contenido de las celdas combinadas se repite en todas las posiciones que abarcan.
+        :param header: None para conservar todas las filas como datos, un índice de fila, o 'auto' para detectar la fila de
+                       encabezado con detect_header_row y usarla como nombres de columna.
         :return: DataFrame de pandas que representa la tabla.
         """
-        data = [[] for _ in range(table.row_count)]
-        for cell in table.cells:
-            data[cell.row_index].append(cell.content)
-
-        df = pd.DataFrame(data)
+        df = table_to_frame(table, header=header, fill_merged=fill_merged, empty=None)
         return df
\ No newline at end of file
@@ -0,0 +1,402 @@
+import sys
+import json
+import struct
+
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+# Cabecera del formato binario de CompactDocument
+MAGIC = b'CDM1'
+
+# Coordenadas guardadas por polígono: 4 puntos (x, y); los polígonos con menos puntos se completan con NaN
+POLYGON_SIZE = 8
+
+
+def _polygon(points):
+    """ Convierte una lista de puntos (objetos con x, y o diccionarios) en 8 flotantes. """
+    values = []
+    for point in (points or [])[:POLYGON_SIZE // 2]:
+        if isinstance(point, dict):
+            values += [point.get('x'), point.get('y')]
+        else:
+            values += [point.x, point.y]
+    return values + [np.nan] * (POLYGON_SIZE - len(values))
+
+
+def _polygon_points(row):
+    return [{'x': float(row[i]), 'y': float(row[i + 1])} for i in range(0, POLYGON_SIZE, 2) if not np.isnan(row[i])]
+
+
+def _get(item, name, default=None):
+    if isinstance(item, dict):
+        value = item.get(name, default)
+    else:
+        value = getattr(item, name, default)
+    return default if value is None else value
+
+
+class CompactLine():
+    """ Línea de texto de una página, con el contenido y el polígono (arreglo float32 de 4 puntos x, y). """
+    __slots__ = ('content', 'polygon')
+
+    def __init__(self, content, polygon):
+        self.content = content
+        self.polygon = polygon
+
+
+class CompactRegion():
+    """ Región de una tabla en una página. """
+    __slots__ = ('page_number', 'polygon')
+
+    def __init__(self, page_number, polygon):
+        self.page_number = page_number
+        self.polygon = polygon
+
+
+class CompactCell():
+    """ Celda de una tabla, con los mismos atributos que DocumentTableCell usados por el procesamiento. """
+    __slots__ = ('row_index', 'column_index', 'row_span', 'column_span', 'kind', 'content')
+
+    def __init__(self, row_index, column_index, row_span, column_span, kind, content):
+        self.row_index = row_index
+        self.column_index = column_index
+        self.row_span = row_span
+        self.column_span = column_span
+        self.kind = kind
+        self.content = content
+
+
+class LineSequence():
+    """ Secuencia de las líneas de una página, respaldada por los arreglos del documento; las líneas se crean al recorrerla. """
+    __slots__ = ('_document', '_start', '_stop')
+
+    def __init__(self, document, start, stop):
+        self._document = document
+        self._start = start
+        self._stop = stop
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        document = self._document
+        i = self._start + index
+        return CompactLine(document.strings[document.line_content[i]], document.line_polygon[i])
+
+    def __iter__(self):
+        document = self._document
+        strings = document.strings
+        for i in range(self._start, self._stop):
+            yield CompactLine(strings[document.line_content[i]], document.line_polygon[i])
+
+    @property
+    def contents(self):
+        """ Contenido de todas las líneas, sin crear objetos de línea. """
+        strings = self._document.strings
+        return [strings[i] for i in self._document.line_content[self._start:self._stop]]
+
+
+class CellSequence():
+    """
+    Secuencia de las celdas de una tabla, respaldada por los arreglos del documento. Además de recorrerse celda a celda,
+    expone positions (arreglo (n, 4) de fila, columna y extensiones) y contents, que table_engine usa directamente.
+    """
+    __slots__ = ('_document', '_start', '_stop')
+
+    def __init__(self, document, start, stop):
+        self._document = document
+        self._start = start
+        self._stop = stop
+
+    def __len__(self):
+        return self._stop - self._start
+
+    @property
+    def positions(self):
+        return self._document.cell_position[self._start:self._stop].astype(np.intp)
+
+    @property
+    def contents(self):
+        strings = self._document.strings
+        return [strings[i] for i in self._document.cell_content[self._start:self._stop]]
+
+    def _cell(self, i):
+        document = self._document
+        row, col, row_span, column_span = document.cell_position[i].tolist()
+        return CompactCell(row, col, row_span, column_span, document.strings[document.cell_kind[i]],
+                           document.strings[document.cell_content[i]])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._cell(self._start + index)
+
+    def __iter__(self):
+        for i in range(self._start, self._stop):
+            yield self._cell(i)
+
+
+class CompactPage():
+    """ Página del documento: número, dimensiones, unidad, ángulo y líneas. """
+    __slots__ = ('_document', '_index')
+
+    def __init__(self, document, index):
+        self._document = document
+        self._index = index
+
+    @property
+    def page_number(self):
+        return int(self._document.page_number[self._index])
+
+    @property
+    def width(self):
+        return float(self._document.page_size[self._index, 0])
+
+    @property
+    def height(self):
+        return float(self._document.page_size[self._index, 1])
+
+    @property
+    def angle(self):
+        return float(self._document.page_size[self._index, 2])
+
+    @property
+    def unit(self):
+        return self._document.strings[self._document.page_unit[self._index]]
+
+    @property
+    def lines(self):
+        offsets = self._document.page_lines
+        return LineSequence(self._document, int(offsets[self._index]), int(offsets[self._index + 1]))
+
+
+class CompactTable():
+    """ Tabla del documento, con row_count, column_count, cells y bounding_regions como DocumentTable. """
+    __slots__ = ('_document', '_index')
+
+    def __init__(self, document, index):
+        self._document = document
+        self._index = index
+
+    @property
+    def row_count(self):
+        return int(self._document.table_shape[self._index, 0])
+
+    @property
+    def column_count(self):
+        return int(self._document.table_shape[self._index, 1])
+
+    @property
+    def cells(self):
+        offsets = self._document.table_cells
+        return CellSequence(self._document, int(offsets[self._index]), int(offsets[self._index + 1]))
+
+    @property
+    def bounding_regions(self):
+        document = self._document
+        offsets = document.table_regions
+        return [CompactRegion(int(document.region_page[i]), document.region_polygon[i])
+                for i in range(int(offsets[self._index]), int(offsets[self._index + 1]))]
+
+
+class CompactDocument():
+    """
+    La clase CompactDocument es una representación compacta del resultado de Form Recognizer que conserva solo lo que usa
+    el procesamiento: el texto de las líneas de cada página (con su polígono), las dimensiones de las páginas y las celdas y
+    regiones de las tablas. Todo se guarda en arreglos numpy a nivel de documento (coordenadas en float32, índices en int32)
+    y en una tabla de cadenas internadas sin repetidos; las páginas, líneas, tablas y celdas son vistas livianas con __slots__
+    que se crean al recorrerlas y exponen los mismos atributos que los objetos del SDK (pages[].lines[].content,
+    tables[].cells[], bounding_regions[0].page_number...), de modo que los métodos de DocumentIntelligence funcionan igual.
+
+    from_result / from_dict:
+        Convierten un AnalyzeResult o su forma serializada (AnalyzeResult.to_dict()).
+
+    to_bytes / from_bytes:
+        Serialización binaria rápida: una cabecera JSON y los arreglos tal cual están en memoria. También se usa al
+        serializar con pickle (por ejemplo, para enviar el documento a otro proceso).
+
+    to_dict:
+        Forma serializada compatible con AnalyzeResult.from_dict, con la información conservada.
+    """
+    ARRAYS = {
+        'page_number': 'int32', 'page_size': 'float32', 'page_unit': 'int32', 'page_lines': 'int32',
+        'line_content': 'int32', 'line_polygon': 'float32',
+        'table_shape': 'int32', 'table_cells': 'int32', 'table_regions': 'int32',
+        'cell_position': 'int32', 'cell_kind': 'int32', 'cell_content': 'int32',
+        'region_page': 'int32', 'region_polygon': 'float32',
+    }
+
+    __slots__ = ('api_version', 'model_id', 'strings', '_pages', '_tables') + tuple(ARRAYS)
+
+    def __init__(self, api_version, model_id, strings, arrays):
+        """
+        :param api_version: Versión del API con la que se obtuvo el resultado.
+        :param model_id: Id del modelo de análisis.
+        :param strings: Lista de cadenas referenciadas por los arreglos de índices.
+        :param arrays: Diccionario con los arreglos de ARRAYS.
+        """
+        self.api_version = api_version
+        self.model_id = model_id
+        self.strings = strings
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self._pages = None
+        self._tables = None
+
+    @property
+    def pages(self):
+        if self._pages is None:
+            self._pages = [CompactPage(self, i) for i in range(len(self.page_number))]
+        return self._pages
+
+    @property
+    def tables(self):
+        if self._tables is None:
+            self._tables = [CompactTable(self, i) for i in range(len(self.table_shape))]
+        return self._tables
+
+    @classmethod
+    def from_result(cls, result, pages=True):
+        """
+        :param result: AnalyzeResult del SDK, su forma serializada o un CompactDocument.
+        :param pages: Si es False solo se conservan las tablas, por ejemplo para enviarlas a otro proceso.
+        :return: CompactDocument.
+        """
+        if isinstance(result, cls) and (pages or not len(result.page_number)):
+            return result
+
+        strings = []
+        string_index = {}
+
+        def intern(text):
+            text = '' if text is None else text
+            index = string_index.get(text)
+            if index is None:
+                index = string_index[text] = len(strings)
+                strings.append(sys.intern(text))
+            return index
+
+        page_number, page_size, page_unit, page_lines = [], [], [], [0]
+        line_content, line_polygon = [], []
+        for page in _get(result, 'pages', []) if pages else []:
+            page_number.append(_get(page, 'page_number', 0))
+            page_size.append((_get(page, 'width', np.nan), _get(page, 'height', np.nan), _get(page, 'angle', 0.0)))
+            page_unit.append(intern(_get(page, 'unit', '')))
+            for line in _get(page, 'lines', []):
+                line_content.append(intern(_get(line, 'content', '')))
+                line_polygon.append(_polygon(_get(line, 'polygon', [])))
+            page_lines.append(len(line_content))
+
+        table_shape, table_cells, table_regions = [], [0], [0]
+        cell_position, cell_kind, cell_content = [], [], []
+        region_page, region_polygon = [], []
+        for table in _get(result, 'tables', []):
+            table_shape.append((_get(table, 'row_count', 0), _get(table, 'column_count', 0)))
+            for cell in _get(table, 'cells', []):
+                cell_position.append((_get(cell, 'row_index', 0), _get(cell, 'column_index', 0),
+                                      _get(cell, 'row_span', 1), _get(cell, 'column_span', 1)))
+                cell_kind.append(intern(_get(cell, 'kind', 'content')))
+                cell_content.append(intern(_get(cell, 'content', '')))
+            table_cells.append(len(cell_content))
+            for region in _get(table, 'bounding_regions', []):
+                region_page.append(_get(region, 'page_number', 0))
+                region_polygon.append(_polygon(_get(region, 'polygon', [])))
+            table_regions.append(len(region_page))
+
+        shapes = {'page_size': 3, 'line_polygon': POLYGON_SIZE, 'table_shape': 2, 'cell_position': 4,
+                  'region_polygon': POLYGON_SIZE}
+        values = {'page_number': page_number, 'page_size': page_size, 'page_unit': page_unit, 'page_lines': page_lines,
+                  'line_content': line_content, 'line_polygon': line_polygon, 'table_shape': table_shape,
+                  'table_cells': table_cells, 'table_regions': table_regions, 'cell_position': cell_position,
+                  'cell_kind': cell_kind, 'cell_content': cell_content, 'region_page': region_page,
+                  'region_polygon': region_polygon}
+        arrays = {}
+        for name, dtype in cls.ARRAYS.items():
+            array = np.array(values[name], dtype=dtype)
+            arrays[name] = array.reshape(-1, shapes[name]) if name in shapes else array
+        return cls(_get(result, 'api_version'), _get(result, 'model_id'), strings, arrays)
+
+    from_dict = from_result
+
+    def to_dict(self):
+        """
+        :return: Diccionario con la forma de AnalyzeResult.to_dict() (sin palabras, spans ni contenido completo).
+        """
+        pages = []
+        for page in self.pages:
+            pages.append({'page_number': page.page_number, 'width': page.width, 'height': page.height,
+                          'angle': page.angle, 'unit': page.unit, 'spans': [], 'words': [], 'selection_marks': [],
+                          'lines': [{'content': line.content, 'polygon': _polygon_points(line.polygon), 'spans': []}
+                                    for line in page.lines]})
+        tables = []
+        for table in self.tables:
+            tables.append({'row_count': table.row_count, 'column_count': table.column_count, 'spans': [],
+                           'bounding_regions': [{'page_number': region.page_number,
+                                                 'polygon': _polygon_points(region.polygon)}
+                                                for region in table.bounding_regions],
+                           'cells': [{'row_index': cell.row_index, 'column_index': cell.column_index,
+                                      'row_span': cell.row_span, 'column_span': cell.column_span, 'kind': cell.kind,
+                                      'content': cell.content, 'bounding_regions': [], 'spans': []}
+                                     for cell in table.cells]})
+        return {'api_version': self.api_version, 'model_id': self.model_id, 'content': '', 'pages': pages,
+                'tables': tables, 'paragraphs': [], 'styles': [], 'languages': [], 'documents': [], 'key_value_pairs': []}
+
+    def to_bytes(self):
+        """
+        :return: Bytes con la cabecera JSON, la tabla de cadenas y los arreglos del documento.
+        """
+        encoded = [text.encode('utf-8') for text in self.strings]
+        string_lengths = np.array([len(text) for text in encoded], dtype=np.uint32)
+        arrays = [(name, np.ascontiguousarray(getattr(self, name))) for name in self.ARRAYS]
+        header = json.dumps({'api_version': self.api_version, 'model_id': self.model_id, 'strings': len(encoded),
+                             'arrays': [[name, list(array.shape)] for name, array in arrays]}).encode('utf-8')
+
+        parts = [MAGIC, struct.pack('<I', len(header)), header, string_lengths.tobytes(), b''.join(encoded)]
+        parts += [array.tobytes() for _, array in arrays]
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        :param data: Bytes generados por to_bytes.
+        :return: CompactDocument.
+        """
+        if data[:4] != MAGIC:
+            raise ValueError("Formato de CompactDocument no reconocido")
+        header_length, = struct.unpack_from('<I', data, 4)
+        position = 8 + header_length
+        header = json.loads(data[8:position].decode('utf-8'))
+
+        string_lengths = np.frombuffer(data, dtype=np.uint32, count=header['strings'], offset=position)
+        position += string_lengths.nbytes
+        strings = []
+        for length in string_lengths.tolist():
+            strings.append(sys.intern(data[position:position + length].decode('utf-8')))
+            position += length
+
+        arrays = {}
+        for name, shape in header['arrays']:
+            dtype = np.dtype(cls.ARRAYS[name])
+            count = int(np.prod(shape)) if shape else 1
+            arrays[name] = np.frombuffer(data, dtype=dtype, count=count, offset=position).reshape(shape)
+            position += count * dtype.itemsize
+        return cls(header['api_version'], header['model_id'], strings, arrays)
+
+    def __reduce__(self):
+        return (CompactDocument.from_bytes, (self.to_bytes(),))
+
+    @property
+    def nbytes(self):
+        """ Memoria aproximada en bytes de los arreglos y las cadenas del documento. """
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS) + sum(sys.getsizeof(text) for text in self.strings)
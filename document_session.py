@@ -0,0 +1,126 @@
+import threading
+
+from metrics import metrics
+from layout_templates import SpatialIndex
+
+
+class DocumentSession():
+    """
+    La clase DocumentSession representa un documento analizado una sola vez con Azure Form Recognizer.
+    El análisis se realiza en el primer acceso y, a partir de ese único resultado, se derivan de forma perezosa
+    y memorizada las distintas vistas que ofrece DocumentIntelligence:
+
+    page_texts:
+        Texto de cada página, igual que el primer valor retornado por analyze_read.
+
+    tables:
+        Tablas crudas como DataFrames, igual que _extract_tables.
+
+    matched_tables:
+        Tablas de interés con columnas renombradas, igual que identify_and_structure_tables.
+
+    structured_records:
+        Tablas de interés convertidas a diccionarios, igual que auto_identify_and_structure_tables.
+
+    spatial_index / template_fields:
+        Índice espacial de las líneas del documento y los campos extraídos con la plantilla de formulario que le corresponde.
+
+    Las vistas se calculan una única vez por combinación de parámetros; los objetos retornados son compartidos,
+    por lo que no deben modificarse en el lugar.
+    """
+    def __init__(self, document_intelligence, document, model_id="prebuilt-layout", result=None, pages_per_shard=None):
+        """
+        :param document_intelligence: Instancia de DocumentIntelligence usada para analizar y procesar el documento.
+        :param document: Bytes del documento.
+        :param model_id: Id del modelo de análisis.
+        :param result: Resultado de análisis ya obtenido (opcional); si se proporciona, no se vuelve a llamar al servicio.
+        :param pages_per_shard: Si se indica, el documento se analiza por fragmentos de páginas con analyze_sharded.
+        """
+        self.document_intelligence = document_intelligence
+        self.document = document
+        self.model_id = model_id
+        self.pages_per_shard = pages_per_shard
+        self._result = result
+        self._views = {}
+        self._lock = threading.RLock()
+
+    @property
+    def result(self):
+        """ Resultado del análisis; el documento se envía al servicio solo en el primer acceso. """
+        with self._lock:
+            if self._result is None:
+                if self.pages_per_shard:
+                    self._result = self.document_intelligence.analyze_sharded(
+                        file_obj=self.document, pages_per_shard=self.pages_per_shard, model_id=self.model_id)
+                else:
+                    self._result = self.document_intelligence._analyze_document_pages(self.document, model_id=self.model_id)
+                # Una vez analizado, no es necesario conservar los bytes del documento
+                self.document = None
+            return self._result
+
+    def _view(self, key, build):
+        with self._lock:
+            if key not in self._views:
+                with metrics.timer('session_view', view=key[0]):
+                    self._views[key] = build()
+            return self._views[key]
+
+    @property
+    def page_texts(self):
+        """ Lista con el texto de cada página. """
+        return self._view(('page_texts',), lambda: self.document_intelligence._page_texts(self.result))
+
+    @property
+    def tables(self):
+        """ Lista de DataFrames con las tablas crudas del documento, o None si no hay tablas. """
+        def build():
+            if not self.result.tables:
+                return None
+            return self.document_intelligence._extract_tables(self.result)
+        return self._view(('tables',), build)
+
+    def matched_tables(self, list_string_in_columns=[], list_field_names=[],
+                       umbral=0.6, drop_rows=[0,1], min_len_df=4, set_names_columns=True):
+        """
+        Tablas de interés estructuradas como en identify_and_structure_tables.
+
+        :return: DataFrame concatenado y lista de DataFrames procesados.
+        """
+        key = ('matched_tables', tuple(list_string_in_columns), tuple(list_field_names),
+               umbral, tuple(drop_rows) if drop_rows else drop_rows, min_len_df, set_names_columns)
+        return self._view(key, lambda: self.document_intelligence._run_structuring(
+            '_structure_matched_tables', self.result, list_string_in_columns, list_field_names, umbral, drop_rows,
+            min_len_df, set_names_columns))
+
+    def structured_records(self, list_string_in_columns=[]):
+        """
+        Tablas de interés convertidas a diccionarios como en auto_identify_and_structure_tables.
+
+        :return: Lista con las tablas de interés convertidas.
+        """
+        key = ('structured_records', tuple(list_string_in_columns))
+        return self._view(key, lambda: self.document_intelligence._run_structuring(
+            '_auto_structure_tables', self.result, list_string_in_columns))
+
+    @property
+    def spatial_index(self):
+        """ SpatialIndex de las líneas y celdas del documento. """
+        return self._view(('spatial_index',), lambda: SpatialIndex(self.result))
+
+    def template_fields(self, templates):
+        """
+        Campos extraídos con una plantilla de formulario, como en DocumentIntelligence.extract_with_template.
+
+        :param templates: LayoutTemplate o TemplateRegistry.
+        :return: Tupla (nombre de la plantilla, diccionario campo -> valor), o None si ninguna plantilla corresponde.
+        """
+        return self._view(('template_fields', id(templates)),
+                          lambda: self.document_intelligence._extract_template_fields(self.spatial_index, templates))
+
+    def analyze_read(self):
+        """
+        Equivalente a DocumentIntelligence.analyze_read sobre el documento de la sesión.
+
+        :return: Texto de cada página y las tablas encontradas (o None).
+        """
+        return self.page_texts, self.tables
@@ -0,0 +1,160 @@
+import io
+
+from lazy_imports import lazy_import
+
+pypdf = lazy_import('pypdf')
+
+# Listas del AnalyzeResult serializado que se concatenan al unir los resultados de varios fragmentos
+MERGED_LISTS = ['pages', 'tables', 'paragraphs', 'styles', 'languages', 'documents', 'key_value_pairs']
+
+
+def count_pages(pdf_bytes):
+    """
+    Cuenta las páginas de un PDF.
+
+    :param pdf_bytes: Bytes del documento PDF.
+    :return: Número de páginas.
+    """
+    return len(pypdf.PdfReader(io.BytesIO(pdf_bytes)).pages)
+
+
+def shard_ranges(page_count, pages_per_shard):
+    """
+    Divide un documento en rangos de páginas consecutivas.
+
+    :param page_count: Número total de páginas del documento.
+    :param pages_per_shard: Número máximo de páginas por fragmento.
+    :return: Lista de tuplas (primera_página, última_página), con páginas numeradas desde 1.
+    """
+    return [(first, min(first + pages_per_shard - 1, page_count))
+            for first in range(1, page_count + 1, pages_per_shard)]
+
+
+def split_pdf(pdf_bytes, page_ranges):
+    """
+    Genera un PDF independiente por cada rango de páginas.
+
+    :param pdf_bytes: Bytes del documento PDF.
+    :param page_ranges: Lista de tuplas (primera_página, última_página), con páginas numeradas desde 1.
+    :return: Lista con los bytes de cada fragmento.
+    """
+    reader = pypdf.PdfReader(io.BytesIO(pdf_bytes))
+    shards = []
+    for first, last in page_ranges:
+        writer = pypdf.PdfWriter()
+        for page_index in range(first - 1, last):
+            writer.add_page(reader.pages[page_index])
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        shards.append(buffer.getvalue())
+    return shards
+
+
+def select_pages(pdf_bytes, page_numbers):
+    """
+    Genera un PDF con un subconjunto de páginas, no necesariamente consecutivas.
+
+    :param pdf_bytes: Bytes del documento PDF.
+    :param page_numbers: Lista de páginas a conservar, numeradas desde 1 y en el orden deseado.
+    :return: Bytes del nuevo PDF.
+    """
+    reader = pypdf.PdfReader(io.BytesIO(pdf_bytes))
+    writer = pypdf.PdfWriter()
+    for page_number in page_numbers:
+        writer.add_page(reader.pages[page_number - 1])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def _shift(node, page_offset, content_offset):
+    """ Corrige en el lugar los números de página y los desplazamientos de texto de un resultado serializado. """
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == 'page_number' and isinstance(value, int):
+                node[key] = value + page_offset
+            elif key == 'spans' and isinstance(value, list):
+                for span in value:
+                    span['offset'] += content_offset
+            elif key == 'span' and isinstance(value, dict):
+                value['offset'] += content_offset
+            else:
+                _shift(value, page_offset, content_offset)
+    elif isinstance(node, list):
+        for item in node:
+            _shift(item, page_offset, content_offset)
+
+
+def _table_pages(table):
+    pages = [region['page_number'] for region in table.get('bounding_regions') or []]
+    return (min(pages), max(pages)) if pages else (None, None)
+
+
+def _row_contents(table, row_index):
+    return [cell['content'] for cell in sorted(table['cells'], key=lambda cell: cell['column_index'])
+            if cell['row_index'] == row_index]
+
+
+def _join_tables(head, tail):
+    """
+    Une en el lugar una tabla que continúa en el fragmento siguiente. Si la continuación repite la fila de encabezado,
+    esa fila se descarta.
+    """
+    skip_header = _row_contents(head, 0) == _row_contents(tail, 0)
+    row_shift = head['row_count'] - (1 if skip_header else 0)
+
+    for cell in tail['cells']:
+        if skip_header and cell['row_index'] == 0:
+            continue
+        cell['row_index'] += row_shift
+        head['cells'].append(cell)
+
+    head['row_count'] = row_shift + tail['row_count']
+    head['bounding_regions'] = (head.get('bounding_regions') or []) + (tail.get('bounding_regions') or [])
+    head['spans'] = (head.get('spans') or []) + (tail.get('spans') or [])
+
+
+def merge_results(shard_results, page_ranges, merge_boundary_tables=True):
+    """
+    Une los resultados de análisis de varios fragmentos en un solo resultado, como si el documento se hubiera analizado entero.
+    Los números de página (páginas, tablas, celdas y bounding_regions) y los desplazamientos de texto (spans) se corrigen
+    según la posición de cada fragmento.
+
+    :param shard_results: Lista de AnalyzeResult serializados (AnalyzeResult.to_dict()), en el orden de los fragmentos.
+    :param page_ranges: Rangos de páginas de cada fragmento, como los retornados por shard_ranges.
+    :param merge_boundary_tables: Si es True, una tabla que termina en la última página de un fragmento y otra con el mismo
+                                  número de columnas que empieza en la primera página del siguiente se unen en una sola.
+    :return: AnalyzeResult serializado con el documento completo.
+    """
+    merged = {key: value for key, value in shard_results[0].items() if key not in MERGED_LISTS and key != 'content'}
+    for key in MERGED_LISTS:
+        merged[key] = []
+    contents = []
+    content_length = 0
+
+    for shard_result, (first, last) in zip(shard_results, page_ranges):
+        content = shard_result.get('content') or ''
+        content_offset = content_length + (1 if contents else 0)
+        _shift(shard_result, first - 1, content_offset)
+
+        tables = shard_result.get('tables') or []
+        if merge_boundary_tables and tables and merged['tables']:
+            previous = merged['tables'][-1]
+            _, previous_last_page = _table_pages(previous)
+            next_first_page, _ = _table_pages(tables[0])
+            if (previous_last_page == first - 1 and next_first_page == first
+                    and previous['column_count'] == tables[0]['column_count']):
+                _join_tables(previous, tables[0])
+                tables = tables[1:]
+
+        for key in MERGED_LISTS:
+            if key == 'tables':
+                merged[key].extend(tables)
+            else:
+                merged[key].extend(shard_result.get(key) or [])
+
+        contents.append(content)
+        content_length = content_offset + len(content)
+
+    merged['content'] = '\n'.join(contents)
+    return merged
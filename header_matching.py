@@ -0,0 +1,125 @@
+import threading
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+
+def normalize_header(text):
+    """ Minúsculas (casefold) y espacios repetidos o en los extremos colapsados, para comparar encabezados y campos. """
+    return ' '.join(text.split()).casefold()
+
+
+class HeaderMatcher():
+    """
+    La clase HeaderMatcher busca, para cada nombre de campo, el encabezado de tabla más parecido, con la misma semántica
+    que difflib.get_close_matches(campo, encabezados, n=1, cutoff=umbral) seguido de encabezados.index(coincidencia),
+    aplicada a los textos normalizados con normalize_header (sin distinguir mayúsculas ni espacios repetidos).
+
+    Se construye una sola vez por lista de campos e incluye:
+        - Un índice invertido de caracteres (n-gramas de longitud 1) sobre los nombres de campo, que descarta sin pérdida
+          los pares campo-encabezado sin caracteres en común.
+        - Un SequenceMatcher por campo y por hilo, cuyo índice interno (y el conteo de caracteres usado por quick_ratio) se
+          calcula una sola vez por hilo y se reutiliza en todas las tablas; SequenceMatcher guarda estado en set_seq1 y no
+          puede compartirse entre hilos.
+        - Una memoria por tupla de encabezados normalizados, protegida con un lock, para que las tablas con la misma
+          disposición cuesten una búsqueda en diccionario aunque difieran en mayúsculas o espacios.
+    """
+    def __init__(self, field_names, cutoff=0.6, max_memo_size=10000):
+        """
+        :param field_names: Lista de nombres de campo a buscar.
+        :param cutoff: Umbral de similitud, con el mismo significado que el parámetro cutoff de get_close_matches.
+        :param max_memo_size: Número máximo de disposiciones de encabezados memorizadas.
+        """
+        if not 0.0 <= cutoff <= 1.0:
+            raise ValueError(f"El umbral cutoff debe estar entre 0.0 y 1.0: {cutoff!r}")
+
+        self.field_names = list(field_names)
+        self._normalized_fields = [normalize_header(field) for field in self.field_names]
+        self.cutoff = cutoff
+        self.max_memo_size = max_memo_size
+        self._memo = {}
+        self._memo_lock = threading.Lock()
+        self._local = threading.local()
+
+        self._char_index = {}
+        for i, field in enumerate(self._normalized_fields):
+            for char in set(field):
+                self._char_index.setdefault(char, set()).add(i)
+
+    def _matchers(self):
+        """ :return: Lista de SequenceMatcher del hilo actual, uno por campo. """
+        matchers = getattr(self._local, 'matchers', None)
+        if matchers is None:
+            matchers = []
+            for field in self._normalized_fields:
+                # Igual que get_close_matches: el campo es la secuencia b, cuyo índice interno se calcula una sola vez
+                matcher = SequenceMatcher()
+                matcher.set_seq2(field)
+                matchers.append(matcher)
+            self._local.matchers = matchers
+        return matchers
+
+    def _candidates(self, header):
+        if self.cutoff <= 0.0:
+            return range(len(self.field_names))
+        if not header:
+            # Dos cadenas vacías son idénticas (ratio 1.0); una vacía frente a otra no vacía tiene ratio 0.0
+            return [i for i, field in enumerate(self._normalized_fields) if not field]
+        found = set()
+        for char in set(header):
+            found.update(self._char_index.get(char, ()))
+        return found
+
+    def _compute(self, headers):
+        """
+        :param headers: Lista de encabezados normalizados.
+        :return: Diccionario {campo: índice de columna} con los campos que superan el umbral, en el orden de field_names.
+        """
+        best = {}
+        matchers = self._matchers()
+        for header in dict.fromkeys(headers):
+            if not isinstance(header, str):
+                continue
+            for i in self._candidates(header):
+                matcher = matchers[i]
+                matcher.set_seq1(header)
+                # Mismas cotas y mismo desempate que get_close_matches: el mayor (puntaje, encabezado)
+                if matcher.real_quick_ratio() < self.cutoff or matcher.quick_ratio() < self.cutoff:
+                    continue
+                score = matcher.ratio()
+                if score >= self.cutoff and (i not in best or (score, header) > best[i]):
+                    best[i] = (score, header)
+
+        return {field: headers.index(best[i][1]) for i, field in enumerate(self.field_names) if i in best}
+
+    def match(self, headers):
+        """
+        Busca el encabezado más parecido para cada campo.
+
+        :param headers: Lista de encabezados de la tabla (una fila).
+        :return: Diccionario {campo: {'similar': encabezado, 'ind_col': índice de columna}} con los campos que superan el umbral,
+                 en el orden de field_names.
+        """
+        headers = list(headers)
+        key = tuple(normalize_header(header) if isinstance(header, str) else header for header in headers)
+        with self._memo_lock:
+            columns = self._memo.get(key)
+        if columns is None:
+            columns = self._compute(list(key))
+            with self._memo_lock:
+                if len(self._memo) >= self.max_memo_size:
+                    self._memo.clear()
+                self._memo[key] = columns
+        # La memoria guarda índices de columna: el encabezado se toma de esta tabla, con sus mayúsculas y espacios
+        return {field: {'similar': headers[column], 'ind_col': column} for field, column in columns.items()}
+
+
+@lru_cache(maxsize=32)
+def get_header_matcher(field_names, cutoff=0.6):
+    """
+    Retorna un HeaderMatcher compartido para una lista de campos y un umbral.
+
+    :param field_names: Tupla de nombres de campo.
+    :param cutoff: Umbral de similitud.
+    :return: Instancia de HeaderMatcher.
+    """
+    return HeaderMatcher(field_names, cutoff)
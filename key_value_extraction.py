@@ -0,0 +1,160 @@
+import re
+
+from table_engine import table_to_array
+from lazy_imports import lazy_import
+
+pd = lazy_import('pandas')
+
+# Campos conocidos de los formularios de pozos (F6CR y similares)
+DEFAULT_KNOWN_KEYS = [
+    'Compañia', 'Contrato', 'Campo', 'Pozo', 'Clasificación', 'Estructura', 'Estado final',
+    'LOCALIZACIÓN DEFINITIVA, MAGNA, SIRGAS', 'Torre', 'Fondo (si es desviado)', 'N (Y)', 'E (X)',
+    'Perforación iniciada', 'Perforación concluida', 'Pozo terminado', 'Profundidad total iniciada',
+    'Elevación mesa rotaria', 'Profundidad total vertical', 'Elevación del terreno', 'Taponado hasta',
+]
+
+# Dos puntos que separan clave y valor: no se consideran los que están entre dígitos (horas como 10:30)
+SEPARATOR = r'(?<!\d):(?!\d)'
+
+# Clave desconocida al inicio de una celda: texto que no empieza por dígito, seguido del separador
+GENERIC_KEY_PATTERN = re.compile(r'^\s*([^\d\s:][^:]{0,80}?)\s*' + SEPARATOR + r'\s*(.*)$', re.DOTALL)
+
+
+def _normalize(text):
+    return ' '.join(text.split()).casefold()
+
+
+class KeyValueExtractor():
+    """
+    La clase KeyValueExtractor extrae pares clave-valor de las tablas tipo formulario de un documento o de un lote de documentos.
+    A diferencia de dividir la fila completa por ':', recorre las celdas en su posición de columna, de modo que los valores
+    pueden contener espacios, fechas o coordenadas sin romper la separación. Un diccionario de claves conocidas
+    (Pozo, Campo, Contrato, N (Y), E (X), ...) resuelve los casos en que varias claves comparten una misma celda.
+
+    extract:
+        Extrae los pares clave-valor de todas las tablas de un documento.
+
+    extract_batch:
+        Extrae los pares de varios documentos y los retorna en un único DataFrame columnar, una fila por documento.
+    """
+    def __init__(self, known_keys=DEFAULT_KNOWN_KEYS):
+        """
+        :param known_keys: Lista de claves conocidas de los formularios.
+        """
+        self.known_keys = list(known_keys)
+        self._canonical = {_normalize(key): key for key in self.known_keys}
+
+        # Las claves más largas primero, para que 'Pozo terminado' tenga prioridad sobre 'Pozo'
+        alternatives = '|'.join(re.escape(key).replace(r'\ ', r'\s+')
+                                for key in sorted(self.known_keys, key=len, reverse=True))
+        self._known_key_pattern = re.compile(r'(?:^|(?<=[\s,;]))(' + alternatives + r')\s*' + SEPARATOR,
+                                             re.IGNORECASE)
+
+    def _canonical_key(self, key):
+        return self._canonical.get(_normalize(key), ' '.join(key.split()))
+
+    def _split_cell(self, text):
+        """
+        Divide el texto de una celda en segmentos (clave, valor).
+
+        :return: Tupla (texto previo a la primera clave, lista de pares (clave, valor)).
+        """
+        matches = list(self._known_key_pattern.finditer(text))
+        if matches:
+            pairs = []
+            for match, following in zip(matches, matches[1:] + [None]):
+                value_end = following.start() if following else len(text)
+                pairs.append((self._canonical_key(match.group(1)), text[match.end():value_end].strip()))
+            return text[:matches[0].start()].strip(), pairs
+
+        match = GENERIC_KEY_PATTERN.match(text)
+        if match:
+            return '', [(self._canonical_key(match.group(1)), match.group(2).strip())]
+
+        return text.strip(), []
+
+    def _rows(self, table):
+        """ Retorna las filas de la tabla como listas de textos ordenadas por columna. """
+        if isinstance(table, pd.DataFrame):
+            values = table.to_numpy(dtype=object)
+            if not isinstance(table.columns, pd.RangeIndex):
+                # El encabezado de las tablas de _extract_tables también contiene pares clave-valor
+                return [list(table.columns)] + values.tolist()
+            return values.tolist()
+        return table_to_array(table).tolist()
+
+    def extract(self, tables):
+        """
+        Extrae los pares clave-valor de todas las tablas de un documento.
+
+        :param tables: Lista de tablas (DataFrames de _extract_tables/table_to_dataframe u objetos de tabla del análisis).
+        :return: Diccionario clave -> valor; las claves repetidas se numeran ('N (Y)', 'N (Y) 2', ...).
+        """
+        data = {}
+
+        def add(key, value):
+            if not value:
+                return
+            name, n = key, 1
+            while name in data:
+                n += 1
+                name = f"{key} {n}"
+            data[name] = value
+
+        for table in tables or []:
+            for row in self._rows(table):
+                pending_key = None
+                for item in row:
+                    if item is None or (isinstance(item, float) and item != item):
+                        continue
+                    text = str(item)
+                    if not text.strip():
+                        continue
+
+                    prefix, pairs = self._split_cell(text)
+
+                    if not pairs and _normalize(text).rstrip(':').strip() in self._canonical:
+                        # Celda que solo contiene una clave conocida: su valor está en la siguiente celda
+                        pending_key = self._canonical_key(text.strip().rstrip(':'))
+                        continue
+
+                    if pending_key:
+                        add(pending_key, prefix)
+                        pending_key = None
+
+                    for key, value in pairs[:-1]:
+                        add(key, value)
+                    if pairs:
+                        key, value = pairs[-1]
+                        if value:
+                            add(key, value)
+                        else:
+                            pending_key = key
+
+        return data
+
+    def extract_batch(self, documents):
+        """
+        Extrae los pares clave-valor de un lote de documentos.
+
+        :param documents: Diccionario {documento: tablas} o iterable de tuplas (documento, tablas).
+        :return: DataFrame con una fila por documento, una columna 'document' y una columna por clave.
+        """
+        if isinstance(documents, dict):
+            documents = documents.items()
+
+        columns = {'document': []}
+        n_rows = 0
+        for document, tables in documents:
+            data = self.extract(tables)
+            columns['document'].append(document)
+            for key, value in data.items():
+                if key not in columns:
+                    columns[key] = [None] * n_rows
+                columns[key].append(value)
+            n_rows += 1
+            for values in columns.values():
+                if len(values) < n_rows:
+                    values.append(None)
+
+        return pd.DataFrame(columns)
@@ -0,0 +1,336 @@
+import os
+import re
+import json
+import threading
+
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+# Celdas de la cuadrícula del índice espacial por lado de página
+GRID_SIZE = 32
+
+
+def _normalize(text):
+    return ' '.join(text.split()).casefold()
+
+
+def _literal(text):
+    """ Expresión regular de un texto fijo, tolerante a diferencias de espacios. """
+    return r'\s*'.join(re.escape(word) for word in text.split(' ')) if text.strip() else r'\s*'
+
+
+def _line_pattern(content, values):
+    """
+    Construye la expresión regular de una línea del documento anotado reemplazando los valores de los campos por grupos;
+    el resto de la línea (etiquetas y separadores) se conserva como texto fijo.
+
+    :param content: Texto de la línea.
+    :param values: Diccionario campo -> valor presente en la línea.
+    :return: Tupla (patrón, diccionario campo -> número de grupo).
+    """
+    content = ' '.join(content.split())
+    located = []
+    previous_end = 0
+    for field, value in values.items():
+        literal = _literal(' '.join(value.split()))
+        match = None
+        for pattern in (r'(?<!\S)' + literal + r'(?!\S)', literal):
+            # Dos campos de la línea pueden tener el mismo valor (por ejemplo dos fechas iguales): cada valor toma la primera
+            # aparición que no se superpone con las ya ubicadas, de preferencia después de la anterior
+            candidates = [candidate for candidate in re.finditer(pattern, content, re.IGNORECASE)
+                          if not any(candidate.start() < end and start < candidate.end() for start, end, _ in located)]
+            match = next((candidate for candidate in candidates if candidate.start() >= previous_end),
+                         candidates[0] if candidates else None)
+            if match is not None:
+                break
+        if match is None:
+            raise ValueError(f"No se pudo ubicar el valor del campo '{field}' en la línea {content!r}: {value!r}")
+        located.append((match.start(), match.end(), field))
+        previous_end = match.end()
+    located.sort()
+
+    parts, groups, position = [], {}, 0
+    for number, (start, end, field) in enumerate(located, start=1):
+        parts.append(_literal(content[position:start].strip()))
+        parts.append('(.+)' if end == len(content) else '(.+?)')
+        groups[field] = number
+        position = end
+    parts.append(_literal(content[position:].strip()))
+    return r'\s*'.join(parts), groups
+
+
+def _bbox(polygon):
+    """ Caja (x0, y0, x1, y1) de un polígono: lista de puntos (objetos con x, y o diccionarios) o arreglo plano x, y. """
+    if polygon is None or len(polygon) == 0:
+        return None
+    if isinstance(polygon, np.ndarray):
+        points = polygon.reshape(-1, 2)
+        points = points[~np.isnan(points[:, 0])]
+        if not len(points):
+            return None
+        xs, ys = points[:, 0].tolist(), points[:, 1].tolist()
+    elif isinstance(polygon[0], dict):
+        xs, ys = [point['x'] for point in polygon], [point['y'] for point in polygon]
+    else:
+        xs, ys = [point.x for point in polygon], [point.y for point in polygon]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _expand(box, margin):
+    x0, y0, x1, y1 = box
+    return x0 - margin, y0 - margin, x1 + margin, y1 + margin
+
+
+class SpatialIndex():
+    """
+    La clase SpatialIndex indexa por posición las líneas de un resultado de análisis (AnalyzeResult o CompactDocument) y,
+    cuando el resultado las trae con su región, las celdas de sus tablas. Las coordenadas se normalizan al ancho y alto
+    de cada página, de modo que documentos escaneados a distinta resolución o en distinta unidad son comparables.
+    Cada elemento se registra en las celdas de una cuadrícula uniforme por página que toca su caja, así que una consulta
+    solo revisa los elementos de las celdas que cubre la región consultada.
+
+    query:
+        Elementos de una página que intersecan una región y cuyo centro vertical está dentro de ella, en orden de lectura.
+
+    find:
+        Elementos cuyo texto contiene un texto dado.
+    """
+    def __init__(self, result, grid_size=GRID_SIZE):
+        """
+        :param result: Resultado del análisis del documento.
+        :param grid_size: Celdas de la cuadrícula por lado de página.
+        """
+        self.grid_size = grid_size
+        self.items = []  # (página, caja normalizada, contenido)
+        self._grid = {}  # (página, columna, fila) -> índices de self.items
+
+        page_sizes = {}
+        for page in result.pages or []:
+            page_sizes[page.page_number] = (page.width or 1.0, page.height or 1.0)
+            for line in page.lines or []:
+                self._add(page.page_number, _bbox(line.polygon), line.content, page_sizes)
+
+        for table in result.tables or []:
+            for cell in table.cells:
+                for region in getattr(cell, 'bounding_regions', None) or []:
+                    self._add(region.page_number, _bbox(region.polygon), cell.content, page_sizes)
+
+    def _cells(self, box):
+        last = self.grid_size - 1
+        x0, y0, x1, y1 = (min(max(int(value * self.grid_size), 0), last) for value in box)
+        return ((column, row) for column in range(x0, x1 + 1) for row in range(y0, y1 + 1))
+
+    def _add(self, page_number, box, content, page_sizes):
+        if box is None or page_number not in page_sizes:
+            return
+        width, height = page_sizes[page_number]
+        box = (box[0] / width, box[1] / height, box[2] / width, box[3] / height)
+        index = len(self.items)
+        self.items.append((page_number, box, content or ''))
+        for column, row in self._cells(box):
+            self._grid.setdefault((page_number, column, row), []).append(index)
+
+    def query(self, page_number, box):
+        """
+        :param page_number: Número de la página.
+        :param box: Región normalizada (x0, y0, x1, y1).
+        :return: Lista de tuplas (caja, contenido) ordenadas de arriba abajo y de izquierda a derecha.
+        """
+        x0, y0, x1, y1 = box
+        candidates = set()
+        for column, row in self._cells(box):
+            candidates.update(self._grid.get((page_number, column, row), ()))
+
+        found = []
+        for index in candidates:
+            _, (ix0, iy0, ix1, iy1), content = self.items[index]
+            if ix1 >= x0 and ix0 <= x1 and y0 <= (iy0 + iy1) / 2 <= y1:
+                found.append(((ix0, iy0, ix1, iy1), content))
+        found.sort(key=lambda item: (round(item[0][1], 3), item[0][0]))
+        return found
+
+    def find(self, text, page_number=None):
+        """
+        :param text: Texto a buscar (sin distinguir mayúsculas ni espacios repetidos).
+        :param page_number: Página donde buscar (opcional).
+        :return: Lista de tuplas (página, caja, contenido); primero las coincidencias exactas.
+        """
+        text = _normalize(text)
+        matches = [item for item in self.items
+                   if (page_number is None or item[0] == page_number) and text in _normalize(item[2])]
+        matches.sort(key=lambda item: _normalize(item[2]) != text)
+        return matches
+
+
+class LayoutTemplate():
+    """
+    La clase LayoutTemplate describe la disposición de un formulario conocido (por ejemplo el informe de abandono F6CR):
+    para cada campo, la página y la región normalizada donde aparece su valor y, si se aprendió de un texto, el patrón de
+    su línea (las etiquetas fijas, con los valores de los campos de esa línea como grupos). También guarda anclas, textos
+    fijos del formulario con su posición, para reconocer los documentos del mismo tipo.
+
+    learn:
+        Aprende la plantilla a partir de un documento anotado, ubicando los valores de los campos en sus líneas.
+
+    extract:
+        Extrae los valores de los campos consultando el índice espacial de otro documento del mismo tipo.
+
+    score:
+        Proporción de las anclas de la plantilla presentes en su posición en un documento.
+    """
+    def __init__(self, name, fields, anchors=None, margin=0.005):
+        """
+        :param name: Nombre de la plantilla.
+        :param fields: Diccionario campo -> {'page_number', 'box', 'pattern', 'group'}.
+        :param anchors: Lista de diccionarios {'page_number', 'box', 'text'} con los textos fijos del formulario.
+        :param margin: Margen normalizado con el que se amplían las regiones al consultarlas.
+        """
+        self.name = name
+        self.fields = fields
+        self.anchors = anchors or []
+        self.margin = margin
+
+    @classmethod
+    def learn(cls, name, result, annotations, max_anchors=20, margin=0.005):
+        """
+        :param name: Nombre de la plantilla.
+        :param result: Resultado del análisis del documento anotado.
+        :param annotations: Diccionario campo -> valor. El valor puede ser el texto del campo tal como aparece en el
+                            documento anotado, o una tupla (página, (x0, y0, x1, y1)) con la región normalizada.
+        :param max_anchors: Número máximo de anclas.
+        :param margin: Margen normalizado con el que se amplían las regiones al consultarlas.
+        :return: LayoutTemplate.
+        """
+        index = result if isinstance(result, SpatialIndex) else SpatialIndex(result)
+        fields = {}
+        lines = {}  # (página, caja, contenido) -> campos cuyo valor está en la línea
+        for field, value in annotations.items():
+            if not isinstance(value, str):
+                page_number, box = value
+                fields[field] = {'page_number': page_number, 'box': list(box), 'pattern': None, 'group': None}
+                continue
+
+            matches = index.find(value)
+            if not matches:
+                raise ValueError(f"No se encontró el valor del campo '{field}' en el documento anotado: {value!r}")
+            lines.setdefault(matches[0], {})[field] = value
+
+        used = set()
+        for (page_number, box, content), values in lines.items():
+            used.add((page_number, box))
+            pattern, groups = _line_pattern(content, values)
+            for field, group in groups.items():
+                fields[field] = {'page_number': page_number, 'box': list(box), 'pattern': pattern, 'group': group}
+
+        # Anclas: textos sin dígitos que no son valores, repartidos en el documento
+        anchors = [{'page_number': page_number, 'box': list(box), 'text': _normalize(content)}
+                   for page_number, box, content in index.items
+                   if (page_number, box) not in used and len(content.strip()) > 3
+                   and not any(char.isdigit() for char in content)]
+        if len(anchors) > max_anchors:
+            anchors = [anchors[i] for i in np.linspace(0, len(anchors) - 1, max_anchors).round().astype(int)]
+        return cls(name, fields, anchors, margin)
+
+    def _value(self, field, items):
+        text = ' '.join(' '.join(content for _, content in items).split())
+        if field.get('pattern'):
+            match = re.fullmatch(field['pattern'], text, re.IGNORECASE) or re.search(field['pattern'], text, re.IGNORECASE)
+            if match is not None:
+                text = match.group(field['group'])
+        return text.strip() or None
+
+    def extract(self, result):
+        """
+        :param result: Resultado del análisis del documento, o su SpatialIndex.
+        :return: Diccionario campo -> valor (None si la región está vacía).
+        """
+        index = result if isinstance(result, SpatialIndex) else SpatialIndex(result)
+        return {name: self._value(field, index.query(field['page_number'], _expand(field['box'], self.margin)))
+                for name, field in self.fields.items()}
+
+    def score(self, result):
+        """
+        :param result: Resultado del análisis del documento, o su SpatialIndex.
+        :return: Proporción (0 a 1) de anclas encontradas en su posición.
+        """
+        if not self.anchors:
+            return 0.0
+        index = result if isinstance(result, SpatialIndex) else SpatialIndex(result)
+        found = sum(1 for anchor in self.anchors
+                    if any(_normalize(content) == anchor['text']
+                           for _, content in index.query(anchor['page_number'], _expand(anchor['box'], 2 * self.margin))))
+        return found / len(self.anchors)
+
+    def to_dict(self):
+        return {'name': self.name, 'fields': self.fields, 'anchors': self.anchors, 'margin': self.margin}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['name'], data['fields'], data.get('anchors'), data.get('margin', 0.005))
+
+
+class TemplateRegistry():
+    """
+    La clase TemplateRegistry guarda las plantillas de formularios conocidos en un archivo JSON y elige, para cada
+    documento, la plantilla cuyas anclas coinciden mejor con él.
+
+    register:
+        Agrega o reemplaza una plantilla y guarda el registro.
+
+    match:
+        Retorna la plantilla que corresponde a un documento, o None si ninguna alcanza el puntaje mínimo.
+
+    extract:
+        Extrae los campos de un documento con la plantilla que le corresponde.
+    """
+    def __init__(self, path=None, min_score=0.6):
+        """
+        :param path: Archivo JSON del registro (opcional); si existe, se cargan sus plantillas.
+        :param min_score: Proporción mínima de anclas encontradas para aplicar una plantilla.
+        """
+        self.path = path
+        self.min_score = min_score
+        self.templates = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for data in json.load(f):
+                    template = LayoutTemplate.from_dict(data)
+                    self.templates[template.name] = template
+
+    def register(self, template):
+        """
+        :param template: LayoutTemplate a registrar.
+        """
+        with self._lock:
+            self.templates[template.name] = template
+            if self.path:
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump([item.to_dict() for item in self.templates.values()], f, ensure_ascii=False, indent=1)
+                os.replace(tmp_path, self.path)
+
+    def match(self, result):
+        """
+        :param result: Resultado del análisis del documento, o su SpatialIndex.
+        :return: LayoutTemplate con mayor puntaje, o None.
+        """
+        index = result if isinstance(result, SpatialIndex) else SpatialIndex(result)
+        best, best_score = None, self.min_score
+        for template in self.templates.values():
+            score = template.score(index)
+            if score >= best_score:
+                best, best_score = template, score
+        return best
+
+    def extract(self, result):
+        """
+        :param result: Resultado del análisis del documento, o su SpatialIndex.
+        :return: Tupla (nombre de la plantilla, diccionario campo -> valor), o None si ninguna plantilla corresponde.
+        """
+        index = result if isinstance(result, SpatialIndex) else SpatialIndex(result)
+        template = self.match(index)
+        if template is None:
+            return None
+        return template.name, template.extract(index)
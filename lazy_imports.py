@@ -0,0 +1,49 @@
+import importlib
+import threading
+
+_lock = threading.Lock()
+
+
+class LazyModule():
+    """
+    Módulo que se importa en el primer acceso a uno de sus atributos. Se usa para las dependencias pesadas (pandas, numpy,
+    pyarrow, pypdf y los SDK de Azure), de modo que importar los módulos del proyecto no las carga hasta que se necesitan.
+    Después del primer acceso, los atributos del módulo se copian en la instancia y se leen sin costo adicional.
+    """
+    def __init__(self, name):
+        """
+        :param name: Nombre completo del módulo (por ejemplo 'azure.storage.blob').
+        """
+        self.__dict__['_lazy_module_name'] = name
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def _load(self):
+        with _lock:
+            module = importlib.import_module(self._lazy_module_name)
+            self.__dict__.update(vars(module))
+        return module
+
+    def __repr__(self):
+        return f"<módulo diferido {self._lazy_module_name!r}>"
+
+
+def lazy_import(name):
+    """
+    :param name: Nombre completo del módulo.
+    :return: LazyModule que importa el módulo en el primer acceso.
+    """
+    return LazyModule(name)
+
+
+def load(module):
+    """
+    Importa de inmediato un módulo diferido, por ejemplo para adelantar su costo al arranque.
+
+    :param module: LazyModule (o un módulo ya importado, que se retorna tal cual).
+    :return: El módulo importado.
+    """
+    if isinstance(module, LazyModule):
+        return module._load()
+    return module
@@ -0,0 +1,195 @@
+import json
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+# Límites por defecto de los histogramas de latencia, en segundos
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Límites por defecto de los histogramas de conteo (páginas, tablas, celdas)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000, 10000)
+
+
+class Histogram():
+    """ Histograma acumulativo de buckets fijos, compatible con el formato de Prometheus. """
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self):
+        cumulative, running = {}, 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            running += count
+            cumulative[str(bound)] = running
+        return {'count': self.count, 'sum': self.sum, 'buckets': cumulative}
+
+
+class Metrics():
+    """
+    La clase Metrics es un registro liviano de métricas para el pipeline de OCR: contadores (documentos, bytes transferidos,
+    aciertos de caché...), temporizadores por etapa e histogramas (latencias, páginas y tablas por documento).
+
+    increment:
+        Suma un valor a un contador.
+
+    observe:
+        Registra un valor en un histograma.
+
+    timer:
+        Administrador de contexto que mide la duración de un bloque y la registra en el histograma '<nombre>_seconds'.
+
+    to_json / to_prometheus:
+        Exportan las métricas como JSON o en el formato de texto de Prometheus.
+
+    Con enabled=False todas las operaciones retornan de inmediato, sin costo apreciable.
+    """
+    def __init__(self, enabled=True, prefix='ocr_'):
+        """
+        :param enabled: Si es False, las métricas no se registran.
+        :param prefix: Prefijo de los nombres de las métricas al exportar a Prometheus.
+        """
+        self.enabled = enabled
+        self.prefix = prefix
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return (name, tuple(sorted(labels.items()))) if labels else (name, ())
+
+    def increment(self, name, value=1, **labels):
+        """
+        Suma un valor a un contador.
+
+        :param name: Nombre del contador.
+        :param value: Valor a sumar.
+        :param labels: Etiquetas opcionales (por ejemplo stage='download').
+        """
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        """
+        Registra un valor en un histograma.
+
+        :param name: Nombre del histograma.
+        :param value: Valor observado.
+        :param buckets: Límites de los buckets, usados al crear el histograma.
+        :param labels: Etiquetas opcionales.
+        """
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """
+        Mide la duración de un bloque y la registra en el histograma '<name>_seconds'.
+
+        :param name: Nombre de la etapa.
+        :param labels: Etiquetas opcionales.
+        """
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(f"{name}_seconds", time.perf_counter() - start, **labels)
+
+    def reset(self):
+        """ Elimina todas las métricas registradas. """
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def to_dict(self):
+        """
+        :return: Diccionario con los contadores y los histogramas registrados.
+        """
+        def label_text(labels):
+            return ','.join(f"{key}={value}" for key, value in labels)
+
+        with self._lock:
+            counters = {}
+            for (name, labels), value in self._counters.items():
+                counters.setdefault(name, {})[label_text(labels)] = value
+            histograms = {}
+            for (name, labels), histogram in self._histograms.items():
+                histograms.setdefault(name, {})[label_text(labels)] = histogram.to_dict()
+        return {'counters': counters, 'histograms': histograms}
+
+    def to_json(self, indent=2):
+        """
+        :return: Métricas serializadas como JSON.
+        """
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=indent)
+
+    def to_prometheus(self):
+        """
+        :return: Métricas en el formato de exposición de texto de Prometheus.
+        """
+        def escape_label(value):
+            # El formato de texto exige escapar la barra invertida (primero), las comillas dobles y el salto de línea
+            return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+        def labels_text(labels, extra=()):
+            items = list(labels) + list(extra)
+            if not items:
+                return ''
+            return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in items) + '}'
+
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self._counters}):
+                lines.append(f"# TYPE {self.prefix}{name} counter")
+                for (counter_name, labels), value in sorted(self._counters.items()):
+                    if counter_name == name:
+                        lines.append(f"{self.prefix}{name}{labels_text(labels)} {value}")
+
+            for name in sorted({name for name, _ in self._histograms}):
+                lines.append(f"# TYPE {self.prefix}{name} histogram")
+                for (histogram_name, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0]):
+                    if histogram_name != name:
+                        continue
+                    running = 0
+                    for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                        running += count
+                        lines.append(f"{self.prefix}{name}_bucket{labels_text(labels, [('le', bound)])} {running}")
+                    lines.append(f"{self.prefix}{name}_sum{labels_text(labels)} {histogram.sum}")
+                    lines.append(f"{self.prefix}{name}_count{labels_text(labels)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def save(self, path):
+        """
+        Guarda las métricas en un archivo: formato Prometheus si la extensión es .prom, JSON en otro caso.
+
+        :param path: Ruta del archivo de salida.
+        """
+        content = self.to_prometheus() if path.endswith('.prom') else self.to_json()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+
+# Registro compartido por BlobFunctions y DocumentIntelligence
+metrics = Metrics()
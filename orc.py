@@ -1,84 +1,69 @@
 from document_intelligence_functions import DocumentIntelligence
+from key_value_extraction import KeyValueExtractor
+from parquet_writer import PartitionedParquetWriter
 import os
-import pandas as pd
+import logging
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def get_extractor():
+    """ KeyValueExtractor compartido, creado en el primer uso y no al importar el módulo. """
+    return KeyValueExtractor()
+
 
 def process_table(table):
-    data = {}
-    for index, row in table.iterrows():
-        # Concatenar todos los elementos no nulos de la fila en una sola cadena
-        full_row = ' '.join(str(item) for item in row if pd.notna(item))
-        # Dividir la cadena completa en posibles pares clave-valor
-        parts = full_row.split(':')
-        current_key = None
-        
-        # Iterar sobre las partes para formar correctamente los pares clave-valor
-        for i, part in enumerate(parts):
-            if i == 0:
-                # El primer elemento siempre es una clave
-                current_key = part.strip()
-            else:
-                # Los siguientes elementos pueden ser valor de la clave anterior y clave del siguiente par
-                # Dividir en el último espacio para separar el valor de la nueva clave
-                last_space_index = part.rfind(' ')
-                if last_space_index != -1:
-                    value = part[:last_space_index].strip()
-                    new_key = part[last_space_index:].strip()
-                    
-                    if current_key and value:
-                        data[current_key] = value
-                    current_key = new_key
-                else:
-                    # En caso de que no haya espacio, toda la parte es un valor
-                    if current_key:
-                        data[current_key] = part.strip()
-                        
-        # Asegurarse de añadir el último par si es necesario
-        if current_key and i == len(parts) - 1 and parts[i]:
-            data[current_key] = parts[i].strip()
-    
-    return data
-
-# Asegúrate de que el directorio actual es donde está el script y el PDF
-os.chdir(os.path.dirname(os.path.abspath(__file__)))
-
-# Ruta al documento PDF
-file_path = "F6CR_Aprobada_Hamaca-100D_27052022.pdf"
-
-# Crear una instancia de la clase DocumentIntelligence
-doc_intelligence = DocumentIntelligence()
-
-# Intentar llamar al método analyze_read para procesar el documento
-try:
-    text_content, tables = doc_intelligence.analyze_read(file_path=file_path)
-except Exception as e:
-    print(f"Error al procesar el documento: {e}")
-    exit()
-
-# Imprimir el contenido del documento
-# for page_text in text_content:
-#     print("Contenido de la página:", page_text)
-
-# Preparar un DataFrame para guardar todos los datos
-all_data = []
-
-# Si hay tablas, procesarlas
-if tables:
-    for table in tables:
-        data = process_table(table)
-        if data:
-            print(data)  # Opcional: imprimir para depuración
-            all_data.append(data)
-
-# Convertir todos los datos en un DataFrame y guardarlos en Excel
-if all_data:
-    df = pd.DataFrame(all_data)
+    """
+    Extrae los pares clave-valor de una tabla tipo formulario.
+
+    :param table: DataFrame de la tabla.
+    :return: Diccionario clave -> valor.
+    """
+    return get_extractor().extract([table])
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    # Asegúrate de que el directorio actual es donde está el script y el PDF
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    # Ruta al documento PDF
+    file_path = "F6CR_Aprobada_Hamaca-100D_27052022.pdf"
+
+    # Crear una instancia de la clase DocumentIntelligence
+    doc_intelligence = DocumentIntelligence()
+
+    # Analizar el documento una sola vez; el texto y las tablas se derivan del mismo resultado
     try:
-        df.to_excel("datos_pozo.xlsx", index=False)
-        print("Todos los datos han sido exportados a Excel exitosamente.")
+        session = doc_intelligence.open_session(file_path=file_path)
+        text_content, tables = session.analyze_read()
     except Exception as e:
-        print(f"Error al guardar en Excel: {e}")
-else:
-    print("No se encontraron datos para exportar.")
+        print(f"Error al procesar el documento: {e}")
+        return
+
+    # Imprimir el contenido del documento
+    # for page_text in text_content:
+    #     print("Contenido de la página:", page_text)
+
+    # Extraer los pares clave-valor de todas las tablas del documento en un solo DataFrame
+    df = get_extractor().extract_batch({file_path: tables})
+
+    # Guardar los datos en el conjunto Parquet particionado por campo y pozo
+    if len(df.columns) > 1:
+        print(df.iloc[0].dropna().to_dict())  # Opcional: imprimir para depuración
+        try:
+            with PartitionedParquetWriter("datos_pozo") as writer:
+                writer.append(df.to_dict(orient='records'))
+            print("Todos los datos han sido exportados a Parquet exitosamente.")
+        except Exception as e:
+            print(f"Error al guardar en Parquet: {e}")
+    else:
+        print("No se encontraron datos para exportar.")
+
+
+if __name__ == "__main__":
+    main()
 
 
 # import pandas as pd
@@ -0,0 +1,197 @@
+import io
+import re
+import hashlib
+
+from lazy_imports import lazy_import
+
+pypdf = lazy_import('pypdf')
+
+# Prefijo aleatorio de las fuentes incrustadas como subconjunto (por ejemplo ABCDEF+Arial)
+SUBSET_PREFIX = re.compile(r'^/?[A-Z]{6}\+')
+
+
+def _stream_data(obj):
+    try:
+        return obj.get_data()
+    except Exception:
+        return b''
+
+
+def _hash_resources(resources, digest, depth=0):
+    """ Agrega al hash las imágenes, formularios y fuentes usados por una página. """
+    if resources is None or depth > 4:
+        return
+    resources = resources.get_object()
+
+    xobjects = resources.get('/XObject')
+    if xobjects is not None:
+        xobjects = xobjects.get_object()
+        for name in sorted(xobjects):
+            xobject = xobjects[name].get_object()
+            digest.update(name.encode())
+            digest.update(hashlib.sha256(_stream_data(xobject)).digest())
+            if xobject.get('/Subtype') == '/Form':
+                _hash_resources(xobject.get('/Resources'), digest, depth + 1)
+
+    fonts = resources.get('/Font')
+    if fonts is not None:
+        fonts = fonts.get_object()
+        for name in sorted(fonts):
+            font = fonts[name].get_object()
+            digest.update(name.encode())
+            # El nombre sin el prefijo de subconjunto y el mapa a Unicode determinan el texto que produce la página
+            digest.update(SUBSET_PREFIX.sub('', str(font.get('/BaseFont', ''))).encode())
+            encoding = font.get('/Encoding')
+            if encoding is not None:
+                digest.update(repr(encoding.get_object()).encode())
+            to_unicode = font.get('/ToUnicode')
+            if to_unicode is not None:
+                digest.update(hashlib.sha256(_stream_data(to_unicode.get_object())).digest())
+
+
+def page_fingerprints(pdf_bytes):
+    """
+    Calcula una huella por página a partir del flujo de contenido de la página, su tamaño y rotación, y los recursos que
+    usa (imágenes y formularios por su contenido, fuentes por nombre y mapa a Unicode). Dos páginas con la misma huella
+    se ven igual, aunque provengan de archivos distintos.
+
+    :param pdf_bytes: Bytes del documento PDF.
+    :return: Lista con la huella hexadecimal de cada página.
+    """
+    reader = pypdf.PdfReader(io.BytesIO(pdf_bytes))
+    fingerprints = []
+    for page in reader.pages:
+        digest = hashlib.sha256()
+        digest.update(repr([float(value) for value in page.mediabox]).encode())
+        digest.update(str(page.get('/Rotate', 0)).encode())
+        contents = page.get_contents()
+        digest.update(contents.get_data() if contents is not None else b'')
+        try:
+            _hash_resources(page.get('/Resources'), digest)
+        except Exception:
+            # Recursos ilegibles: la huella no puede garantizar la igualdad, se hace única para la página
+            digest.update(repr((id(reader), page.page_number)).encode())
+        fingerprints.append(digest.hexdigest())
+    return fingerprints
+
+
+def _relocate(node, page_map, content_offset):
+    """ Reemplaza en el lugar los números de página según page_map y desplaza los spans. """
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == 'page_number' and isinstance(value, int):
+                node[key] = page_map[value]
+            elif key == 'spans' and isinstance(value, list):
+                for span in value:
+                    span['offset'] += content_offset
+            elif key == 'span' and isinstance(value, dict):
+                value['offset'] += content_offset
+            else:
+                _relocate(value, page_map, content_offset)
+    elif isinstance(node, list):
+        for item in node:
+            _relocate(item, page_map, content_offset)
+
+
+def _regions_pages(item):
+    return {region['page_number'] for region in item.get('bounding_regions') or []}
+
+
+def split_by_page(result):
+    """
+    Divide un AnalyzeResult serializado en fragmentos autocontenidos: cada fragmento tiene sus páginas numeradas desde 1,
+    sus tablas y párrafos, y su propio contenido con los spans relativos a él. Las páginas unidas por una tabla o un párrafo
+    que continúa de una página a otra quedan en un mismo fragmento. Los estilos, idiomas y documentos, que no pertenecen
+    a una página, no se conservan.
+
+    :param result: AnalyzeResult serializado (AnalyzeResult.to_dict()).
+    :return: Lista de tuplas (páginas del resultado que cubre el fragmento, fragmento).
+    """
+    pages = result.get('pages') or []
+    content = result.get('content') or ''
+    page_numbers = [page['page_number'] for page in pages]
+
+    # Grupos de páginas consecutivas unidas por elementos de varias páginas
+    group_of = {number: number for number in page_numbers}
+
+    def find(number):
+        while group_of[number] != number:
+            number = group_of[number]
+        return number
+
+    items = (result.get('tables') or []) + (result.get('paragraphs') or [])
+    for item in items:
+        item_pages = sorted(_regions_pages(item) & set(page_numbers))
+        for number in range(item_pages[0], item_pages[-1] + 1) if len(item_pages) > 1 else ():
+            if number in group_of:
+                group_of[find(number)] = find(item_pages[0])
+
+    groups = {}
+    for number in page_numbers:
+        groups.setdefault(find(number), []).append(number)
+
+    fragments = []
+    for numbers in groups.values():
+        members = set(numbers)
+        group_pages = [page for page in pages if page['page_number'] in members]
+        offsets = [(span['offset'], span['offset'] + span['length']) for page in group_pages for span in page.get('spans') or []]
+        start = min((begin for begin, _ in offsets), default=0)
+        end = max((finish for _, finish in offsets), default=0)
+
+        fragment = {key: value for key, value in result.items()
+                    if key not in ('content', 'pages', 'tables', 'paragraphs', 'styles', 'languages', 'documents',
+                                   'key_value_pairs')}
+        fragment['content'] = content[start:end]
+        fragment['pages'] = group_pages
+        fragment['tables'] = [table for table in result.get('tables') or [] if _regions_pages(table) & members]
+        fragment['paragraphs'] = [paragraph for paragraph in result.get('paragraphs') or []
+                                  if _regions_pages(paragraph) & members]
+        for key in ('styles', 'languages', 'documents', 'key_value_pairs'):
+            fragment[key] = []
+
+        fragment = _copy(fragment)
+        _relocate(fragment, {number: i for i, number in enumerate(numbers, start=1)}, -start)
+        fragments.append((numbers, fragment))
+    return fragments
+
+
+def _copy(node):
+    if isinstance(node, dict):
+        return {key: _copy(value) for key, value in node.items()}
+    if isinstance(node, list):
+        return [_copy(item) for item in node]
+    return node
+
+
+def assemble_pages(fragments):
+    """
+    Une fragmentos (propios o recuperados de la caché) en un solo AnalyzeResult serializado, con los números de página
+    del documento original y los spans corregidos según la posición de cada fragmento en el contenido unido.
+
+    :param fragments: Lista de tuplas (páginas originales del fragmento, fragmento), con las páginas locales numeradas
+                      desde 1 en el mismo orden.
+    :return: AnalyzeResult serializado.
+    """
+    fragments = sorted(fragments, key=lambda item: item[0][0])
+    merged = {key: value for key, value in fragments[0][1].items()
+              if key not in ('content', 'pages', 'tables', 'paragraphs', 'styles', 'languages', 'documents', 'key_value_pairs')}
+    for key in ('pages', 'tables', 'paragraphs', 'styles', 'languages', 'documents', 'key_value_pairs'):
+        merged[key] = []
+
+    contents = []
+    content_length = 0
+    for page_numbers, fragment in fragments:
+        fragment = _copy(fragment)
+        content = fragment.get('content') or ''
+        content_offset = content_length + (1 if contents else 0)
+        _relocate(fragment, dict(enumerate(page_numbers, start=1)), content_offset)
+        for key in ('pages', 'tables', 'paragraphs'):
+            merged[key].extend(fragment.get(key) or [])
+        contents.append(content)
+        content_length = content_offset + len(content)
+
+    merged['content'] = '\n'.join(contents)
+    merged['pages'].sort(key=lambda page: page['page_number'])
+    merged['tables'].sort(key=lambda table: min(_regions_pages(table), default=0))
+    merged['paragraphs'].sort(key=lambda paragraph: min(_regions_pages(paragraph), default=0))
+    return merged
@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import logging
+import threading
+from urllib.parse import quote
+
+from lazy_imports import lazy_import
+
+pd = lazy_import('pandas')
+pa = lazy_import('pyarrow')
+ds = lazy_import('pyarrow.dataset')
+pq = lazy_import('pyarrow.parquet')
+
+NULL_PARTITION = '__null__'
+
+logger = logging.getLogger(__name__)
+
+
+def _string_type():
+    """ Tipo de todas las columnas de datos: cadenas codificadas con diccionario. """
+    return pa.dictionary(pa.int32(), pa.string())
+
+
+class PartitionedParquetWriter():
+    """
+    La clase PartitionedParquetWriter escribe de forma incremental los registros extraídos (diccionarios clave -> valor)
+    en archivos Parquet particionados al estilo Hive (por ejemplo Campo=HAMACA/Pozo=HAMACA-100D/part-....parquet).
+
+    append:
+        Agrega registros a un búfer por partición; cuando una partición acumula rows_per_file filas se escribe un archivo.
+
+    close:
+        Escribe las filas pendientes y guarda el esquema acumulado.
+
+    read:
+        Lee el conjunto de datos completo (o solo algunas columnas) unificando los esquemas de todos los archivos.
+
+    El esquema evoluciona a medida que aparecen claves nuevas: cada archivo contiene las columnas conocidas al momento
+    de escribirlo y la lectura unifica los esquemas, dejando en nulo las columnas ausentes. Todas las columnas de datos
+    se guardan como cadenas codificadas con diccionario, lo que comprime muy bien los valores repetidos (campos, contratos...).
+    """
+    def __init__(self, root_path, partition_by=('Campo', 'Pozo'), rows_per_file=10000):
+        """
+        :param root_path: Directorio raíz del conjunto de datos.
+        :param partition_by: Columnas usadas para particionar (por ejemplo ('Campo', 'Pozo') o ('document',)); puede ser vacío.
+        :param rows_per_file: Número de filas por partición a partir del cual se escribe un archivo.
+        """
+        self.root_path = root_path
+        self.partition_by = list(partition_by or [])
+        self.rows_per_file = rows_per_file
+        self.columns = []
+        self.files_written = 0
+        self.rows_written = 0
+        self._known = set()
+        self._buffers = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(root_path, exist_ok=True)
+        schema_path = os.path.join(root_path, '_schema.json')
+        if os.path.exists(schema_path):
+            with open(schema_path, encoding='utf-8') as f:
+                self.columns = json.load(f)['columns']
+            self._known = set(self.columns)
+
+    def append(self, records):
+        """
+        Agrega registros al conjunto de datos.
+
+        :param records: Iterable de diccionarios clave -> valor (o un único diccionario).
+        """
+        if isinstance(records, dict):
+            records = [records]
+
+        to_flush = []
+        with self._lock:
+            for record in records:
+                for key in record:
+                    if key not in self._known and key not in self.partition_by:
+                        self._known.add(key)
+                        self.columns.append(key)
+
+                partition = tuple(self._partition_value(record.get(key)) for key in self.partition_by)
+                buffer = self._buffers.setdefault(partition, [])
+                buffer.append(record)
+                if len(buffer) >= self.rows_per_file:
+                    to_flush.append((partition, self._buffers.pop(partition)))
+            columns = list(self.columns)
+
+        for partition, rows in to_flush:
+            self._write(partition, rows, columns)
+
+    @staticmethod
+    def _partition_value(value):
+        if value is None or (isinstance(value, float) and value != value) or str(value).strip() == '':
+            return NULL_PARTITION
+        return str(value).strip()
+
+    def _write(self, partition, rows, columns):
+        """ Escribe un archivo Parquet con las filas de una partición, construyendo cada columna de una sola vez. """
+        if not columns:
+            # Parquet no puede representar filas sin columnas; solo existen los valores de partición
+            logger.warning("Parquet: se omiten %d filas sin columnas de datos en la partición %s", len(rows), partition)
+            return
+        arrays = []
+        for column in columns:
+            values = [row.get(column) for row in rows]
+            values = [None if value is None or (isinstance(value, float) and value != value) else str(value)
+                      for value in values]
+            arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+        table = pa.Table.from_arrays(arrays, schema=pa.schema([pa.field(column, _string_type()) for column in columns]))
+
+        directory = os.path.join(self.root_path, *[f"{quote(key, safe='')}={quote(value, safe='')}"
+                                                   for key, value in zip(self.partition_by, partition)])
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            self.files_written += 1
+            self.rows_written += len(rows)
+            name = f"part-{time.time_ns()}-{self.files_written:05d}.parquet"
+        pq.write_table(table, os.path.join(directory, name), use_dictionary=True, compression='zstd')
+
+    def flush(self):
+        """ Escribe todas las filas pendientes en el búfer. """
+        with self._lock:
+            buffers, self._buffers = self._buffers, {}
+            columns = list(self.columns)
+        for partition, rows in buffers.items():
+            if rows:
+                self._write(partition, rows, columns)
+
+    def close(self):
+        """ Escribe las filas pendientes y guarda el esquema acumulado. """
+        self.flush()
+        with open(os.path.join(self.root_path, '_schema.json'), 'w', encoding='utf-8') as f:
+            json.dump({'columns': self.columns, 'partition_by': self.partition_by}, f, ensure_ascii=False)
+        logger.info("Parquet: %d filas en %d archivos bajo %s", self.rows_written, self.files_written, self.root_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def read(root_path, columns=None, filter=None):
+        """
+        Lee el conjunto de datos unificando los esquemas de todos los archivos.
+
+        :param root_path: Directorio raíz del conjunto de datos.
+        :param columns: Lista opcional de columnas a leer; solo esas columnas se leen del disco.
+        :param filter: Expresión opcional de pyarrow.dataset para filtrar filas o particiones.
+        :return: DataFrame de pandas.
+        """
+        files = [os.path.join(root, name) for root, _, names in os.walk(root_path)
+                 for name in names if name.endswith('.parquet')]
+        if not files:
+            return pd.DataFrame(columns=columns)
+
+        partitioning = ds.HivePartitioning.discover(infer_dictionary=True)
+        dataset = ds.dataset(files, format='parquet', partitioning=partitioning, partition_base_dir=root_path)
+        schema = pa.unify_schemas([pq.read_schema(path) for path in files] + [dataset.schema])
+        dataset = ds.dataset(files, format='parquet', partitioning=partitioning, partition_base_dir=root_path, schema=schema)
+
+        table = dataset.to_table(columns=columns, filter=filter)
+        df = table.to_pandas()
+        for column in df.columns:
+            if isinstance(df[column].dtype, pd.CategoricalDtype) and NULL_PARTITION in df[column].cat.categories:
+                df[column] = df[column].astype(object).where(df[column] != NULL_PARTITION, None)
+        return df
@@ -0,0 +1,449 @@
+import os
+import json
+import time
+import hashlib
+import queue
+import logging
+import argparse
+import threading
+
+from blob_functions import BlobFunctions
+from document_intelligence_functions import DocumentIntelligence
+from analysis_cache import AnalysisCache
+from key_value_extraction import KeyValueExtractor
+from change_index import ChangeIndex
+from parquet_writer import PartitionedParquetWriter
+from metrics import metrics
+from request_scheduler import RequestScheduler
+from layout_templates import TemplateRegistry
+from text_index import TextIndex
+from structuring_pool import StructuringPool
+from work_queue import BlobWorkQueue
+
+logger = logging.getLogger(__name__)
+
+# Marca de fin de flujo entre etapas
+END = object()
+
+
+class Manifest():
+    """
+    La clase Manifest registra el progreso de un lote en un archivo JSON Lines de solo anexado, de modo que una
+    ejecución interrumpida pueda retomarse omitiendo los documentos que ya terminaron.
+    """
+    def __init__(self, path):
+        """
+        :param path: Ruta del archivo del manifiesto.
+        """
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Última línea incompleta de una ejecución que se cayó a mitad de escritura
+                        continue
+                    self.entries[entry['blob_name']] = entry
+
+    def is_done(self, blob_name, etag=None):
+        """
+        Indica si un documento ya terminó; si se indica el ETag, el documento debe haberse procesado en esa misma versión.
+        """
+        entry = self.entries.get(blob_name)
+        if entry is None or entry['status'] != 'done':
+            return False
+        return etag is None or entry.get('etag') in (None, etag)
+
+    def record(self, blob_name, status, **info):
+        """
+        Registra el estado de un documento ('done' o 'error').
+
+        :param blob_name: Nombre completo del blob.
+        :param status: Estado del documento.
+        :param info: Información adicional a guardar con la entrada.
+        """
+        entry = {'blob_name': blob_name, 'status': status, 'time': time.time(), **info}
+        with self._lock:
+            self.entries[blob_name] = entry
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                f.flush()
+
+
+class Stage():
+    """
+    Etapa del pipeline: un grupo de hilos que toma elementos de una cola de entrada acotada, los procesa y
+    deja el resultado en la cola de la siguiente etapa. Las colas acotadas producen contrapresión: una etapa
+    lenta frena a las anteriores en lugar de acumular elementos en memoria.
+    """
+    def __init__(self, name, function, workers, in_queue, out_queue):
+        self.name = name
+        self.function = function
+        self.workers = workers
+        self.in_queue = in_queue
+        self.out_queue = out_queue
+        self.processed = 0
+        self.emitted = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.started = None
+        self.finished = None
+        self._alive = workers
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self, downstream_workers):
+        self.started = time.perf_counter()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, args=(downstream_workers,), name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self, downstream_workers):
+        while True:
+            item = self.in_queue.get()
+            if item is END:
+                break
+            start = time.perf_counter()
+            try:
+                emitted = 0
+                for output in self.function(item):
+                    if self.out_queue is not None:
+                        self.out_queue.put(output)
+                    emitted += 1
+                with self._lock:
+                    self.emitted += emitted
+                    self.processed += 1
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                metrics.increment('stage_errors', stage=self.name)
+                logger.warning("[%s] Error: %s", self.name, e)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.busy_seconds += elapsed
+                metrics.observe('stage_seconds', elapsed, stage=self.name)
+
+        with self._lock:
+            self._alive -= 1
+            last = self._alive == 0
+        if last:
+            self.finished = time.perf_counter()
+            if self.out_queue is not None:
+                for _ in range(downstream_workers):
+                    self.out_queue.put(END)
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def summary(self):
+        wall = (self.finished or time.perf_counter()) - (self.started or time.perf_counter())
+        return {
+            'stage': self.name,
+            'workers': self.workers,
+            'processed': self.processed,
+            'emitted': self.emitted,
+            'errors': self.errors,
+            'wall_seconds': round(wall, 3),
+            'busy_seconds': round(self.busy_seconds, 3),
+            'items_per_second': round(self.processed / wall, 3) if wall > 0 else 0.0,
+        }
+
+
+class BatchPipeline():
+    """
+    La clase BatchPipeline procesa todos los documentos de una carpeta de Blob Storage como un pipeline productor/consumidor
+    por etapas: listado -> descarga -> análisis -> estructuración de tablas -> salida. Cada etapa tiene su propio número
+    de hilos y una cola acotada. Un manifiesto registra los documentos terminados para poder retomar una ejecución interrumpida.
+    Con una BlobWorkQueue, varios nodos ejecutan el mismo pipeline sobre la misma carpeta y cada uno procesa solo lo que reclama.
+    """
+    def __init__(self, blob_functions, document_intelligence, output_path, manifest_path,
+                 download_workers=4, analysis_workers=8, structure_workers=2, queue_size=8,
+                 extractor=None, change_index=None, on_deleted='flag', parquet_writer=None, templates=None,
+                 text_index=None, structuring_pool=None, work_queue=None):
+        """
+        :param blob_functions: Instancia de BlobFunctions.
+        :param document_intelligence: Instancia de DocumentIntelligence.
+        :param output_path: Archivo JSON Lines local donde se escribe un registro por documento.
+        :param manifest_path: Archivo del manifiesto de progreso.
+        :param download_workers: Hilos de descarga.
+        :param analysis_workers: Hilos de análisis (documentos en vuelo en el servicio).
+        :param structure_workers: Hilos de estructuración de tablas.
+        :param queue_size: Tamaño máximo de cada cola entre etapas.
+        :param extractor: KeyValueExtractor opcional para estructurar las tablas.
+        :param change_index: ChangeIndex opcional para el modo incremental: solo se procesan los blobs nuevos o modificados.
+        :param on_deleted: Qué hacer con los blobs eliminados del origen en modo incremental: 'flag' los marca en el índice
+                           y 'remove' los elimina de él; en ambos casos se escribe un registro {'deleted': true} en la salida.
+        :param parquet_writer: PartitionedParquetWriter opcional; si se proporciona, los pares extraídos de cada documento
+                               también se agregan como una fila al conjunto de datos Parquet.
+        :param templates: TemplateRegistry opcional; los documentos que corresponden a una plantilla registrada se extraen
+                          por posición con ella, y los demás con el extractor de tablas.
+        :param text_index: TextIndex opcional donde se indexa el texto por página de cada documento terminado; los blobs
+                           eliminados del origen se quitan del índice.
+        :param structuring_pool: StructuringPool opcional; la extracción de pares clave-valor de las tablas se ejecuta
+                                 en sus procesos, de modo que la estructuración escala con los núcleos.
+        :param work_queue: BlobWorkQueue opcional para repartir la carpeta entre varios nodos: solo se procesan los documentos
+                           que este nodo reclama, y al terminar cada uno se escribe su marcador en Blob Storage.
+        """
+        self.blob_functions = blob_functions
+        self.document_intelligence = document_intelligence
+        self.output_path = output_path
+        self.manifest = Manifest(manifest_path)
+        self.download_workers = download_workers
+        self.analysis_workers = analysis_workers
+        self.structure_workers = structure_workers
+        self.queue_size = queue_size
+        self.extractor = extractor or KeyValueExtractor()
+        self.change_index = change_index
+        self.on_deleted = on_deleted
+        self.parquet_writer = parquet_writer
+        self.templates = templates
+        self.text_index = text_index
+        self.structuring_pool = structuring_pool
+        self.work_queue = work_queue
+        self._output_lock = threading.Lock()
+
+    def _list(self, request):
+        blob_folder_path, end = request
+        if self.work_queue is not None:
+            blobs = self.work_queue.claims(blob_folder_path, end)
+        elif self.change_index is not None:
+            blobs, deleted = self.blob_functions.list_changed_blobs(blob_folder_path, end, self.change_index)
+            self._handle_deleted(deleted)
+        else:
+            blobs = (blob for blob in self.blob_functions.container_client.list_blobs(name_starts_with=f'{blob_folder_path}/')
+                     if blob.name.lower().endswith(end))
+
+        for blob in blobs:
+            if self.manifest.is_done(blob.name, getattr(blob, 'etag', None)):
+                if self.work_queue is not None:
+                    # Terminado en una ejecución anterior de este nodo que no alcanzó a escribir el marcador
+                    self.work_queue.complete(blob.name, output=self.output_path)
+                continue
+            yield blob
+
+    def _handle_deleted(self, deleted):
+        if not deleted:
+            return
+        entries = self.blob_functions.handle_deleted_blobs(deleted, self.change_index, self.on_deleted)
+        for entry in entries:
+            if self.text_index is not None:
+                self.text_index.remove(entry['blob_name'])
+            self._write_output({'blob_name': entry['blob_name'], 'deleted': True, 'previous_output': entry.get('output')})
+        self.change_index.save()
+        logger.info("Blobs eliminados del origen (%s): %d", self.on_deleted, len(entries))
+
+    def _download(self, blob):
+        try:
+            item = self.blob_functions._download_blob(blob, max_concurrency=2, spool_threshold=8 * 1024 * 1024)
+        except Exception as e:
+            self._record_error(blob.name, 'download', e)
+            raise
+        if self.change_index is not None:
+            item['content_hash'] = self._content_hash(item['file'])
+            if self.change_index.is_same_content(blob.name, item['content_hash']):
+                # Contenido idéntico al ya procesado: solo se actualiza la firma del blob
+                self.change_index.record(blob.name, item['signature'], item['content_hash'],
+                                         self.change_index.entries[blob.name].get('output'))
+                self.manifest.record(blob.name, 'done', etag=item['signature']['etag'], unchanged=True)
+                if self.work_queue is not None:
+                    self.work_queue.complete(blob.name, unchanged=True)
+                return
+        yield item
+
+    @staticmethod
+    def _content_hash(file):
+        digest = hashlib.sha256()
+        if isinstance(file, (bytes, bytearray)):
+            digest.update(file)
+        else:
+            for chunk in iter(lambda: file.read(1024 * 1024), b''):
+                digest.update(chunk)
+            file.seek(0)
+        return digest.hexdigest()
+
+    def _analyze(self, item):
+        try:
+            session = self.document_intelligence.open_session(file_obj=item['file'])
+            session.result
+        except Exception as e:
+            self._record_error(item['blob_name'], 'analysis', e)
+            raise
+        yield {'blob_name': item['blob_name'], 'file_name': item['file_name'], 'session': session,
+               'signature': item['signature'], 'content_hash': item.get('content_hash')}
+
+    def _structure(self, item):
+        try:
+            matched = item['session'].template_fields(self.templates) if self.templates is not None else None
+            if matched is not None:
+                template, record = matched
+                metrics.increment('template_matches', template=template)
+            elif self.structuring_pool is not None:
+                record = self.structuring_pool.key_values(item['session'].result, self.extractor)
+            else:
+                record = self.extractor.extract(item['session'].tables)
+        except Exception as e:
+            self._record_error(item['blob_name'], 'structure', e)
+            raise
+        yield {'blob_name': item['blob_name'], 'file_name': item['file_name'],
+               'pages': len(item['session'].page_texts), 'data': record,
+               '_signature': item['signature'], '_content_hash': item['content_hash'],
+               '_page_texts': item['session'].page_texts}
+
+    def _record_error(self, blob_name, stage, error):
+        self.manifest.record(blob_name, 'error', stage=stage, error=str(error))
+        if self.work_queue is not None:
+            self.work_queue.fail(blob_name, error, stage=stage)
+
+    def _write_output(self, record):
+        with self._output_lock:
+            with open(self.output_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def _output(self, record):
+        signature = record.pop('_signature')
+        content_hash = record.pop('_content_hash')
+        page_texts = record.pop('_page_texts')
+        try:
+            self._write_output(record)
+            if self.parquet_writer is not None:
+                self.parquet_writer.append({'document': record['blob_name'], **record['data']})
+            if self.text_index is not None:
+                self.text_index.add(record['blob_name'], page_texts)
+        except Exception as e:
+            self._record_error(record['blob_name'], 'output', e)
+            raise
+        self.manifest.record(record['blob_name'], 'done', output=self.output_path, etag=signature['etag'])
+        if self.change_index is not None:
+            self.change_index.record(record['blob_name'], signature, content_hash, output=self.output_path)
+        if self.work_queue is not None:
+            self.work_queue.complete(record['blob_name'], output=self.output_path)
+        return ()
+
+    def run(self, blob_folder_path, end='.pdf'):
+        """
+        Ejecuta el pipeline sobre una carpeta del contenedor.
+
+        :param blob_folder_path: Ruta de la carpeta dentro del contenedor.
+        :param end: Extensión de archivo o cadena final para filtrar los archivos.
+        :return: Lista con el resumen de cada etapa.
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(5)]
+        stages = [
+            Stage('listado', self._list, 1, queues[0], queues[1]),
+            Stage('descarga', self._download, self.download_workers, queues[1], queues[2]),
+            Stage('análisis', self._analyze, self.analysis_workers, queues[2], queues[3]),
+            Stage('estructuración', self._structure, self.structure_workers, queues[3], queues[4]),
+            Stage('salida', self._output, 1, queues[4], None),
+        ]
+
+        start = time.perf_counter()
+        for stage, downstream in zip(stages, stages[1:] + [None]):
+            stage.start(downstream.workers if downstream else 0)
+
+        queues[0].put((blob_folder_path, end))
+        queues[0].put(END)
+        for stage in stages:
+            stage.join()
+        elapsed = time.perf_counter() - start
+        if self.change_index is not None:
+            self.change_index.save()
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+        if self.text_index is not None:
+            self.text_index.flush()
+
+        summaries = [stage.summary() for stage in stages]
+        print(f"Pipeline terminado en {elapsed:.1f} s")
+        print(f"{'etapa':<16}{'hilos':>6}{'procesados':>12}{'emitidos':>10}{'errores':>9}{'docs/s':>10}{'ocupado (s)':>13}")
+        for summary in summaries:
+            print(f"{summary['stage']:<16}{summary['workers']:>6}{summary['processed']:>12}{summary['emitted']:>10}{summary['errors']:>9}"
+                  f"{summary['items_per_second']:>10.2f}{summary['busy_seconds']:>13.1f}")
+        return summaries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Procesa en lote los documentos de una carpeta de Azure Blob Storage.")
+    parser.add_argument('folder', help="Carpeta dentro del contenedor con los documentos a procesar.")
+    parser.add_argument('--end', default='.pdf', help="Extensión o sufijo de los archivos a procesar.")
+    parser.add_argument('--output', default='datos_pozo.jsonl', help="Archivo JSON Lines de salida.")
+    parser.add_argument('--manifest', default=None, help="Archivo del manifiesto (por defecto <output>.manifest.jsonl).")
+    parser.add_argument('--download-workers', type=int, default=4)
+    parser.add_argument('--analysis-workers', type=int, default=8)
+    parser.add_argument('--structure-workers', type=int, default=2)
+    parser.add_argument('--structure-processes', type=int, default=0,
+                        help="Procesos para estructurar las tablas fuera de los hilos de E/S (0 para hacerlo en los hilos).")
+    parser.add_argument('--queue-size', type=int, default=8)
+    parser.add_argument('--cache-dir', default=None, help="Directorio de la caché de análisis (opcional).")
+    parser.add_argument('--page-cache-dir', default=None,
+                        help="Directorio de la caché por página, para no volver a analizar páginas repetidas entre documentos (opcional).")
+    parser.add_argument('--change-index', default=None,
+                        help="Archivo del índice de cambios; activa el modo incremental (solo blobs nuevos o modificados).")
+    parser.add_argument('--on-deleted', choices=['flag', 'remove'], default='flag',
+                        help="Tratamiento de los blobs eliminados del origen en modo incremental.")
+    parser.add_argument('--parquet-dir', default=None, help="Directorio del conjunto de datos Parquet de salida (opcional).")
+    parser.add_argument('--partition-by', default='Campo,Pozo',
+                        help="Columnas de partición del conjunto Parquet separadas por coma (por ejemplo 'document').")
+    parser.add_argument('--rate', type=float, default=15, help="Envíos por segundo permitidos por la cuota de Form Recognizer.")
+    parser.add_argument('--deadline', type=float, default=None, help="Plazo en segundos para analizar cada documento.")
+    parser.add_argument('--text-index', default=None,
+                        help="Directorio del índice de texto donde indexar las páginas de cada documento (opcional).")
+    parser.add_argument('--templates', default=None,
+                        help="Archivo JSON del registro de plantillas de formularios conocidos (opcional).")
+    parser.add_argument('--sdk-results', action='store_true',
+                        help="Conserva los resultados como objetos del SDK en vez de CompactDocument (más memoria por documento).")
+    parser.add_argument('--work-queue', default=None,
+                        help="Carpeta del contenedor para reclamos y marcadores; activa el reparto de la carpeta entre varios "
+                             "nodos que ejecutan este mismo comando (opcional).")
+    parser.add_argument('--worker-id', default=None, help="Identificador de este nodo en la cola de trabajo.")
+    parser.add_argument('--lease-duration', type=int, default=30, help="Duración en segundos de los leases de la cola (15 a 60).")
+    parser.add_argument('--max-claims', type=int, default=16, help="Documentos reclamados a la vez por este nodo.")
+    parser.add_argument('--metrics-out', default=None,
+                        help="Archivo donde guardar las métricas al terminar: formato Prometheus si termina en .prom, JSON en otro caso.")
+    parser.add_argument('--log-level', default='INFO', help="Nivel de los mensajes de registro (DEBUG, INFO, WARNING...).")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    cache = AnalysisCache(args.cache_dir) if args.cache_dir else None
+    page_cache = AnalysisCache(args.page_cache_dir) if args.page_cache_dir else None
+    change_index = ChangeIndex(args.change_index) if args.change_index else None
+    parquet_writer = PartitionedParquetWriter(args.parquet_dir, partition_by=[c for c in args.partition_by.split(',') if c]) \
+        if args.parquet_dir else None
+    scheduler = RequestScheduler(rate=args.rate, deadline=args.deadline)
+    structuring_pool = StructuringPool(args.structure_processes) if args.structure_processes else None
+    document_intelligence = DocumentIntelligence(cache=cache, scheduler=scheduler, page_cache=page_cache,
+                                                 compact=not args.sdk_results, structuring_pool=structuring_pool)
+    blob_functions = BlobFunctions()
+    work_queue = BlobWorkQueue(blob_functions, args.work_queue, worker_id=args.worker_id, lease_duration=args.lease_duration,
+                               max_claims=args.max_claims) if args.work_queue else None
+    pipeline = BatchPipeline(blob_functions, document_intelligence, args.output,
+                             args.manifest or f"{args.output}.manifest.jsonl",
+                             download_workers=args.download_workers, analysis_workers=args.analysis_workers,
+                             structure_workers=args.structure_workers, queue_size=args.queue_size,
+                             change_index=change_index, on_deleted=args.on_deleted, parquet_writer=parquet_writer,
+                             templates=TemplateRegistry(args.templates) if args.templates else None,
+                             text_index=TextIndex(args.text_index) if args.text_index else None,
+                             structuring_pool=structuring_pool, work_queue=work_queue)
+    try:
+        pipeline.run(args.folder, args.end)
+    finally:
+        if structuring_pool is not None:
+            structuring_pool.close()
+        if work_queue is not None:
+            work_queue.close()
+    if args.metrics_out:
+        metrics.save(args.metrics_out)
+
+
+if __name__ == '__main__':
+    main()
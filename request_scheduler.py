@@ -0,0 +1,334 @@
+import time
+import random
+import asyncio
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+
+from metrics import metrics
+from lazy_imports import lazy_import
+
+exceptions = lazy_import('azure.core.exceptions')
+
+logger = logging.getLogger(__name__)
+
+# Códigos HTTP que indican limitación o un error transitorio del servicio
+RETRYABLE_STATUS = (408, 429, 500, 502, 503, 504)
+
+
+class DeadlineExceeded(TimeoutError):
+    """ El documento no terminó de analizarse dentro de su plazo. """
+
+
+class CircuitOpenError(RuntimeError):
+    """ El circuito está abierto: el servicio falló repetidamente y las solicitudes se rechazan sin enviarse. """
+
+
+class TokenBucket():
+    """
+    Cubeta de fichas por reserva: cada solicitud reserva una ficha y espera exactamente el tiempo necesario para no
+    superar rate solicitudes por segundo (con ráfagas de hasta capacity). Como las reservas pueden dejar el saldo en
+    negativo, varias solicitudes concurrentes quedan espaciadas 1/rate segundos entre sí en lugar de competir.
+    """
+    def __init__(self, rate, capacity=None):
+        """
+        :param rate: Solicitudes por segundo permitidas.
+        :param capacity: Tamaño máximo de ráfaga; por defecto 1, es decir, envíos espaciados 1/rate segundos.
+        """
+        if rate <= 0:
+            raise ValueError(f"rate must be positive: {rate!r}")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait=None):
+        """
+        Reserva una ficha.
+
+        :param max_wait: Espera máxima aceptada en segundos; si la espera necesaria es mayor, no se reserva nada.
+        :return: Segundos a esperar antes de enviar la solicitud, o None si superaría max_wait.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(0.0, (1 - self._tokens) / self.rate, self._paused_until - now)
+            if max_wait is not None and wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+    def pause(self, seconds):
+        """
+        Detiene todas las reservas durante un tiempo, por ejemplo al recibir un 429 con Retry-After.
+
+        :param seconds: Segundos de pausa.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + seconds)
+            # La pausa no acumula fichas: al reanudar se respeta la tasa en vez de enviar una ráfaga
+            self._tokens = min(self._tokens, 0.0)
+            self._updated = max(self._updated, self._paused_until)
+
+
+class CircuitBreaker():
+    """
+    Interruptor de circuito: después de failure_threshold fallas consecutivas del servicio (5xx o de conexión; un 429 indica
+    que el servicio está sano pero ocupado y no cuenta como falla) se abre y rechaza las solicitudes
+    durante reset_timeout segundos; luego deja pasar una solicitud de prueba (semiabierto) y se cierra si esta tiene éxito.
+    """
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        """
+        :param failure_threshold: Fallas consecutivas que abren el circuito.
+        :param reset_timeout: Segundos que el circuito permanece abierto antes de la solicitud de prueba.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Verifica si se puede enviar una solicitud.
+
+        :raises CircuitOpenError: Si el circuito está abierto.
+        """
+        with self._lock:
+            if self.state == 'open':
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError(f"Circuito abierto tras {self._failures} fallas consecutivas")
+                self.state = 'half_open'
+                self._trial_in_flight = False
+            if self.state == 'half_open':
+                if self._trial_in_flight:
+                    raise CircuitOpenError("Circuito semiabierto: hay una solicitud de prueba en curso")
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == 'half_open' or self._failures >= self.failure_threshold:
+                if self.state != 'open':
+                    logger.warning("Circuito abierto por %.1f s tras %d fallas consecutivas", self.reset_timeout, self._failures)
+                    metrics.increment('circuit_opened')
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def release(self):
+        """ Libera la solicitud de prueba cuando terminó sin indicar nada sobre la salud del servicio. """
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class RequestScheduler():
+    """
+    La clase RequestScheduler controla el envío de documentos a Form Recognizer para mantenerse justo en la cuota del nivel
+    contratado (transacciones por segundo), sin excederla ni quedarse por debajo:
+
+        - Una cubeta de fichas limita los envíos a rate por segundo, compartida por todos los hilos y tareas.
+        - Los 429 y errores 5xx se reintentan con espera exponencial con jitter, respetando Retry-After cuando el servicio lo envía;
+          un 429 pausa la cubeta completa, no solo la solicitud que lo recibió.
+        - El intervalo de consulta del resultado se adapta al número de páginas del documento, para no consumir cuota
+          consultando documentos largos ni esperar de más por los cortos.
+        - Cada documento tiene un plazo opcional que abarca las esperas, los reintentos y la consulta del resultado.
+        - Un interruptor de circuito deja de enviar solicitudes mientras el servicio falla de forma repetida.
+
+    run / run_async:
+        Ejecutan un envío (síncrono o asíncrono) con todas las políticas anteriores y retornan el resultado del análisis.
+    """
+    def __init__(self, rate=15, burst=None, max_retries=5, backoff_base=1.0, backoff_max=60.0, deadline=None,
+                 min_poll_interval=1.0, max_poll_interval=15.0, poll_seconds_per_page=0.25,
+                 failure_threshold=5, reset_timeout=30.0):
+        """
+        :param rate: Envíos por segundo permitidos (15 en el nivel S0 de Form Recognizer).
+        :param burst: Ráfaga máxima de envíos; por defecto 1. Una ráfaga mayor puede superar la cuota en una ventana
+                      deslizante de un segundo, como la que aplica el servicio.
+        :param max_retries: Reintentos por documento ante 429 o errores transitorios.
+        :param backoff_base: Espera base en segundos de la espera exponencial.
+        :param backoff_max: Espera máxima en segundos entre reintentos.
+        :param deadline: Plazo por defecto en segundos para cada documento (None sin plazo).
+        :param min_poll_interval: Intervalo mínimo de consulta del resultado, en segundos.
+        :param max_poll_interval: Intervalo máximo de consulta del resultado, en segundos.
+        :param poll_seconds_per_page: Segundos de intervalo de consulta por página del documento.
+        :param failure_threshold: Fallas consecutivas que abren el circuito.
+        :param reset_timeout: Segundos que el circuito permanece abierto.
+        """
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.deadline = deadline
+        self.min_poll_interval = min_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.poll_seconds_per_page = poll_seconds_per_page
+
+    def poll_interval(self, page_count=None):
+        """
+        :param page_count: Número de páginas del documento (None si se desconoce).
+        :return: Intervalo de consulta del resultado, en segundos.
+        """
+        if not page_count:
+            return self.min_poll_interval
+        return min(self.max_poll_interval, max(self.min_poll_interval, page_count * self.poll_seconds_per_page))
+
+    @staticmethod
+    def is_retryable(error):
+        """
+        :param error: Excepción recibida.
+        :return: True si es una limitación o un error transitorio que vale la pena reintentar.
+        """
+        if isinstance(error, exceptions.HttpResponseError):
+            return error.status_code in RETRYABLE_STATUS
+        return isinstance(error, (exceptions.ServiceRequestError, exceptions.ServiceResponseError, ConnectionError))
+
+    @staticmethod
+    def retry_after(error):
+        """
+        Lee la espera indicada por el servicio en los encabezados retry-after-ms, x-ms-retry-after-ms o Retry-After.
+
+        :param error: Excepción recibida.
+        :return: Segundos a esperar, o None si el servicio no indicó nada.
+        """
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None) or {}
+        for header in ('retry-after-ms', 'x-ms-retry-after-ms'):
+            value = headers.get(header)
+            if value:
+                try:
+                    return float(value) / 1000
+                except ValueError:
+                    pass
+        value = headers.get('Retry-After') or headers.get('retry-after')
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                return None
+
+    def _backoff(self, attempt, error):
+        retry_after = self.retry_after(error)
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        if getattr(error, 'status_code', None) == 429:
+            metrics.increment('analyze_throttled')
+            self.bucket.pause(retry_after if retry_after is not None else delay)
+        return delay
+
+    @staticmethod
+    def _remaining(expires):
+        return None if expires is None else expires - time.monotonic()
+
+    def _expires(self, deadline):
+        deadline = self.deadline if deadline is None else deadline
+        return None if deadline is None else time.monotonic() + deadline
+
+    def _reserve(self, expires):
+        wait = self.bucket.reserve(max_wait=self._remaining(expires))
+        if wait is None:
+            raise DeadlineExceeded("El plazo del documento vence antes de obtener turno de envío")
+        return wait
+
+    def _after_error(self, error, attempt, expires):
+        """ Registra un error y retorna la espera antes del siguiente intento, o relanza el error si no se reintenta. """
+        if not self.is_retryable(error):
+            self.breaker.release()
+            raise error
+        if getattr(error, 'status_code', None) == 429:
+            self.breaker.release()
+        else:
+            self.breaker.record_failure()
+        if attempt >= self.max_retries:
+            raise error
+        delay = self._backoff(attempt, error)
+        remaining = self._remaining(expires)
+        if remaining is not None and delay >= remaining:
+            raise DeadlineExceeded(f"El plazo del documento vence antes del reintento: {error}") from error
+        metrics.increment('analyze_retries')
+        logger.info("Reintento %d en %.1f s: %s", attempt + 1, delay, error)
+        return delay
+
+    def run(self, submit, page_count=None, deadline=None):
+        """
+        Ejecuta un envío síncrono con las políticas del planificador.
+
+        :param submit: Función que recibe el intervalo de consulta y retorna un poller (por ejemplo, una llamada a
+                       begin_analyze_document con polling_interval).
+        :param page_count: Número de páginas del documento, usado para el intervalo de consulta.
+        :param deadline: Plazo en segundos para este documento; por defecto el del planificador.
+        :return: Resultado del poller.
+        :raises DeadlineExceeded: Si el documento no termina dentro del plazo.
+        :raises CircuitOpenError: Si el circuito está abierto.
+        """
+        expires = self._expires(deadline)
+        interval = self.poll_interval(page_count)
+        attempt = 0
+        while True:
+            self.breaker.allow()
+            try:
+                time.sleep(self._reserve(expires))
+                with metrics.timer('analyze_submit'):
+                    poller = submit(interval)
+                with metrics.timer('analyze_poll'):
+                    result = poller.result(timeout=self._remaining(expires))
+                    if expires is not None and not poller.done():
+                        raise DeadlineExceeded("El documento no terminó de analizarse dentro del plazo")
+                self.breaker.record_success()
+                return result
+            except DeadlineExceeded:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                time.sleep(self._after_error(e, attempt, expires))
+                attempt += 1
+
+    async def run_async(self, submit, page_count=None, deadline=None):
+        """
+        Versión asíncrona de run.
+
+        :param submit: Corrutina que recibe el intervalo de consulta y retorna un poller asíncrono.
+        :param page_count: Número de páginas del documento.
+        :param deadline: Plazo en segundos para este documento; por defecto el del planificador.
+        :return: Resultado del poller.
+        """
+        expires = self._expires(deadline)
+        interval = self.poll_interval(page_count)
+        attempt = 0
+        while True:
+            self.breaker.allow()
+            try:
+                await asyncio.sleep(self._reserve(expires))
+                with metrics.timer('analyze_submit'):
+                    poller = await submit(interval)
+                with metrics.timer('analyze_poll'):
+                    try:
+                        result = await asyncio.wait_for(poller.result(), self._remaining(expires))
+                    except asyncio.TimeoutError:
+                        raise DeadlineExceeded("El documento no terminó de analizarse dentro del plazo")
+                self.breaker.record_success()
+                return result
+            except DeadlineExceeded:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                await asyncio.sleep(self._after_error(e, attempt, expires))
+                attempt += 1
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from document_model import CompactDocument
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Instancia de DocumentIntelligence de cada proceso trabajador, creada en _init_worker
+_structurer = None
+
+
+def _init_worker():
+    global _structurer
+    from document_intelligence_functions import DocumentIntelligence
+    # Los métodos de estructuración no usan el cliente ni las credenciales, así que no se ejecuta __init__
+    _structurer = DocumentIntelligence.__new__(DocumentIntelligence)
+
+
+def _structure(method, tables, args):
+    return getattr(_structurer, method)(tables, *args)
+
+
+def _extract_key_values(tables, extractor):
+    return extractor.extract(_structurer._extract_tables(tables) if tables.tables else None)
+
+
+class StructuringPool():
+    """
+    La clase StructuringPool ejecuta en un grupo de procesos la estructuración de tablas (DataFrames, completado de celdas
+    vacías, identificación de encabezados y conversión a diccionarios), que retiene el GIL y serializa a los hilos que
+    descargan y consultan el servicio. A cada proceso se envían solo las tablas del documento como un CompactDocument,
+    que se serializa en binario, en lugar de los objetos del SDK; la entrada y salida siguen en los hilos o en asyncio.
+
+    run / run_async:
+        Ejecutan en un proceso un método de estructuración de DocumentIntelligence (_auto_structure_tables,
+        _structure_matched_tables, _extract_tables) sobre las tablas de un resultado.
+
+    key_values:
+        Construye las tablas de un resultado y extrae sus pares clave-valor con un KeyValueExtractor.
+    """
+    def __init__(self, max_workers=None, start_method='spawn'):
+        """
+        :param max_workers: Número de procesos; por defecto, el número de núcleos.
+        :param start_method: Método de inicio de los procesos; 'spawn' evita copiar los hilos y conexiones del proceso principal.
+        """
+        self.max_workers = max_workers or multiprocessing.cpu_count()
+        self.executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                            mp_context=multiprocessing.get_context(start_method))
+        logger.info("Grupo de estructuración iniciado con %d procesos", self.max_workers)
+
+    @staticmethod
+    def _payload(result):
+        with metrics.timer('structuring_payload'):
+            return CompactDocument.from_result(result, pages=False)
+
+    def submit(self, method, result, *args):
+        """
+        :param method: Nombre del método de estructuración de DocumentIntelligence.
+        :param result: Resultado del análisis del documento.
+        :param args: Argumentos adicionales del método.
+        :return: Future con el valor retornado por el método.
+        """
+        metrics.increment('structuring_tasks')
+        return self.executor.submit(_structure, method, self._payload(result), args)
+
+    def run(self, method, result, *args):
+        """ Igual que submit, pero espera y retorna el resultado. """
+        with metrics.timer('structuring_wait'):
+            return self.submit(method, result, *args).result()
+
+    async def run_async(self, method, result, *args):
+        """ Versión de run que espera sin bloquear el bucle de eventos. """
+        return await asyncio.wrap_future(self.submit(method, result, *args))
+
+    def key_values(self, result, extractor):
+        """
+        :param result: Resultado del análisis del documento.
+        :param extractor: KeyValueExtractor.
+        :return: Diccionario clave -> valor, como extractor.extract(DocumentIntelligence._extract_tables(result)).
+        """
+        metrics.increment('structuring_tasks')
+        with metrics.timer('structuring_wait'):
+            return self.executor.submit(_extract_key_values, self._payload(result), extractor).result()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,141 @@
+from itertools import chain
+
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+
+def _cell_positions(cells):
+    """ Retorna un arreglo (n, 4) con fila, columna, filas abarcadas y columnas abarcadas de cada celda, en una sola pasada. """
+    # Las celdas de document_model.CompactDocument ya están guardadas en un arreglo
+    if hasattr(cells, 'positions'):
+        return cells.positions
+    positions = np.array([(cell.row_index, cell.column_index, cell.row_span or 1, cell.column_span or 1) for cell in cells],
+                         dtype=np.intp)
+    return positions.reshape(-1, 4)
+
+
+def table_shape(table, positions=None):
+    """
+    Calcula las dimensiones de una tabla, considerando también las celdas combinadas que sobrepasan row_count/column_count.
+
+    :param table: Objeto de tabla del resultado del análisis de documentos.
+    :param positions: Posiciones de las celdas ya calculadas (opcional).
+    :return: Tupla (filas, columnas).
+    """
+    if positions is None:
+        positions = _cell_positions(table.cells)
+    rows = table.row_count or 0
+    cols = table.column_count or 0
+    if len(positions):
+        rows = max(rows, int((positions[:, 0] + positions[:, 2]).max()))
+        cols = max(cols, int((positions[:, 1] + positions[:, 3]).max()))
+    return rows, cols
+
+
+def _plain_rows(table, empty):
+    """
+    Ubica las celdas de una tabla sin celdas combinadas recorriéndolas una sola vez, sin convertir sus posiciones a arreglos.
+    En el modelo del servicio cada posición de la cuadrícula está cubierta por exactamente una celda, así que una tabla con
+    row_count * column_count celdas no tiene celdas combinadas.
+
+    :return: Lista de filas (listas de contenidos), o None si la tabla no cumple esa condición.
+    """
+    cells = table.cells
+    rows = table.row_count or 0
+    cols = table.column_count or 0
+    if not rows or not cols or hasattr(cells, 'positions') or len(cells) != rows * cols:
+        return None
+    grid = [[empty] * cols for _ in range(rows)]
+    try:
+        for cell in cells:
+            grid[cell.row_index][cell.column_index] = cell.content
+    except IndexError:
+        return None
+    return grid
+
+
+def table_to_array(table, fill_merged=False, empty=""):
+    """
+    Ubica todas las celdas de una tabla en un arreglo de objetos preasignado, respetando column_index, row_span y column_span.
+
+    :param table: Objeto de tabla del resultado del análisis de documentos.
+    :param fill_merged: Si es True, el contenido de una celda combinada se copia en todas las posiciones que abarca;
+                        si es False, solo queda en su posición de origen.
+    :param empty: Valor para las posiciones sin celda.
+    :return: Arreglo numpy de objetos con forma (filas, columnas).
+    """
+    plain = _plain_rows(table, empty)
+    if plain is not None:
+        # Convertir la lista aplanada es más rápido que dejar que numpy recorra la lista de filas
+        grid = np.empty(table.row_count * table.column_count, dtype=object)
+        grid[:] = list(chain.from_iterable(plain))
+        return grid.reshape(table.row_count, table.column_count)
+
+    cells = table.cells
+    positions = _cell_positions(cells)
+    rows, cols = table_shape(table, positions)
+    grid = np.full((rows, cols), empty, dtype=object)
+
+    if not len(cells):
+        return grid
+
+    contents = np.empty(len(cells), dtype=object)
+    contents[:] = cells.contents if hasattr(cells, 'contents') else [cell.content for cell in cells]
+
+    # Una sola asignación vectorizada para todas las celdas
+    grid[positions[:, 0], positions[:, 1]] = contents
+
+    if fill_merged:
+        merged = np.flatnonzero((positions[:, 2] > 1) | (positions[:, 3] > 1))
+        for i in merged:
+            row, col, row_span, column_span = positions[i]
+            grid[row:row + row_span, col:col + column_span] = contents[i]
+
+    return grid
+
+
+def detect_header_row(table, grid=None):
+    """
+    Identifica la fila de encabezado de una tabla. Se usan las celdas marcadas como 'columnHeader' por el servicio
+    (la última fila de encabezado si hay varias); si no hay marcas, la primera fila se considera encabezado cuando
+    todas sus celdas son textos de más de un caracter.
+
+    :param table: Objeto de tabla del resultado del análisis de documentos.
+    :param grid: Arreglo de la tabla ya construido con table_to_array (opcional).
+    :return: Índice de la fila de encabezado, o None si no se identifica ninguna.
+    """
+    header_rows = {cell.row_index for cell in table.cells if getattr(cell, 'kind', None) == 'columnHeader'}
+    if header_rows:
+        last = 0
+        while last + 1 in header_rows:
+            last += 1
+        return last if 0 in header_rows else None
+
+    if grid is None:
+        grid = table_to_array(table)
+    if len(grid) and all(isinstance(item, str) and len(item) > 1 for item in grid[0]):
+        return 0
+    return None
+
+
+def table_to_frame(table, header=None, fill_merged=False, empty=""):
+    """
+    Construye el DataFrame de una tabla en una sola operación a partir de table_to_array.
+
+    :param table: Objeto de tabla del resultado del análisis de documentos.
+    :param header: None para no usar encabezado, un índice de fila, o 'auto' para usar detect_header_row.
+    :param fill_merged: Si es True, el contenido de las celdas combinadas se repite en todas las posiciones que abarcan.
+    :param empty: Valor para las posiciones sin celda.
+    :return: DataFrame de pandas; si hay encabezado, sus filas conservan el índice que tenían en la tabla.
+    """
+    grid = table_to_array(table, fill_merged=fill_merged, empty=empty)
+
+    if header == 'auto':
+        header = detect_header_row(table, grid)
+    # Con dtype=object pandas usa el arreglo tal cual, sin recorrer cada columna para inferir fechas u otros tipos
+    if header is None:
+        return pd.DataFrame(grid, dtype=object, copy=False)
+
+    return pd.DataFrame(grid[header + 1:], columns=grid[header], index=range(header + 1, len(grid)), dtype=object, copy=False)
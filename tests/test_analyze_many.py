@@ -0,0 +1,109 @@
+"""
+Pruebas de analyze_many / analyze_many_async sobre AsyncFakeDocumentAnalysisClient de benchmarks/fake_client.py:
+resultados en orden de finalización, límite de documentos en vuelo, lectura perezosa de los archivos y errores aislados.
+
+Uso: python -m pytest tests
+"""
+import os
+import sys
+import asyncio
+import unittest
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT_DIR, 'benchmarks'))
+sys.path.insert(0, ROOT_DIR)
+
+# El cliente real no se usa, pero su constructor exige un endpoint y una clave
+os.environ.setdefault('AZURE_FORM_RECOGNIZER_ENDPOINT', 'https://pruebas.invalid/')
+os.environ.setdefault('AZURE_FORM_RECOGNIZER_API_KEY', 'pruebas')
+
+from fake_client import AsyncFakeDocumentAnalysisClient, synthetic_result
+from document_intelligence_functions import DocumentIntelligence
+from request_scheduler import RequestScheduler
+
+
+class CountingClient(AsyncFakeDocumentAnalysisClient):
+    """ Cliente falso que registra el máximo de análisis en curso al mismo tiempo y falla con los documentos indicados. """
+    def __init__(self, payloads, latency_per_page, failing=()):
+        super().__init__(payloads, latency_per_page=latency_per_page)
+        self.failing = set(failing)
+        self.in_flight = 0
+        self.peak = 0
+
+    async def begin_analyze_document(self, model_id, document=None, **kwargs):
+        if document in self.failing:
+            raise ValueError("documento dañado")
+        poller = self._next()
+        result = poller.result
+
+        async def tracked():
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            try:
+                return await result()
+            finally:
+                self.in_flight -= 1
+
+        poller.result = tracked
+        return poller
+
+
+class AnalyzeManyTest(unittest.TestCase):
+
+    def setUp(self):
+        # Sin cuota, para que el orden dependa solo de la latencia del cliente falso
+        scheduler = RequestScheduler(rate=1e6, burst=10**6, min_poll_interval=0)
+        self.document_intelligence = DocumentIntelligence(dotenv_path=os.devnull, scheduler=scheduler)
+        # Resultados de 6 y 1 páginas alternados: los documentos impares terminan antes que los pares
+        self.payloads = [synthetic_result(pages=6, tables=0), synthetic_result(pages=1, tables=0)]
+
+    def files(self, n, consumed=None):
+        for i in range(n):
+            if consumed is not None:
+                consumed.append(i)
+            yield {'file_name': f'doc_{i}.pdf', 'file': f'%PDF-{i}'.encode()}
+
+    def test_results_in_completion_order(self):
+        client = CountingClient(self.payloads, latency_per_page=0.03)
+
+        results = list(self.document_intelligence.analyze_many(self.files(4), max_concurrency=4, async_client=client))
+
+        names = [result['file_name'] for result in results]
+        self.assertCountEqual(names[:2], ['doc_1.pdf', 'doc_3.pdf'])
+        self.assertCountEqual(names[2:], ['doc_0.pdf', 'doc_2.pdf'])
+        pages = {result['file_name']: len(result['session'].result.pages) for result in results}
+        self.assertEqual(pages, {'doc_0.pdf': 6, 'doc_1.pdf': 1, 'doc_2.pdf': 6, 'doc_3.pdf': 1})
+
+    def test_concurrency_is_bounded_and_files_are_read_lazily(self):
+        client = CountingClient(self.payloads, latency_per_page=0.01)
+        consumed = []
+
+        async def run():
+            received = []
+            async for result in self.document_intelligence.analyze_many_async(self.files(12, consumed), max_concurrency=3,
+                                                                              async_client=client):
+                # Al recibir el primer resultado solo se han tomado los archivos de los documentos en vuelo
+                received.append((result['file_name'], len(consumed)))
+            return received
+
+        received = asyncio.run(run())
+
+        self.assertEqual(len(received), 12)
+        self.assertEqual(received[0][1], 3)
+        self.assertEqual(client.peak, 3)
+        self.assertEqual(client.calls, 12)
+
+    def test_errors_are_isolated(self):
+        client = CountingClient(self.payloads, latency_per_page=0.01, failing=[b'%PDF-2'])
+
+        results = {result['file_name']: result
+                   for result in self.document_intelligence.analyze_many(self.files(4), max_concurrency=2, async_client=client)}
+
+        self.assertEqual(len(results), 4)
+        self.assertIsInstance(results['doc_2.pdf']['error'], ValueError)
+        self.assertIsNone(results['doc_2.pdf']['session'])
+        self.assertTrue(all(results[name]['error'] is None for name in ('doc_0.pdf', 'doc_1.pdf', 'doc_3.pdf')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+"""
+Pruebas de las subidas de BlobFunctions sobre el Blob Storage falso en memoria de benchmarks/fake_storage.py: JSON Lines
+comprimido subido por bloques y reporte de errores de upload_many.
+
+Uso: python -m pytest tests
+"""
+import os
+import sys
+import gzip
+import json
+import time
+import hashlib
+import tempfile
+import threading
+import unittest
+import importlib.util
+from unittest import mock
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT_DIR, 'benchmarks'))
+sys.path.insert(0, ROOT_DIR)
+
+os.environ.setdefault('AZURE_BLOB_STORAGE_CONTAINER_NAME', 'pruebas')
+
+from fake_storage import FakeBlobServiceClient
+from blob_functions import BlobFunctions
+from change_index import ChangeIndex
+
+
+class BlobFunctionsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.blob_functions = BlobFunctions(blob_service_client=FakeBlobServiceClient())
+        self.container = self.blob_functions.container_client
+
+    def download(self, blob_name):
+        return self.blob_functions.blob_service_client.get_blob_client('pruebas', blob_name).download_blob().readall()
+
+    def test_jsonl_gzip_round_trip(self):
+        records = [{'pozo': f'POZO-{i}', 'profundidad': i * 1.5, 'nota': 'compañía ñ',
+                    'huella': hashlib.sha1(str(i).encode()).hexdigest()} for i in range(2000)]
+        # Con bloques pequeños el archivo se sube en varios stage_block y se confirma en orden
+        with mock.patch.object(type(self.container), '_stage', autospec=True, side_effect=type(self.container)._stage) as stage:
+            summary = self.blob_functions.save_jsonl_to_blob('salidas', 'registros.jsonl', iter(records), block_size=1024)
+
+        self.assertGreater(stage.call_count, 1)
+        self.assertEqual(summary['blob'], 'salidas/registros.jsonl.gz')
+        self.assertEqual(summary['records'], 2000)
+        data = self.download(summary['blob'])
+        self.assertEqual(len(data), summary['bytes'])
+        lines = gzip.decompress(data).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line) for line in lines], records)
+
+        properties = self.container.get_blob_client(summary['blob']).get_blob_properties()
+        self.assertEqual(properties.content_settings.content_encoding, 'gzip')
+        self.assertEqual(properties.content_settings.content_type, 'application/x-ndjson')
+        self.assertEqual(self.container.staged, {})
+
+    def test_jsonl_without_records_is_valid_gzip(self):
+        summary = self.blob_functions.save_jsonl_to_blob('salidas', 'vacio.jsonl', [])
+
+        self.assertEqual(summary['records'], 0)
+        self.assertEqual(gzip.decompress(self.download(summary['blob'])), b'')
+
+    @unittest.skipUnless(importlib.util.find_spec('zstandard'), "requiere el paquete 'zstandard'")
+    def test_jsonl_zstd_round_trip(self):
+        import zstandard
+        records = [{'pozo': f'POZO-{i}'} for i in range(100)]
+        summary = self.blob_functions.save_jsonl_to_blob('salidas', 'registros.jsonl', records, compression='zstd')
+
+        self.assertEqual(summary['blob'], 'salidas/registros.jsonl.zst')
+        with zstandard.ZstdDecompressor().stream_reader(self.download(summary['blob'])) as reader:
+            lines = reader.read().decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line) for line in lines], records)
+
+    def test_upload_many_reports_errors(self):
+        self.container.upload_blob('docs/existente.json', b'{}')
+        items = [
+            {'file_name': 'a.json', 'content': {'pozo': 'A'}},
+            {'file_name': 'existente.json', 'content': {'pozo': 'B'}},
+            {'file_name': 'b.txt', 'content': 'texto'},
+            {'file_name': 'c.json', 'content': {'no serializable': object()}},
+        ]
+
+        results = self.blob_functions.upload_many(items, 'docs', max_workers=2, overwrite=False)
+
+        by_name = {result['file_name']: result for result in results}
+        self.assertEqual(len(results), 4)
+        self.assertEqual(by_name['a.json']['blob'], 'docs/a.json')
+        self.assertIsNone(by_name['a.json']['error'])
+        self.assertEqual(json.loads(self.download('docs/a.json')), {'pozo': 'A'})
+        self.assertEqual(self.download('docs/b.txt'), b'texto')
+        self.assertIsNone(by_name['existente.json']['blob'])
+        self.assertEqual(getattr(by_name['existente.json']['error'], 'error_code', None), 'BlobAlreadyExists')
+        self.assertEqual(self.download('docs/existente.json'), b'{}')
+        self.assertIsInstance(by_name['c.json']['error'], TypeError)
+
+    def test_upload_many_bounds_items_in_flight(self):
+        consumed = []
+        gate = threading.Event()
+        upload_blob = self.container.upload_blob
+
+        def items():
+            for i in range(50):
+                consumed.append(i)
+                yield {'file_name': f'doc_{i}.txt', 'content': f'contenido {i}'}
+
+        def blocked_upload(*args, **kwargs):
+            gate.wait(5)
+            return upload_blob(*args, **kwargs)
+
+        results = []
+        with mock.patch.object(self.container, 'upload_blob', side_effect=blocked_upload):
+            thread = threading.Thread(target=lambda: results.extend(self.blob_functions.upload_many(items(), 'docs', max_workers=2)))
+            thread.start()
+            time.sleep(0.2)
+            # Con las subidas detenidas solo se leen 2 * max_workers elementos, más el que espera lugar
+            self.assertEqual(len(consumed), 5)
+            gate.set()
+            thread.join()
+
+        self.assertEqual(len(results), 50)
+        self.assertTrue(all(result['error'] is None for result in results))
+
+
+    def test_incremental_extract_flags_deleted_sources(self):
+        self.blob_functions.upload_many([{'file_name': name, 'content': b'%PDF-prueba'} for name in ('a.pdf', 'b.pdf')], 'docs')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'indice.json')
+            change_index = ChangeIndex(path)
+            for file in self.blob_functions.extract_file_from_blob('docs', '.pdf', change_index=change_index):
+                change_index.record(file['blob_name'], file['signature'], output=f"salidas/{file['file_name']}.json")
+            change_index.save()
+
+            del self.container.blobs['docs/b.pdf']
+            self.container.names.remove('docs/b.pdf')
+            files = self.blob_functions.extract_file_from_blob('docs', '.pdf', change_index=ChangeIndex(path))
+
+            self.assertEqual(files, [])
+            entries = ChangeIndex(path).entries
+            self.assertTrue(entries['docs/b.pdf']['deleted'])
+            self.assertEqual(entries['docs/b.pdf']['output'], 'salidas/b.pdf.json')
+            self.assertFalse(entries['docs/a.pdf']['deleted'])
+
+            del self.container.blobs['docs/a.pdf']
+            self.container.names.remove('docs/a.pdf')
+            list(self.blob_functions.iter_files_from_blob('docs', '.pdf', change_index=ChangeIndex(path), on_deleted='remove'))
+            self.assertEqual(list(ChangeIndex(path).entries), ['docs/b.pdf'])
+
+
+if __name__ == '__main__':
+    unittest.main()
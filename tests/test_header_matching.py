@@ -0,0 +1,54 @@
+"""
+Pruebas de HeaderMatcher: equivalencia con difflib.get_close_matches sobre los textos normalizados, memoria compartida
+por encabezados que solo difieren en mayúsculas o espacios y validación del umbral.
+
+Uso: python -m pytest tests
+"""
+import os
+import sys
+import unittest
+from difflib import get_close_matches
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT_DIR)
+
+from header_matching import HeaderMatcher, normalize_header
+
+FIELDS = ['pozo', 'profundidad total', 'campo', 'fecha de perforación']
+
+
+class HeaderMatcherTest(unittest.TestCase):
+
+    def test_matches_get_close_matches_on_normalized_text(self):
+        headers = ['Pozo', 'Profundidad  Total', 'Camp0', '', 'Fecha perforación', 'Observaciones']
+        normalized = [normalize_header(header) for header in headers]
+
+        matches = HeaderMatcher(FIELDS, cutoff=0.6).match(headers)
+
+        for field in FIELDS:
+            expected = get_close_matches(field, normalized, n=1, cutoff=0.6)
+            if not expected:
+                self.assertNotIn(field, matches)
+                continue
+            column = normalized.index(expected[0])
+            self.assertEqual(matches[field], {'similar': headers[column], 'ind_col': column})
+
+    def test_memo_is_keyed_on_normalized_headers(self):
+        matcher = HeaderMatcher(FIELDS)
+
+        first = matcher.match(['POZO', 'Campo'])
+        second = matcher.match(['  pozo ', 'campo'])
+
+        self.assertEqual(len(matcher._memo), 1)
+        self.assertEqual(first['pozo'], {'similar': 'POZO', 'ind_col': 0})
+        # El encabezado retornado es el de la tabla consultada, no el de la tabla que llenó la memoria
+        self.assertEqual(second['pozo'], {'similar': '  pozo ', 'ind_col': 0})
+        self.assertEqual(second['campo'], {'similar': 'campo', 'ind_col': 1})
+
+    def test_invalid_cutoff(self):
+        with self.assertRaisesRegex(ValueError, 'umbral'):
+            HeaderMatcher(FIELDS, cutoff=1.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+"""
+Pruebas de Metrics.to_prometheus: escape de los valores de etiqueta según el formato de exposición de texto.
+
+Uso: python -m pytest tests
+"""
+import os
+import sys
+import unittest
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT_DIR)
+
+from metrics import Metrics
+
+
+class PrometheusTest(unittest.TestCase):
+
+    def test_label_values_are_escaped(self):
+        metrics = Metrics()
+        metrics.increment('documentos', file='C:\\datos\\"informe"\nfinal.pdf')
+
+        lines = metrics.to_prometheus().splitlines()
+
+        self.assertIn('ocr_documentos{file="C:\\\\datos\\\\\\"informe\\"\\nfinal.pdf"} 1', lines)
+
+    def test_histogram_labels(self):
+        metrics = Metrics()
+        metrics.observe('latencia', 0.2, buckets=(0.1, 1), model='prebuilt-layout')
+
+        text = metrics.to_prometheus()
+
+        self.assertIn('ocr_latencia_bucket{model="prebuilt-layout",le="1"} 1', text)
+        self.assertIn('ocr_latencia_bucket{model="prebuilt-layout",le="+Inf"} 1', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
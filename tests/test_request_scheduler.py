@@ -0,0 +1,213 @@
+"""
+Pruebas de RequestScheduler con pollers falsos de benchmarks/fake_client.py: espaciado de la cubeta de fichas, respeto
+de Retry-After, apertura y semiapertura del interruptor de circuito y plazos por documento.
+
+Uso: python -m pytest tests
+"""
+import os
+import sys
+import time
+import asyncio
+import unittest
+from email.utils import formatdate
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT_DIR, 'benchmarks'))
+sys.path.insert(0, ROOT_DIR)
+
+from azure.core.exceptions import HttpResponseError
+
+from fake_client import FakePoller, AsyncFakePoller, FakeResponse, synthetic_result
+from request_scheduler import RequestScheduler, TokenBucket, CircuitBreaker, CircuitOpenError, DeadlineExceeded
+
+PAYLOAD = synthetic_result(pages=1, tables=0)
+
+
+def http_error(status_code, headers=None):
+    return HttpResponseError(message=f"Error {status_code}", response=FakeResponse(status_code, 'Error', headers))
+
+
+class ScriptedSubmit():
+    """ Envío falso que responde, en orden, los errores indicados y luego un poller con el resultado. """
+    def __init__(self, errors=(), latency=0.0):
+        self.errors = list(errors)
+        self.latency = latency
+        self.calls = []
+
+    def __call__(self, interval):
+        self.calls.append(time.monotonic())
+        if self.errors:
+            raise self.errors.pop(0)
+        return FakePoller(PAYLOAD, self.latency)
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    def test_concurrent_reservations_are_spaced_by_rate(self):
+        bucket = TokenBucket(rate=20)
+        waits = [bucket.reserve() for _ in range(5)]
+
+        for i, wait in enumerate(waits):
+            self.assertAlmostEqual(wait, i / 20, delta=0.01)
+
+    def test_reserve_beyond_max_wait_takes_nothing(self):
+        bucket = TokenBucket(rate=1)
+        bucket.reserve()
+
+        self.assertIsNone(bucket.reserve(max_wait=0.1))
+        self.assertAlmostEqual(bucket.reserve(), 1.0, delta=0.05)
+
+    def test_pause_delays_next_reservation(self):
+        bucket = TokenBucket(rate=100, capacity=10)
+        bucket.pause(0.5)
+
+        self.assertAlmostEqual(bucket.reserve(), 0.5, delta=0.05)
+
+    def test_scheduler_paces_submissions(self):
+        scheduler = RequestScheduler(rate=20, min_poll_interval=0)
+        reserve = scheduler.bucket.reserve
+        scheduled = []
+
+        def recording_reserve(max_wait=None):
+            wait = reserve(max_wait)
+            scheduled.append(time.monotonic() + wait)
+            return wait
+
+        scheduler.bucket.reserve = recording_reserve
+        submit = ScriptedSubmit()
+        for _ in range(5):
+            scheduler.run(submit)
+
+        # Cada envío queda programado 1/rate después del anterior; se mide la programación y no la hora de submit, que
+        # puede retrasarse si otro hilo retiene el intérprete
+        self.assertEqual(len(submit.calls), 5)
+        for previous, current in zip(scheduled, scheduled[1:]):
+            self.assertGreaterEqual(current - previous, 1 / 20 - 0.002)
+        for call, start in zip(submit.calls, scheduled):
+            self.assertGreaterEqual(call, start)
+
+
+class RetryAfterTest(unittest.TestCase):
+
+    def test_retry_after_headers(self):
+        self.assertEqual(RequestScheduler.retry_after(http_error(429, {'Retry-After': '2'})), 2.0)
+        self.assertEqual(RequestScheduler.retry_after(http_error(429, {'retry-after-ms': '250'})), 0.25)
+        in_a_minute = RequestScheduler.retry_after(http_error(429, {'Retry-After': formatdate(time.time() + 60, usegmt=True)}))
+        self.assertAlmostEqual(in_a_minute, 60, delta=2)
+        self.assertIsNone(RequestScheduler.retry_after(http_error(503)))
+
+    def test_throttled_submission_waits_retry_after(self):
+        scheduler = RequestScheduler(rate=100, backoff_base=0.001, min_poll_interval=0)
+        submit = ScriptedSubmit([http_error(429, {'Retry-After': '0.3'})])
+
+        result = scheduler.run(submit)
+
+        self.assertEqual(len(result.pages), 1)
+        self.assertEqual(len(submit.calls), 2)
+        self.assertGreaterEqual(submit.calls[1] - submit.calls[0], 0.29)
+
+    def test_throttling_pauses_the_whole_bucket(self):
+        scheduler = RequestScheduler(rate=100, burst=10, backoff_base=0.001, min_poll_interval=0)
+        scheduler._backoff(0, http_error(429, {'Retry-After': '0.4'}))
+
+        # Otra solicitud que no recibió el 429 también espera la pausa
+        self.assertAlmostEqual(scheduler.bucket.reserve(), 0.4, delta=0.05)
+
+    def test_non_retryable_error_is_raised(self):
+        scheduler = RequestScheduler(rate=100, min_poll_interval=0)
+        submit = ScriptedSubmit([http_error(400)])
+
+        with self.assertRaises(HttpResponseError):
+            scheduler.run(submit)
+        self.assertEqual(len(submit.calls), 1)
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def test_opens_after_consecutive_failures_then_half_opens(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+        breaker.record_failure()
+        breaker.allow()
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, 'open')
+        with self.assertRaises(CircuitOpenError):
+            breaker.allow()
+
+        time.sleep(0.25)
+        breaker.allow()
+        self.assertEqual(breaker.state, 'half_open')
+        # Solo una solicitud de prueba a la vez
+        with self.assertRaises(CircuitOpenError):
+            breaker.allow()
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+        breaker.allow()
+
+    def test_failed_trial_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+        breaker.record_failure()
+        time.sleep(0.15)
+        breaker.allow()
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, 'open')
+        with self.assertRaises(CircuitOpenError):
+            breaker.allow()
+
+    def test_scheduler_stops_sending_when_circuit_opens(self):
+        scheduler = RequestScheduler(rate=100, backoff_base=0.001, failure_threshold=2, reset_timeout=10, min_poll_interval=0)
+        submit = ScriptedSubmit([http_error(503)] * 5)
+
+        with self.assertRaises(CircuitOpenError):
+            scheduler.run(submit)
+        self.assertEqual(len(submit.calls), 2)
+
+    def test_throttling_does_not_open_circuit(self):
+        scheduler = RequestScheduler(rate=100, backoff_base=0.001, failure_threshold=2, min_poll_interval=0)
+        submit = ScriptedSubmit([http_error(429, {'retry-after-ms': '10'})] * 3)
+
+        scheduler.run(submit)
+        self.assertEqual(scheduler.breaker.state, 'closed')
+
+
+class DeadlineTest(unittest.TestCase):
+
+    def test_slow_analysis_exceeds_deadline(self):
+        scheduler = RequestScheduler(rate=100, min_poll_interval=0)
+        start = time.monotonic()
+
+        with self.assertRaises(DeadlineExceeded):
+            scheduler.run(ScriptedSubmit(latency=1.0), deadline=0.2)
+        self.assertLess(time.monotonic() - start, 0.6)
+
+    def test_retry_after_beyond_deadline_fails_without_waiting(self):
+        scheduler = RequestScheduler(rate=100, backoff_base=0.001, min_poll_interval=0)
+        start = time.monotonic()
+
+        with self.assertRaises(DeadlineExceeded):
+            scheduler.run(ScriptedSubmit([http_error(429, {'Retry-After': '5'})]), deadline=0.5)
+        self.assertLess(time.monotonic() - start, 0.3)
+
+    def test_no_turn_within_deadline(self):
+        scheduler = RequestScheduler(rate=1, min_poll_interval=0)
+        scheduler.run(ScriptedSubmit())
+
+        with self.assertRaises(DeadlineExceeded):
+            scheduler.run(ScriptedSubmit(), deadline=0.1)
+
+    def test_async_deadline(self):
+        scheduler = RequestScheduler(rate=100, min_poll_interval=0)
+
+        async def submit(interval):
+            return AsyncFakePoller(PAYLOAD, 1.0)
+
+        start = time.monotonic()
+        with self.assertRaises(DeadlineExceeded):
+            asyncio.run(scheduler.run_async(submit, deadline=0.2))
+        self.assertLess(time.monotonic() - start, 0.6)
+
+
+if __name__ == '__main__':
+    unittest.main()
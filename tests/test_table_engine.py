@@ -0,0 +1,80 @@
+"""
+Pruebas de table_engine y de su uso en DocumentIntelligence: ubicación de celdas (con y sin celdas combinadas) y
+detección de la fila de encabezado en _extract_tables y table_to_dataframe.
+
+Uso: python -m pytest tests
+"""
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT_DIR)
+
+# El cliente real no se usa, pero su constructor exige un endpoint y una clave
+os.environ.setdefault('AZURE_FORM_RECOGNIZER_ENDPOINT', 'https://pruebas.invalid/')
+os.environ.setdefault('AZURE_FORM_RECOGNIZER_API_KEY', 'pruebas')
+
+from azure.ai.formrecognizer import DocumentTableCell
+
+from document_intelligence_functions import DocumentIntelligence
+from table_engine import table_to_array, detect_header_row
+
+
+def cell(row, col, content, kind='content', row_span=1, column_span=1):
+    return DocumentTableCell(row_index=row, column_index=col, content=content, kind=kind, row_span=row_span,
+                             column_span=column_span)
+
+
+def table(row_count, column_count, cells):
+    return SimpleNamespace(row_count=row_count, column_count=column_count, cells=cells)
+
+
+class TableEngineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.document_intelligence = DocumentIntelligence(dotenv_path=os.devnull)
+
+    def test_plain_table_respects_column_index(self):
+        # Celdas fuera de orden: la posición la dan row_index y column_index, no el orden de la lista
+        grid = table_to_array(table(2, 2, [cell(1, 1, 'd'), cell(0, 1, 'b'), cell(1, 0, 'c'), cell(0, 0, 'a')]))
+
+        self.assertEqual(grid.tolist(), [['a', 'b'], ['c', 'd']])
+
+    def test_merged_cells(self):
+        merged = table(2, 3, [cell(0, 0, 'x', column_span=2), cell(0, 2, 'y'), cell(1, 0, 'a'), cell(1, 1, 'b'), cell(1, 2, 'c')])
+
+        self.assertEqual(table_to_array(merged).tolist(), [['x', '', 'y'], ['a', 'b', 'c']])
+        self.assertEqual(table_to_array(merged, fill_merged=True).tolist(), [['x', 'x', 'y'], ['a', 'b', 'c']])
+
+    def test_extract_tables_uses_marked_header_rows(self):
+        cells = [cell(0, 0, 'Datos del pozo', kind='columnHeader', column_span=2),
+                 cell(1, 0, 'Pozo', kind='columnHeader'), cell(1, 1, 'Profundidad', kind='columnHeader'),
+                 cell(2, 0, 'P-1'), cell(2, 1, '1500')]
+        marked = table(3, 2, cells)
+
+        self.assertEqual(detect_header_row(marked), 1)
+        frame, = self.document_intelligence._extract_tables(SimpleNamespace(tables=[marked]))
+        self.assertEqual(list(frame.columns), ['Pozo', 'Profundidad'])
+        self.assertEqual(frame.values.tolist(), [['P-1', '1500']])
+
+    def test_extract_tables_without_header(self):
+        numbers = table(2, 2, [cell(0, 0, '1'), cell(0, 1, '2'), cell(1, 0, '3'), cell(1, 1, '4')])
+
+        frame, = self.document_intelligence._extract_tables(SimpleNamespace(tables=[numbers]))
+        self.assertEqual(list(frame.columns), [0, 1])
+        self.assertEqual(frame.values.tolist(), [['1', '2'], ['3', '4']])
+
+    def test_table_to_dataframe_header(self):
+        unmarked = table(2, 2, [cell(0, 0, 'Pozo'), cell(0, 1, 'Campo'), cell(1, 0, 'P-1'), cell(1, 1, 'C-1')])
+
+        self.assertEqual(self.document_intelligence.table_to_dataframe(unmarked).values.tolist(),
+                         [['Pozo', 'Campo'], ['P-1', 'C-1']])
+        frame = self.document_intelligence.table_to_dataframe(unmarked, header='auto')
+        self.assertEqual(list(frame.columns), ['Pozo', 'Campo'])
+        self.assertEqual(frame.values.tolist(), [['P-1', 'C-1']])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+"""
+Pruebas de BlobWorkQueue sobre el Blob Storage falso en memoria de benchmarks/fake_storage.py: reintentos de documentos
+fallidos, reclamo de documentos cuyo lease expiró y reparto sin duplicados entre varios trabajadores.
+
+Uso: python -m pytest tests
+"""
+import os
+import sys
+import time
+import threading
+import unittest
+from collections import Counter
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT_DIR, 'benchmarks'))
+sys.path.insert(0, ROOT_DIR)
+
+os.environ.setdefault('AZURE_BLOB_STORAGE_CONTAINER_NAME', 'pruebas')
+
+from fake_storage import FakeBlobServiceClient
+from blob_functions import BlobFunctions
+from work_queue import BlobWorkQueue
+
+
+class BlobWorkQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.blob_functions = BlobFunctions(blob_service_client=FakeBlobServiceClient())
+        self.blob_functions.upload_many([{'file_name': f'doc_{i}.pdf', 'content': b'%PDF-prueba'} for i in range(3)], 'docs')
+
+    def queue(self, worker_id, **kwargs):
+        kwargs = {'lease_duration': 1, 'max_attempts': 2, 'poll_interval': 0.05, **kwargs}
+        return BlobWorkQueue(self.blob_functions, 'cola', worker_id=worker_id, **kwargs)
+
+    def test_failed_document_is_retried(self):
+        attempts = Counter()
+        with self.queue('nodo') as work_queue:
+            for blob in work_queue.claims('docs'):
+                attempts[blob.name] += 1
+                if blob.name == 'docs/doc_1.pdf' and attempts[blob.name] == 1:
+                    work_queue.fail(blob.name, RuntimeError('error transitorio'))
+                else:
+                    work_queue.complete(blob.name)
+            progress = work_queue.progress('docs')
+
+        self.assertEqual(attempts['docs/doc_1.pdf'], 2)
+        self.assertEqual(progress, {'total': 3, 'done': 3, 'failed': 0, 'claimed': 0, 'pending': 0})
+
+    def test_document_failed_max_attempts_is_finished(self):
+        attempts = Counter()
+        with self.queue('nodo') as work_queue:
+            for blob in work_queue.claims('docs'):
+                attempts[blob.name] += 1
+                if blob.name == 'docs/doc_2.pdf':
+                    work_queue.fail(blob.name, RuntimeError('documento dañado'))
+                else:
+                    work_queue.complete(blob.name)
+            progress = work_queue.progress('docs')
+
+        self.assertEqual(attempts['docs/doc_2.pdf'], 2)
+        self.assertEqual(progress, {'total': 3, 'done': 2, 'failed': 1, 'claimed': 0, 'pending': 0})
+
+    def test_expired_claim_is_reclaimed(self):
+        # Un trabajador reclama un documento y se cae sin renovar ni liberar el lease
+        crashed = self.queue('caido')
+        abandoned = next(crashed.claims('docs', wait=False))
+        crashed._stop.set()
+
+        processed = []
+        start = time.monotonic()
+        with self.queue('nodo') as work_queue:
+            for blob in work_queue.claims('docs'):
+                processed.append(blob.name)
+                work_queue.complete(blob.name)
+            progress = work_queue.progress('docs')
+
+        self.assertCountEqual(processed, ['docs/doc_0.pdf', 'docs/doc_1.pdf', 'docs/doc_2.pdf'])
+        self.assertEqual(processed[-1], abandoned.name)
+        self.assertGreaterEqual(time.monotonic() - start, 0.9)
+        self.assertEqual(progress['done'], 3)
+
+    def test_workers_share_documents_without_duplicates(self):
+        self.blob_functions.upload_many([{'file_name': f'extra_{i}.pdf', 'content': b'%PDF-prueba'} for i in range(30)], 'docs')
+        processed = Counter()
+        lock = threading.Lock()
+
+        def worker(worker_id):
+            with self.queue(worker_id, max_claims=2) as work_queue:
+                for blob in work_queue.claims('docs'):
+                    time.sleep(0.005)
+                    with lock:
+                        processed[blob.name] += 1
+                    work_queue.complete(blob.name)
+
+        threads = [threading.Thread(target=worker, args=(f'nodo-{i}',)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(processed), 33)
+        self.assertEqual(set(processed.values()), {1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,394 @@
+import os
+import re
+import sys
+import json
+import zlib
+import struct
+import bisect
+import argparse
+import threading
+import unicodedata
+
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+# Cabecera de los archivos de segmento
+SEGMENT_MAGIC = b'TIX1'
+
+# Palabras: secuencias de letras y dígitos (los guiones, puntos y barras separan palabras: HAMACA-100D -> hamaca 100d)
+WORD_PATTERN = re.compile(r'[^\W_]+')
+
+# Cláusulas de una consulta: frases entre comillas o términos (con * final para prefijos)
+QUERY_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+
+
+# Marcas diacríticas combinantes que quedan al descomponer las letras acentuadas
+COMBINING_MARKS = re.compile(r'[\u0300-\u036f]')
+
+
+def normalize(text):
+    """ Minúsculas y sin tildes ni diéresis (la ñ queda como n, de modo que 'compania' encuentra 'Compañía'). """
+    text = text.casefold()
+    if text.isascii():
+        return text
+    return COMBINING_MARKS.sub('', unicodedata.normalize('NFKD', text))
+
+
+def tokenize(text):
+    """
+    :param text: Texto de una página.
+    :return: Lista de términos normalizados; la posición de cada término es su índice en la lista.
+    """
+    return WORD_PATTERN.findall(normalize(text))
+
+
+# Claves de página: documento * 2**PAGE_BITS + página; claves de posición: clave de página * 2**POSITION_BITS + posición
+PAGE_BITS = 16
+POSITION_BITS = 24
+
+
+def _encode_postings(keys, counts, positions):
+    """
+    Codifica las apariciones de un término: documentos en diferencias, páginas, número de posiciones por página y
+    posiciones en diferencias dentro de cada página, como uint32 comprimidos con zlib.
+
+    :param keys: Arreglo ordenado de claves de página.
+    :param counts: Número de posiciones de cada página.
+    :param positions: Posiciones, agrupadas por página en el orden de keys.
+    """
+    starts = np.cumsum(counts) - counts
+    deltas = np.diff(positions, prepend=0)
+    deltas[starts[counts > 0]] = positions[starts[counts > 0]]
+    array = np.concatenate([[len(keys)], np.diff(keys >> PAGE_BITS, prepend=0), keys & (2 ** PAGE_BITS - 1),
+                            counts, deltas]).astype(np.uint32)
+    return zlib.compress(array.tobytes(), 1)
+
+
+def _decode_postings(data):
+    """
+    :return: Tupla (claves de página, número de posiciones por página, posiciones).
+    """
+    array = np.frombuffer(zlib.decompress(data), dtype=np.uint32).astype(np.int64)
+    n = int(array[0])
+    keys = (np.cumsum(array[1:1 + n]) << PAGE_BITS) + array[1 + n:1 + 2 * n]
+    counts = array[1 + 2 * n:1 + 3 * n]
+    totals = np.cumsum(array[1 + 3 * n:])
+    # Las posiciones se acumulan de nuevo desde cero al comenzar cada página
+    starts = np.cumsum(counts) - counts
+    base = np.repeat(totals[starts] - array[1 + 3 * n:][starts], counts) if len(totals) else totals
+    return keys, counts, totals - base
+
+
+def _empty():
+    return (np.zeros(0, dtype=np.int64),) * 3
+
+
+class Segment():
+    """ Segmento inmutable del índice en disco: diccionario de términos ordenado y apariciones codificadas. """
+    def __init__(self, path):
+        """
+        :param path: Ruta del archivo del segmento.
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            data = f.read()
+        if data[:4] != SEGMENT_MAGIC:
+            raise ValueError(f"Archivo de segmento no reconocido: {path}")
+        header_length, = struct.unpack_from('<I', data, 4)
+        header = json.loads(zlib.decompress(data[8:8 + header_length]).decode('utf-8'))
+        self.terms = header['terms']
+        self.offsets = (np.cumsum([0] + header['lengths']) + 8 + header_length).tolist()
+        self._data = data
+
+    def postings(self, term):
+        """
+        :return: Tupla (claves de página, número de posiciones por página, posiciones) del término.
+        """
+        i = bisect.bisect_left(self.terms, term)
+        if i == len(self.terms) or self.terms[i] != term:
+            return _empty()
+        return _decode_postings(self._data[self.offsets[i]:self.offsets[i + 1]])
+
+    def prefix_terms(self, prefix):
+        start = bisect.bisect_left(self.terms, prefix)
+        end = bisect.bisect_left(self.terms, prefix + '\uffff')
+        return self.terms[start:end]
+
+    @staticmethod
+    def write(path, postings):
+        """
+        :param path: Ruta del archivo del segmento.
+        :param postings: Diccionario término -> tupla (claves de página, número de posiciones, posiciones).
+        """
+        terms = sorted(postings)
+        blobs = [_encode_postings(*postings[term]) for term in terms]
+        header = zlib.compress(json.dumps({'terms': terms, 'lengths': [len(blob) for blob in blobs]},
+                                          ensure_ascii=False).encode('utf-8'))
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(SEGMENT_MAGIC + struct.pack('<I', len(header)) + header)
+            for blob in blobs:
+                f.write(blob)
+        os.replace(tmp_path, path)
+
+
+def _concatenate(parts):
+    """ Une las apariciones de varios segmentos (con documentos distintos) ordenándolas por clave de página. """
+    parts = [part for part in parts if len(part[0])]
+    if not parts:
+        return _empty()
+    if len(parts) == 1:
+        return parts[0]
+    keys = np.concatenate([part[0] for part in parts])
+    counts = np.concatenate([part[1] for part in parts])
+    positions = np.concatenate([part[2] for part in parts])
+    # Los documentos se numeran en orden de llegada, así que normalmente las partes ya vienen ordenadas
+    if np.all(np.diff(keys) > 0):
+        return keys, counts, positions
+    order = np.argsort(keys, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    position_order = np.argsort(rank[np.repeat(np.arange(len(keys)), counts)], kind='stable')
+    return keys[order], counts[order], positions[position_order]
+
+
+class TextIndex():
+    """
+    La clase TextIndex es un índice invertido del texto de las páginas de los documentos analizados (el full_content_list
+    de analyze_read), para encontrar qué informes y páginas mencionan un pozo, contrato o formación sin recorrer los JSON.
+    Los términos se normalizan sin tildes ni mayúsculas y cada aparición guarda su documento, página y posición.
+    Los documentos nuevos se acumulan en memoria y se escriben como segmentos inmutables comprimidos; volver a agregar
+    un documento marca como eliminada su versión anterior, y merge une los segmentos descartando lo eliminado.
+
+    add:
+        Agrega (o reemplaza) el texto por página de un documento.
+
+    flush:
+        Escribe los documentos en memoria como un nuevo segmento.
+
+    merge:
+        Une todos los segmentos en uno solo.
+
+    search:
+        Consulta con términos, frases entre comillas y prefijos (term*); todas las cláusulas deben aparecer en la página.
+    """
+    def __init__(self, index_dir, flush_every=500):
+        """
+        :param index_dir: Directorio del índice.
+        :param flush_every: Número de documentos en memoria a partir del cual se escribe un segmento automáticamente.
+        """
+        self.index_dir = index_dir
+        self.flush_every = flush_every
+        self.documents = []  # id -> nombre del documento
+        self.deleted = set()
+        self.segments = []
+        self._document_ids = {}
+        self._buffer = {}  # término -> lista de (clave de página, posiciones)
+        self._buffered_documents = 0
+        self._next_segment = 1
+        self._lock = threading.RLock()
+
+        os.makedirs(index_dir, exist_ok=True)
+        manifest_path = os.path.join(index_dir, 'index.json')
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+            self.documents = manifest['documents']
+            self.deleted = set(manifest['deleted'])
+            self._next_segment = manifest['next_segment']
+            self.segments = [Segment(os.path.join(index_dir, name)) for name in manifest['segments']]
+            self._document_ids = {name: i for i, name in enumerate(self.documents) if i not in self.deleted}
+
+    def _save_manifest(self):
+        manifest = {'documents': self.documents, 'deleted': sorted(self.deleted), 'next_segment': self._next_segment,
+                    'segments': [os.path.basename(segment.path) for segment in self.segments]}
+        manifest_path = os.path.join(self.index_dir, 'index.json')
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, manifest_path)
+
+    def add(self, document_name, page_texts):
+        """
+        :param document_name: Nombre del documento (por ejemplo la ruta del blob).
+        :param page_texts: Lista con el texto de cada página.
+        """
+        pages = [tokenize(text or '') for text in page_texts]
+        with self._lock:
+            previous = self._document_ids.get(document_name)
+            if previous is not None:
+                self.deleted.add(previous)
+            doc_id = len(self.documents)
+            self.documents.append(document_name)
+            self._document_ids[document_name] = doc_id
+
+            for page_number, tokens in enumerate(pages, start=1):
+                positions = {}
+                for position, token in enumerate(tokens):
+                    positions.setdefault(token, []).append(position)
+                key = (doc_id << PAGE_BITS) + page_number
+                for token, token_positions in positions.items():
+                    self._buffer.setdefault(token, []).append((key, token_positions))
+
+            self._buffered_documents += 1
+            if self._buffered_documents >= self.flush_every:
+                self.flush()
+
+    def remove(self, document_name):
+        """
+        :param document_name: Nombre del documento a eliminar del índice.
+        """
+        with self._lock:
+            doc_id = self._document_ids.pop(document_name, None)
+            if doc_id is not None:
+                self.deleted.add(doc_id)
+
+    @staticmethod
+    def _buffered_postings(entries):
+        keys = np.array([key for key, _ in entries], dtype=np.int64)
+        counts = np.array([len(positions) for _, positions in entries], dtype=np.int64)
+        positions = np.fromiter((position for _, item in entries for position in item), dtype=np.int64,
+                                count=int(counts.sum()))
+        return keys, counts, positions
+
+    def flush(self):
+        """ Escribe los documentos en memoria como un nuevo segmento y guarda el manifiesto. """
+        with self._lock:
+            if self._buffer:
+                path = os.path.join(self.index_dir, f"segment_{self._next_segment:06d}.seg")
+                Segment.write(path, {term: self._buffered_postings(entries) for term, entries in self._buffer.items()})
+                self.segments.append(Segment(path))
+                self._next_segment += 1
+                self._buffer = {}
+                self._buffered_documents = 0
+            self._save_manifest()
+
+    def _without_deleted(self, postings):
+        keys, counts, positions = postings
+        if not self.deleted or not len(keys):
+            return postings
+        keep = ~np.isin(keys >> PAGE_BITS, np.fromiter(self.deleted, dtype=np.int64))
+        return keys[keep], counts[keep], positions[np.repeat(keep, counts)]
+
+    def merge(self):
+        """ Une todos los segmentos en uno solo, sin las apariciones de los documentos eliminados. """
+        with self._lock:
+            self.flush()
+            if len(self.segments) <= 1 and not self.deleted:
+                return
+            merged = {}
+            for term in sorted({term for segment in self.segments for term in segment.terms}):
+                postings = self._without_deleted(self._postings(term))
+                if len(postings[0]):
+                    merged[term] = postings
+
+            old_segments = self.segments
+            path = os.path.join(self.index_dir, f"segment_{self._next_segment:06d}.seg")
+            self._next_segment += 1
+            self.segments = []
+            if merged:
+                Segment.write(path, merged)
+                self.segments = [Segment(path)]
+            # Los documentos eliminados ya no tienen apariciones; sus ids se conservan para no renumerar
+            self._save_manifest()
+            for segment in old_segments:
+                os.remove(segment.path)
+
+    def _postings(self, term):
+        parts = [segment.postings(term) for segment in self.segments]
+        if term in self._buffer:
+            parts.append(self._buffered_postings(self._buffer[term]))
+        return _concatenate(parts)
+
+    def _term_hits(self, term):
+        keys, counts, _ = self._postings(term)
+        return keys, counts
+
+    def _prefix_hits(self, prefix):
+        terms = {term for segment in self.segments for term in segment.prefix_terms(prefix)}
+        terms.update(term for term in self._buffer if term.startswith(prefix))
+        postings = [self._postings(term) for term in terms]
+        keys = np.concatenate([item[0] for item in postings] or [_empty()[0]])
+        counts = np.concatenate([item[1] for item in postings] or [_empty()[1]])
+        unique, inverse = np.unique(keys, return_inverse=True)
+        return unique, np.bincount(inverse, weights=counts, minlength=len(unique)).astype(np.int64)
+
+    def _phrase_hits(self, tokens):
+        """ Páginas donde los términos aparecen en posiciones consecutivas, con el número de apariciones de la frase. """
+        matches = None
+        for offset, token in enumerate(tokens):
+            keys, counts, positions = self._postings(token)
+            if matches is not None:
+                # Solo las páginas que todavía pueden contener la frase
+                keep = np.isin(keys, matches >> POSITION_BITS)
+                keys, counts, positions = keys[keep], counts[keep], positions[np.repeat(keep, counts)]
+            starts = positions - offset
+            valid = starts >= 0
+            current = (np.repeat(keys, counts)[valid] << POSITION_BITS) + starts[valid]
+            matches = current if matches is None else np.intersect1d(matches, current, assume_unique=True)
+            if not len(matches):
+                break
+        if matches is None:
+            return _empty()[:2]
+        return np.unique(matches >> POSITION_BITS, return_counts=True)
+
+    def search(self, query, limit=None):
+        """
+        :param query: Consulta, por ejemplo: HAMACA "taponado y abandonado" form* (todas las cláusulas deben aparecer).
+        :param limit: Número máximo de resultados (opcional).
+        :return: Lista de diccionarios {'document', 'page_number', 'matches'}, ordenados por número de apariciones.
+        """
+        with self._lock:
+            hits = None
+            for phrase, word in QUERY_PATTERN.findall(query):
+                tokens = tokenize(phrase or word)
+                if not tokens:
+                    continue
+                if word.endswith('*'):
+                    keys, counts = self._prefix_hits(tokens[-1]) if len(tokens) == 1 else self._phrase_hits(tokens)
+                elif len(tokens) == 1:
+                    keys, counts = self._term_hits(tokens[0])
+                else:
+                    keys, counts = self._phrase_hits(tokens)
+
+                if hits is None:
+                    hits = (keys, counts)
+                else:
+                    common, left, right = np.intersect1d(hits[0], keys, assume_unique=True, return_indices=True)
+                    hits = (common, hits[1][left] + counts[right])
+
+            if hits is None:
+                return []
+            keys, counts = hits
+            if self.deleted:
+                keep = ~np.isin(keys >> PAGE_BITS, np.fromiter(self.deleted, dtype=np.int64))
+                keys, counts = keys[keep], counts[keep]
+            order = np.lexsort((keys, -counts))
+            if limit:
+                order = order[:limit]
+            return [{'document': self.documents[int(key) >> PAGE_BITS], 'page_number': int(key) & (2 ** PAGE_BITS - 1),
+                     'matches': int(count)} for key, count in zip(keys[order], counts[order])]
+
+    def __len__(self):
+        return len(self._document_ids)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consulta o compacta un índice de texto de documentos analizados.")
+    parser.add_argument('index_dir', help="Directorio del índice.")
+    parser.add_argument('query', nargs='?', default=None, help='Consulta: términos, "frases" y prefijos (term*).')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--merge', action='store_true', help="Une todos los segmentos del índice en uno solo.")
+    args = parser.parse_args(argv)
+
+    index = TextIndex(args.index_dir)
+    if args.merge:
+        index.merge()
+    if args.query:
+        for hit in index.search(args.query, limit=args.limit):
+            print(f"{hit['document']}\tpágina {hit['page_number']}\t{hit['matches']}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+import io
+import re
+
+from lazy_imports import lazy_import
+
+pypdf = lazy_import('pypdf')
+pypdf_generic = lazy_import('pypdf.generic')
+
+# Dos bloques de texto separados por tres o más espacios en el texto con disposición: indicio de columnas
+COLUMN_GAP = re.compile(r'\S {3,}\S')
+
+# Operadores de trazado de rectángulos y líneas, con los que se dibujan los bordes de las tablas
+RULING_OPERATORS = (b're', b'l')
+
+
+def _page_text(text):
+    """ Une las líneas de texto de una página con espacios, igual que DocumentIntelligence._page_texts. """
+    return ' '.join(line.strip() for line in text.splitlines() if line.strip())
+
+
+def _printable_ratio(text):
+    if not text:
+        return 0.0
+    # Las fuentes sin tabla de codificación producen caracteres de control o de reemplazo (U+FFFD) en vez de texto
+    valid = sum(1 for char in text if (char.isprintable() or char.isspace()) and char != '\ufffd')
+    return valid / len(text)
+
+
+def _ruling_count(page, reader):
+    contents = page.get_contents()
+    if contents is None:
+        return 0
+    try:
+        operations = pypdf_generic.ContentStream(contents, reader).operations
+    except Exception:
+        return 0
+    return sum(1 for _, operator in operations if operator in RULING_OPERATORS)
+
+
+def _column_rows(layout_text):
+    """ Número máximo de líneas consecutivas con al menos dos separaciones de columna en el texto con disposición. """
+    best = run = 0
+    for line in layout_text.splitlines():
+        if len(COLUMN_GAP.findall(line)) >= 2:
+            run += 1
+            best = max(best, run)
+        else:
+            run = 0
+    return best
+
+
+def inspect_pages(pdf_bytes, min_chars=40, min_printable_ratio=0.95, max_ruling_operations=12, min_table_rows=3):
+    """
+    Inspecciona localmente cada página de un PDF para decidir si su texto puede extraerse sin OCR.
+    Una página se extrae localmente si tiene una capa de texto utilizable (suficientes caracteres imprimibles) y no muestra
+    indicios de tablas: ni bordes dibujados (rectángulos y líneas) ni varias líneas consecutivas con texto en columnas.
+    Las páginas escaneadas o con tablas deben enviarse al modelo de Form Recognizer.
+
+    :param pdf_bytes: Bytes del documento PDF.
+    :param min_chars: Caracteres mínimos de la capa de texto para considerarla utilizable.
+    :param min_printable_ratio: Proporción mínima de caracteres imprimibles en la capa de texto.
+    :param max_ruling_operations: Número máximo de rectángulos y líneas dibujados en una página sin tablas.
+    :param min_table_rows: Líneas consecutivas en columnas a partir de las cuales se considera que hay una tabla.
+    :return: Lista de diccionarios {'page_number', 'local', 'reason', 'text'}; 'text' tiene la forma de full_content_list
+             para las páginas locales y es None para las demás.
+    """
+    reader = pypdf.PdfReader(io.BytesIO(pdf_bytes))
+    pages = []
+    for page_number, page in enumerate(reader.pages, start=1):
+        try:
+            text = page.extract_text() or ''
+        except Exception:
+            text = ''
+
+        stripped = text.strip()
+        if len(stripped) < min_chars:
+            reason = 'sin capa de texto'
+        elif _printable_ratio(stripped) < min_printable_ratio:
+            reason = 'capa de texto ilegible'
+        elif _ruling_count(page, reader) > max_ruling_operations:
+            reason = 'bordes de tabla'
+        elif _column_rows(page.extract_text(extraction_mode='layout') or '') >= min_table_rows:
+            reason = 'texto en columnas'
+        else:
+            reason = None
+
+        pages.append({'page_number': page_number, 'local': reason is None, 'reason': reason or 'capa de texto',
+                      'text': _page_text(text) if reason is None else None})
+    return pages
@@ -0,0 +1,322 @@
+import os
+import json
+import time
+import uuid
+import socket
+import hashlib
+import logging
+import threading
+
+from metrics import metrics
+from lazy_imports import lazy_import
+
+exceptions = lazy_import('azure.core.exceptions')
+storage_blob = lazy_import('azure.storage.blob')
+
+logger = logging.getLogger(__name__)
+
+
+class WorkClaim():
+    """ Documento reclamado por un trabajador: propiedades del blob de origen y lease de su blob de reclamo. """
+    def __init__(self, blob, lease, attempts):
+        self.blob = blob
+        self.lease = lease
+        self.attempts = attempts
+        self.claimed_at = time.time()
+        self.lost = False
+
+
+class BlobWorkQueue():
+    """
+    La clase BlobWorkQueue reparte los documentos de una carpeta de Blob Storage entre varios trabajadores (procesos o
+    máquinas) sin procesar dos veces el mismo documento. Cada documento tiene un blob de reclamo vacío en
+    <queue_prefix>/claims/; un trabajador lo reclama adquiriendo su lease, que renueva en segundo plano mientras lo procesa.
+    Si el trabajador se cae, el lease expira y otro trabajador reclama el documento en su siguiente pasada. Al terminar
+    se escribe un marcador por documento en <queue_prefix>/done/ con el ETag procesado, y se libera el lease.
+    Cada trabajador recorre los documentos en un orden propio para que los trabajadores casi no compitan por los mismos.
+    Funciona igual con el emulador Azurite, a través de la cadena de conexión de BlobFunctions.
+
+    claims:
+        Genera los documentos reclamados por este trabajador hasta que todos los de la carpeta estén terminados.
+
+    complete / fail / release:
+        Escriben el marcador de un documento terminado o fallido, o lo liberan sin marcador, y sueltan su lease.
+
+    progress:
+        Cuenta los documentos terminados, fallidos, reclamados y pendientes de una carpeta.
+    """
+    def __init__(self, blob_functions, queue_prefix='_work_queue', worker_id=None, lease_duration=30, max_claims=16,
+                 max_attempts=3, poll_interval=5.0):
+        """
+        :param blob_functions: Instancia de BlobFunctions.
+        :param queue_prefix: Carpeta del contenedor donde se guardan los reclamos y los marcadores.
+        :param worker_id: Identificador de este trabajador; por defecto, el nombre de la máquina y el PID.
+        :param lease_duration: Duración en segundos de los leases (entre 15 y 60 en Blob Storage); se renuevan cada tercio.
+        :param max_claims: Máximo de documentos reclamados y sin terminar a la vez; claims espera cuando se alcanza, de modo
+                           que un trabajador no acapara documentos que otros podrían procesar.
+        :param max_attempts: Intentos fallidos tras los cuales un documento se da por terminado con error.
+        :param poll_interval: Segundos entre pasadas mientras quedan documentos reclamados por otros trabajadores.
+        """
+        self.container_client = blob_functions.container_client
+        self.queue_prefix = queue_prefix.rstrip('/')
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.lease_duration = lease_duration
+        self.max_claims = max_claims
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self._claims = {}
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(max_claims)
+        self._stop = threading.Event()
+        self._renewer = None
+
+    def _claim_name(self, blob_name):
+        return f"{self.queue_prefix}/claims/{blob_name}"
+
+    def _marker_name(self, blob_name):
+        return f"{self.queue_prefix}/done/{blob_name}.json"
+
+    @staticmethod
+    def _etag(blob):
+        etag = getattr(blob, 'etag', None)
+        return etag.strip('"') if etag else ''
+
+    def _markers(self):
+        """ :return: Diccionario nombre del documento -> metadatos de su marcador. """
+        prefix = f"{self.queue_prefix}/done/"
+        return {blob.name[len(prefix):-len('.json')]: blob.metadata or {}
+                for blob in self.container_client.list_blobs(name_starts_with=prefix, include=['metadata'])}
+
+    def _lease_states(self):
+        """ :return: Diccionario nombre del documento -> estado del lease de su blob de reclamo. """
+        prefix = f"{self.queue_prefix}/claims/"
+        return {blob.name[len(prefix):]: getattr(getattr(blob, 'lease', None), 'state', None)
+                for blob in self.container_client.list_blobs(name_starts_with=prefix)}
+
+    def _is_finished(self, blob, marker):
+        """
+        Indica si un documento ya no debe procesarse: su marcador corresponde a la misma versión del blob y está terminado
+        o agotó sus intentos.
+        """
+        if not marker or marker.get('etag') != self._etag(blob):
+            return False
+        return marker.get('status') == 'done' or int(marker.get('attempts', 0)) >= self.max_attempts
+
+    def _listing(self, blob_folder_path, end):
+        return [blob for blob in self.container_client.list_blobs(name_starts_with=f'{blob_folder_path}/')
+                if blob.name.lower().endswith(end)]
+
+    def claims(self, blob_folder_path, end='.pdf', wait=True):
+        """
+        Reclama uno a uno los documentos pendientes de una carpeta. Tras cada pasada, si quedan documentos reclamados por
+        otros trabajadores o por este, espera poll_interval y vuelve a listar para reclamar los que hayan expirado o fallado.
+
+        :param blob_folder_path: Ruta de la carpeta dentro del contenedor.
+        :param end: Extensión de archivo o cadena final para filtrar los archivos.
+        :param wait: Si es False, termina después de una sola pasada.
+        :return: Generador de las propiedades de los blobs reclamados; cada uno debe terminar con complete, fail o release.
+        """
+        while True:
+            listed_at = time.monotonic()
+            with metrics.timer('work_queue_list'):
+                markers = self._markers()
+                lease_states = self._lease_states()
+                blobs = [blob for blob in self._listing(blob_folder_path, end) if not self._is_finished(blob, markers.get(blob.name))]
+            # Orden propio de cada trabajador, para repartir los reclamos sin coordinación
+            blobs.sort(key=lambda blob: hashlib.sha1(f"{self.worker_id}/{blob.name}".encode('utf-8')).digest())
+            # Con un listado viejo se intentaría reclamar lo que otros ya terminaron; se vuelve a listar, sin dedicar
+            # al listado más de una décima parte del tiempo
+            max_age = max(self.poll_interval, 10 * (time.monotonic() - listed_at))
+
+            pending = 0
+            stale = False
+            for blob in blobs:
+                if blob.name in self._claims or lease_states.get(blob.name) == 'leased':
+                    pending += 1
+                    continue
+                self._slots.acquire()
+                if time.monotonic() - listed_at > max_age:
+                    self._slots.release()
+                    stale = True
+                    break
+                claim = self._try_claim(blob, lease_states.get(blob.name))
+                pending += 1
+                if claim is None:
+                    self._slots.release()
+                    continue
+                # Se cuenta como pendiente hasta verlo terminado en un listado: si falla, se reintenta en la siguiente pasada
+                yield blob
+
+            if stale:
+                continue
+            logger.info("[%s] Pasada terminada en %s: %d documentos sin terminar, %d reclamados por otros o en proceso",
+                        self.worker_id, blob_folder_path, len(blobs), pending)
+            if not wait or pending == 0:
+                break
+            self._stop.wait(self.poll_interval)
+
+    def _try_claim(self, blob, lease_state):
+        """
+        Intenta adquirir el lease del blob de reclamo de un documento, creándolo si no existe.
+
+        :param blob: Propiedades del blob del documento.
+        :param lease_state: Estado del lease del blob de reclamo en el último listado, o None si no existía.
+        :return: WorkClaim, o None si otro trabajador lo tiene o el documento ya terminó.
+        """
+        claim_client = self.container_client.get_blob_client(self._claim_name(blob.name))
+        created = False
+        try:
+            if lease_state is None:
+                created = self._create_claim(claim_client)
+            try:
+                lease = claim_client.acquire_lease(lease_duration=self.lease_duration)
+            except exceptions.ResourceNotFoundError:
+                created = self._create_claim(claim_client)
+                lease = claim_client.acquire_lease(lease_duration=self.lease_duration)
+        except exceptions.HttpResponseError as e:
+            if e.status_code != 409:
+                raise
+            metrics.increment('work_queue_conflicts')
+            return None
+
+        # Otro trabajador pudo terminarlo entre el listado y la adquisición del lease; si este trabajador creó el blob de
+        # reclamo, nadie lo había reclamado antes y no puede haber marcador
+        marker = None if created else self._marker(blob.name)
+        if self._is_finished(blob, marker):
+            self._release_lease(lease)
+            return None
+
+        claim = WorkClaim(blob, lease, int(marker.get('attempts', 0)) if marker and marker.get('etag') == self._etag(blob) else 0)
+        with self._lock:
+            self._claims[blob.name] = claim
+            if self._renewer is None:
+                self._renewer = threading.Thread(target=self._renew, name=f"lease-{self.worker_id}", daemon=True)
+                self._renewer.start()
+        metrics.increment('work_queue_claims')
+        if lease_state in ('expired', 'broken'):
+            metrics.increment('work_queue_reclaimed')
+            logger.info("[%s] Reclamado %s, cuyo lease anterior expiró", self.worker_id, blob.name)
+        return claim
+
+    @staticmethod
+    def _create_claim(claim_client):
+        """ :return: True si se creó el blob de reclamo, False si otro trabajador lo creó antes. """
+        try:
+            claim_client.upload_blob(b'', overwrite=False)
+            return True
+        except exceptions.ResourceExistsError:
+            return False
+
+    def _marker(self, blob_name):
+        try:
+            return self.container_client.get_blob_client(self._marker_name(blob_name)).get_blob_properties().metadata or {}
+        except exceptions.ResourceNotFoundError:
+            return None
+
+    def _renew(self):
+        """ Renueva cada tercio de lease_duration los leases de los documentos en proceso. """
+        while not self._stop.wait(self.lease_duration / 3):
+            with self._lock:
+                claims = list(self._claims.values())
+            for claim in claims:
+                if claim.lost:
+                    continue
+                try:
+                    claim.lease.renew()
+                    metrics.increment('work_queue_renewals')
+                except exceptions.HttpResponseError as e:
+                    with self._lock:
+                        if self._claims.get(claim.blob.name) is not claim:
+                            # Terminado y liberado mientras se renovaba
+                            continue
+                    # Otro trabajador reclamó el documento; este puede terminarlo, pero el otro también lo procesará
+                    claim.lost = True
+                    metrics.increment('work_queue_lost')
+                    logger.warning("[%s] Se perdió el lease de %s: %s", self.worker_id, claim.blob.name, e)
+
+    @staticmethod
+    def _release_lease(lease):
+        try:
+            lease.release()
+        except exceptions.HttpResponseError as e:
+            logger.debug("No fue posible liberar el lease: %s", e)
+
+    def _finish(self, blob_name, status=None, **info):
+        with self._lock:
+            claim = self._claims.pop(blob_name, None)
+        if claim is None:
+            raise KeyError(f"El documento {blob_name} no está reclamado por {self.worker_id}.")
+        try:
+            if status is not None:
+                attempts = claim.attempts + (status == 'error')
+                marker = {'blob_name': blob_name, 'status': status, 'etag': self._etag(claim.blob), 'worker': self.worker_id,
+                          'attempts': attempts, 'claimed_at': claim.claimed_at, 'finished_at': time.time(), **info}
+                with metrics.timer('work_queue_marker'):
+                    self.container_client.get_blob_client(self._marker_name(blob_name)).upload_blob(
+                        json.dumps(marker, ensure_ascii=False, default=str), overwrite=True,
+                        metadata={'status': status, 'etag': marker['etag'], 'attempts': str(attempts)},
+                        content_settings=storage_blob.ContentSettings(content_type='application/json'))
+                metrics.increment('work_queue_finished', status=status)
+        finally:
+            self._release_lease(claim.lease)
+            self._slots.release()
+
+    def complete(self, blob_name, **info):
+        """
+        Escribe el marcador de un documento terminado y libera su reclamo.
+
+        :param blob_name: Nombre completo del blob.
+        :param info: Información adicional a guardar en el marcador (por ejemplo, la ubicación de la salida).
+        """
+        self._finish(blob_name, 'done', **info)
+
+    def fail(self, blob_name, error=None, **info):
+        """
+        Registra un intento fallido y libera el reclamo; el documento se reintenta en una pasada posterior, en este u otro
+        trabajador, hasta agotar max_attempts.
+
+        :param blob_name: Nombre completo del blob.
+        :param error: Error del intento.
+        :param info: Información adicional a guardar en el marcador.
+        """
+        self._finish(blob_name, 'error', error=str(error) if error is not None else None, **info)
+
+    def release(self, blob_name):
+        """ Libera el reclamo de un documento sin escribir marcador, para que cualquier trabajador lo vuelva a tomar. """
+        self._finish(blob_name)
+
+    def progress(self, blob_folder_path, end='.pdf'):
+        """
+        :param blob_folder_path: Ruta de la carpeta dentro del contenedor.
+        :param end: Extensión de archivo o cadena final para filtrar los archivos.
+        :return: Diccionario con el total de documentos y cuántos están terminados, fallidos, reclamados y pendientes.
+        """
+        markers = self._markers()
+        lease_states = self._lease_states()
+        counts = {'total': 0, 'done': 0, 'failed': 0, 'claimed': 0, 'pending': 0}
+        for blob in self._listing(blob_folder_path, end):
+            counts['total'] += 1
+            marker = markers.get(blob.name)
+            if self._is_finished(blob, marker):
+                counts['done' if marker.get('status') == 'done' else 'failed'] += 1
+            elif lease_states.get(blob.name) == 'leased':
+                counts['claimed'] += 1
+            else:
+                counts['pending'] += 1
+        return counts
+
+    def close(self):
+        """ Detiene la renovación y libera los reclamos sin terminar, para que otros trabajadores los tomen de inmediato. """
+        self._stop.set()
+        if self._renewer is not None:
+            self._renewer.join()
+        with self._lock:
+            blob_names = list(self._claims)
+        for blob_name in blob_names:
+            self.release(blob_name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()